@@ -5,6 +5,7 @@ import zipfile
 import mimetypes
 import datetime as dt
 import re
+import urllib.parse
 import urllib.request
 import subprocess
 import shlex
@@ -15,7 +16,21 @@ import logging
 import signal
 import faulthandler
 import hashlib
+import collections
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import select
+import struct
+import concurrent.futures
+import functools
+import queue
 import random
+import heapq
+import math
+import multiprocessing
+import sqlite3
 import secrets
 import atexit
 from pathlib import Path
@@ -29,11 +44,14 @@ mimetypes.add_type('image/webp', '.webp')
 
 from flask import (
     Flask, render_template, request,
-    redirect, url_for, flash, send_from_directory, Response,
+    redirect, url_for, flash, Response,
     send_file, jsonify,
 )
 from flask_wtf.csrf import CSRFProtect
-from werkzeug.utils import secure_filename
+from werkzeug.utils import secure_filename, send_file as _werkzeug_send_file
+from werkzeug.security import safe_join
+
+import media_worker
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY", secrets.token_hex(32))
@@ -115,6 +133,20 @@ def _rotate_logs(task_folder: str) -> None:
 _ANSI_RE = re.compile(r'\x1b\[[0-9;]*m')
 _ERROR_LINE_RE = re.compile(r'\[(error|warning)\]|error:|failed to download|traceback|exception', re.IGNORECASE)
 
+def _summarise_error_lines(lines, max_lines: int = 30) -> str:
+    if not lines:
+        return "Task exited with a non-zero code but no error lines were found. Check the Logs tab for details."
+
+    # Deduplicate consecutive identical lines then take the last max_lines
+    deduped: list[str] = []
+    prev = None
+    for line in lines:
+        if line != prev:
+            deduped.append(line)
+            prev = line
+
+    return "\n".join(deduped[-max_lines:])
+
 def _extract_errors_from_log(logs_path: str, max_lines: int = 30) -> str:
     """Return error/warning lines from the log with ANSI stripped.
     Falls back to a pointer to the logs tab if nothing is found."""
@@ -128,18 +160,7 @@ def _extract_errors_from_log(logs_path: str, max_lines: int = 30) -> str:
     except Exception:
         return ""
 
-    if not lines:
-        return "Task exited with a non-zero code but no error lines were found. Check the Logs tab for details."
-
-    # Deduplicate consecutive identical lines then take the last max_lines
-    deduped: list[str] = []
-    prev = None
-    for line in lines:
-        if line != prev:
-            deduped.append(line)
-            prev = line
-
-    return "\n".join(deduped[-max_lines:])
+    return _summarise_error_lines(lines, max_lines)
 
 
 def _write_last_error(task_folder: str, message: str) -> None:
@@ -178,18 +199,257 @@ def _record_run(task_folder: str, success: bool, duration: float, stopped: bool)
     except Exception:
         app.logger.exception("Could not write run history for %s", task_folder)
 
+# ---------------------------------------------------------------------
+# Run output pipeline (child output -> log file + in-process run events)
+# ---------------------------------------------------------------------
+
+RUN_LOG_TIMESTAMPS = os.environ.get("ARTILLERY_LOG_TIMESTAMPS", "0") == "1"
+RUN_LOG_FLUSH_SECONDS = float(os.environ.get("ARTILLERY_LOG_FLUSH_SECONDS", "0.5") or "0.5")
+
+# Any CSI sequence (colours, cursor moves, erase-line) — not just SGR colours
+_ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;?]*[ -/]*[@-~]')
+
+RUN_KIND_TASK = "task"
+RUN_KIND_ONE_TIME = "one_time"
+
+# Subscribers are stored as an immutable tuple so publishing never holds the lock
+_RUN_EVENT_SUBSCRIBERS: tuple = ()
+_RUN_EVENT_LOCK = threading.Lock()
+
+def subscribe_run_events(callback) -> None:
+    """Register ``callback(event)`` for every run event.
+
+    Events are dicts with ``type`` (``output``, ``reset``, ``downloaded``,
+    ``skipped``, ``error``, ``run_finished``), ``kind`` (task / one_time),
+    ``source`` (task slug, empty for one-time runs) and ``run_id``.
+    Callbacks run on the runner's threads and must not block.
+    """
+    global _RUN_EVENT_SUBSCRIBERS
+    with _RUN_EVENT_LOCK:
+        _RUN_EVENT_SUBSCRIBERS = _RUN_EVENT_SUBSCRIBERS + (callback,)
+
+def unsubscribe_run_events(callback) -> None:
+    global _RUN_EVENT_SUBSCRIBERS
+    with _RUN_EVENT_LOCK:
+        _RUN_EVENT_SUBSCRIBERS = tuple(cb for cb in _RUN_EVENT_SUBSCRIBERS if cb is not callback)
+
+def _publish_run_event(event: dict) -> None:
+    for cb in _RUN_EVENT_SUBSCRIBERS:
+        try:
+            cb(event)
+        except Exception:
+            app.logger.exception("Run event subscriber failed for %s event", event.get("type"))
+
+def _append_run_log(logs_path: str, text: str, kind: str, source: str) -> None:
+    """Append an Artillery message to a log outside of a running pipeline."""
+    with open(logs_path, "a", encoding="utf-8") as logf:
+        logf.write(text)
+    _publish_run_event({"type": "output", "kind": kind, "source": source, "run_id": None, "text": text})
+
+
+DOWNLOAD_HOOK_ENABLED = os.environ.get("ARTILLERY_DOWNLOAD_HOOK", "1") == "1"
+DOWNLOAD_SPOOL_DIR = os.path.join(CONFIG_ROOT, "spool")
+DOWNLOAD_SPOOL_POLL_SECONDS = 0.5
+
+def _download_spool_path(kind: str, source: str) -> str:
+    os.makedirs(DOWNLOAD_SPOOL_DIR, exist_ok=True)
+    stamp = dt.datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    return os.path.join(DOWNLOAD_SPOOL_DIR, f"{kind}-{source or 'run'}-{stamp}-{secrets.token_hex(4)}.spool")
+
+def _inject_download_hook(cmd_parts: List[str], spool_path: str) -> List[str]:
+    """Add a gallery-dl exec postprocessor that appends every completed
+    file's path to ``spool_path``, NUL-terminated so any filename is safe."""
+    if not cmd_parts or os.path.basename(cmd_parts[0]) != "gallery-dl":
+        return cmd_parts
+    hook = "printf '%s\\0' {} >> " + shlex.quote(spool_path)
+    return [cmd_parts[0], "--exec", hook] + cmd_parts[1:]
+
+
+class _DownloadSpool:
+    """Reader for the append-only spool written by the gallery-dl hook."""
+
+    def __init__(self, path: str, cwd: Optional[str] = None):
+        self.path = path
+        self.cwd = cwd or os.getcwd()
+        self._offset = 0
+        self._partial = b""
+
+    def drain(self) -> List[str]:
+        """Return relpaths (under DOWNLOADS_ROOT) appended since the last call."""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        if not data:
+            return []
+        self._offset += len(data)
+        *entries, self._partial = (self._partial + data).split(b"\0")
+        root = os.path.abspath(DOWNLOADS_ROOT)
+        rels = []
+        for raw in entries:
+            if not raw:
+                continue
+            path = os.path.abspath(os.path.join(self.cwd, os.fsdecode(raw)))
+            rel = os.path.relpath(path, root)
+            if rel.startswith(".."):
+                continue
+            rels.append(rel.replace(os.sep, "/"))
+        return rels
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            app.logger.debug("Could not remove download spool %s", self.path)
+
+
+class RunOutputPipeline:
+    """Single consumer of a child process's merged stdout/stderr.
+
+    Each line is cleaned (progress redraws collapsed, ANSI stripped), optionally
+    timestamped, appended to the run log with batched flushes and classified
+    into ``downloaded`` / ``skipped`` / ``error`` run events.
+    """
+
+    def __init__(self, logf, kind: str, source: str, run_id: str, timestamps: bool = RUN_LOG_TIMESTAMPS,
+                 spool: Optional[_DownloadSpool] = None):
+        self.logf = logf
+        self.spool = spool
+        self.kind = kind
+        self.source = source
+        self.run_id = run_id
+        self.timestamps = timestamps
+        self.downloaded = 0
+        self.skipped = 0
+        self._errors: collections.deque = collections.deque(maxlen=30)
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._thread: Optional[threading.Thread] = None
+        self._spool_thread: Optional[threading.Thread] = None
+
+    def _event(self, type_: str, **fields) -> None:
+        event = {"type": type_, "kind": self.kind, "source": self.source, "run_id": self.run_id}
+        event.update(fields)
+        _publish_run_event(event)
+
+    def _append(self, text: str) -> None:
+        with self._lock:
+            self.logf.write(text)
+            now = time.monotonic()
+            if now - self._last_flush >= RUN_LOG_FLUSH_SECONDS:
+                self.logf.flush()
+                self._last_flush = now
+        self._event("output", text=text)
+
+    def write(self, text: str) -> None:
+        """Write an Artillery message (run header, footer) verbatim."""
+        self._append(text)
+
+    def flush(self) -> None:
+        with self._lock:
+            self.logf.flush()
+            self._last_flush = time.monotonic()
+
+    def feed(self, raw: bytes) -> None:
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if "\r" in line:
+            # Progress bars redraw the same line with \r — keep only its final state
+            segments = [seg for seg in line.split("\r") if seg.strip()]
+            line = segments[-1] if segments else ""
+        line = _ANSI_ESCAPE_RE.sub("", line)
+        if self.timestamps and line:
+            self._append(f"{dt.datetime.now().strftime('%H:%M:%S')} {line}\n")
+        else:
+            self._append(line + "\n")
+        self._classify(line.strip())
+
+    def _classify(self, line: str) -> None:
+        if not line:
+            return
+        if _ERROR_LINE_RE.search(line):
+            if not self._errors or self._errors[-1] != line:
+                self._errors.append(line)
+            self._event("error", line=line)
+            return
+        # gallery-dl prints "# <path>" for files that already exist
+        skipped = line.startswith("# ")
+        if self.spool is not None and not skipped:
+            return  # downloads are reported exactly by the hook spool
+        rel = _extract_relpath_from_log_line(line[2:] if skipped else line, DOWNLOADS_ROOT)
+        if not rel:
+            return
+        if skipped:
+            self.skipped += 1
+            self._event("skipped", rel=rel)
+        else:
+            self.downloaded += 1
+            self._event("downloaded", rel=rel)
+
+    def error_summary(self) -> str:
+        return _summarise_error_lines(list(self._errors))
+
+    def _pump(self, stream) -> None:
+        try:
+            for raw in iter(stream.readline, b""):
+                self.feed(raw)
+        except Exception:
+            app.logger.exception("Output pipeline failed for %s %s", self.kind, self.source)
+        finally:
+            try:
+                stream.close()
+            except Exception:
+                app.logger.debug("Could not close child output stream")
+
+    def poll_spool(self) -> None:
+        if self.spool is None:
+            return
+        for rel in self.spool.drain():
+            self.downloaded += 1
+            self._event("downloaded", rel=rel)
+
+    def _spool_loop(self) -> None:
+        while self._thread is not None and self._thread.is_alive():
+            self.poll_spool()
+            time.sleep(DOWNLOAD_SPOOL_POLL_SECONDS)
+
+    def start(self, stream) -> None:
+        self._thread = threading.Thread(target=self._pump, args=(stream,), daemon=True)
+        self._thread.start()
+        if self.spool is not None:
+            self._spool_thread = threading.Thread(target=self._spool_loop, daemon=True)
+            self._spool_thread.start()
+
+    def finish(self, timeout: float = 10.0) -> None:
+        """Wait for the child's output to drain, then flush the log."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # A grandchild still holds the pipe open; stop waiting for it
+                app.logger.warning("Output pipeline for %s %s did not drain in %.0fs", self.kind, self.source, timeout)
+        if self._spool_thread is not None:
+            self._spool_thread.join(DOWNLOAD_SPOOL_POLL_SECONDS * 2)
+        if self.spool is not None:
+            self.poll_spool()
+            self.spool.remove()
+        self.flush()
+
 # ---------------------------------------------------------------------
 # Media wall (DB + cache folder)
 # ---------------------------------------------------------------------
 
 MEDIA_WALL_DIR = os.path.join(CONFIG_ROOT, "media_wall")
+MEDIA_WALL_MANIFEST_FILE = os.path.join(CONFIG_ROOT, "media_wall.json")
 MEDIA_WALL_SCAN_CRON_FILE = os.path.join(CONFIG_ROOT, "mediawall_scan_cron.txt")
 MEDIA_WALL_ENABLED_FILE = os.path.join(CONFIG_ROOT, "mediawall_enabled.txt")
 
 MEDIA_WALL_REFRESH_LOCK = threading.Lock()
 _HISTORY_LOCK          = threading.Lock()  # serialises concurrent run_history.jsonl writes
 
-# Disable aggressive caching of send_from_directory responses
+# Disable aggressive caching of send_file responses
 app.config["SEND_FILE_MAX_AGE_DEFAULT"] = 0
 
 
@@ -199,25 +459,66 @@ MEDIA_WALL_ENABLED_DEFAULT = os.environ.get("MEDIA_WALL_ENABLED", "1") == "1"
 MEDIA_WALL_ITEMS_ON_PAGE = int(os.environ.get("MEDIA_WALL_ITEMS", "45"))
 MEDIA_WALL_CACHE_VIDEOS = os.environ.get("MEDIA_WALL_CACHE_VIDEOS", "0") == "1"
 MEDIA_WALL_COPY_LIMIT = int(os.environ.get("MEDIA_WALL_COPY_LIMIT", "100"))
+MEDIA_WALL_COPY_WORKERS = int(os.environ.get("MEDIA_WALL_COPY_WORKERS", "4"))
+MEDIA_WALL_CACHE_MODE = os.environ.get("MEDIA_WALL_CACHE_MODE", "auto").strip().lower()
+MEDIA_WALL_RECENCY_HALF_LIFE_DAYS = float(os.environ.get("MEDIA_WALL_RECENCY_HALF_LIFE_DAYS", "0") or "0")
+MEDIA_WALL_VIDEO_WEIGHT = float(os.environ.get("MEDIA_WALL_VIDEO_WEIGHT", "1") or "1")
+MEDIA_WALL_TASK_WEIGHTS = os.environ.get("MEDIA_WALL_TASK_WEIGHTS", "")
+MEDIA_WALL_ROTATE_PERCENT = max(1, min(100, int(os.environ.get("MEDIA_WALL_ROTATE_PERCENT", "25"))))
 MEDIA_WALL_AUTO_INGEST_ON_TASK_END = os.environ.get("MEDIA_WALL_AUTO_INGEST_ON_TASK_END", "1") == "1"
 MEDIA_WALL_AUTO_REFRESH_ON_TASK_END = os.environ.get("MEDIA_WALL_AUTO_REFRESH_ON_TASK_END", "1") == "1"
 MEDIA_WALL_MIN_REFRESH_SECONDS = int(os.environ.get("MEDIA_WALL_MIN_REFRESH_SECONDS", "300"))
+MEDIA_WALL_THUMBNAILS = os.environ.get("MEDIA_WALL_THUMBNAILS", "1") == "1"
+MEDIA_WALL_THUMB_EDGE = int(os.environ.get("MEDIA_WALL_THUMB_EDGE", "640"))
+MEDIA_WALL_THUMB_FORMAT = "jpeg" if os.environ.get("MEDIA_WALL_THUMB_FORMAT", "webp").lower() in ("jpg", "jpeg") else "webp"
+MEDIA_WALL_THUMB_QUALITY = int(os.environ.get("MEDIA_WALL_THUMB_QUALITY", "80"))
+MEDIA_WORKERS = int(os.environ.get("MEDIA_WORKERS", "0") or "0") or min(4, os.cpu_count() or 1)
+MEDIA_WALL_VIDEO_PREVIEWS = os.environ.get("MEDIA_WALL_VIDEO_PREVIEWS", "0") == "1"
+MEDIA_WALL_VIDEO_PREVIEW_SECONDS = int(os.environ.get("MEDIA_WALL_VIDEO_PREVIEW_SECONDS", "4"))
+MEDIA_WALL_VIDEO_WORKERS = int(os.environ.get("MEDIA_WALL_VIDEO_WORKERS", "2"))
+MEDIA_WALL_FFMPEG_TIMEOUT = int(os.environ.get("MEDIA_WALL_FFMPEG_TIMEOUT", "60"))
 MEDIA_WALL_SSE_ENABLED = os.environ.get("MEDIA_WALL_SSE", "0") == "1"
 MEDIA_WALL_SCAN_CRON_DEFAULT = os.environ.get("MEDIA_WALL_SCAN_CRON", "*/1 * * * *")
 MEDIA_WALL_POLL_INTERVAL = int(os.environ.get("MEDIA_WALL_POLL_INTERVAL", "60"))
 MEDIA_WALL_LOG_TAIL_LINES = int(os.environ.get("MEDIA_WALL_LOG_TAIL_LINES", "2000"))
 RECENT_DOWNLOADS_PER_TASK = int(os.environ.get("RECENT_DOWNLOADS_PER_TASK", "20"))
-RECENT_LOG_TAIL_LINES = int(os.environ.get("RECENT_LOG_TAIL_LINES", "200"))
 ONE_TIME_LOG_FILE = os.path.join(CONFIG_ROOT, "one_time_download.log")
 ONE_TIME_PID_FILE = os.path.join(CONFIG_ROOT, "one_time_download.pid")
 ONE_TIME_STOP_FILE = os.path.join(CONFIG_ROOT, "one_time_download.stop")
 ONE_TIME_LOG_TAIL_LINES = int(os.environ.get("ONE_TIME_LOG_TAIL_LINES", "50"))
 ONE_TIME_RECENT_DOWNLOADS = int(os.environ.get("ONE_TIME_RECENT_DOWNLOADS", "16"))
 
-# Media wall notify file for SSE
+# Media wall notify file for SSE; only needed when several gunicorn workers
+# serve clients, since a refresh in one worker cannot wake another's condition.
 MEDIAWALL_NOTIFY_FILE = os.path.join(os.environ.get('CONFIG_DIR', '/config'), 'mediawall.notify')
+MEDIAWALL_NOTIFY_CROSS_PROCESS = os.environ.get(
+    "MEDIA_WALL_NOTIFY_CROSS_PROCESS",
+    "1" if int(os.environ.get("WEB_CONCURRENCY", "1") or "1") > 1 else "0",
+) == "1"
+
+class _MediaWallNotifier:
+    """Version counter SSE clients block on until the wall changes."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self.version = 0
+
+    def notify(self) -> None:
+        with self._cond:
+            self.version += 1
+            self._cond.notify_all()
+
+    def wait(self, seen: int, timeout: float) -> int:
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != seen, timeout)
+            return self.version
+
+_MEDIAWALL_NOTIFIER = _MediaWallNotifier()
 
 def touch_mediawall_notify():
+    _MEDIAWALL_NOTIFIER.notify()
+    if not MEDIAWALL_NOTIFY_CROSS_PROCESS:
+        return
     try:
         os.makedirs(os.path.dirname(MEDIAWALL_NOTIFY_FILE), exist_ok=True)
         with open(MEDIAWALL_NOTIFY_FILE, 'a'):
@@ -438,68 +739,83 @@ def _task_mtimes(task_path: str) -> dict:
         "timeout":    _mt(os.path.join(task_path, "timeout.txt")),
     }
 
-def _cache_name_for_relpath(relpath: str) -> str:
-    ext = os.path.splitext(relpath)[1].lower()
-    h = hashlib.sha1(relpath.encode("utf-8", errors="ignore")).hexdigest()
-    return f"{h}{ext}"
+class _LogPathExtractor:
+    """Finds media paths under one downloads root in gallery-dl / yt-dlp output.
 
-def _extract_relpath_from_log_line(line: str, downloads_root: str) -> Optional[str]:
-    s = line.strip()
-    if not s:
-        return None
+    Built once per root: the pattern is compiled up front and whole tail
+    buffers are scanned in one pass. The pattern starts with the root's name
+    so the regex engine can skip ahead with a literal search; what precedes
+    the root is checked by hand, because a lookbehind would disable that.
+    """
 
-    s = s.replace("\\", "/")
-    dr = downloads_root.replace("\\", "/").rstrip("/")
-    dr_short = dr.lstrip("/")
+    _EXT_PATTERN = "|".join(sorted(e.lstrip(".") for e in MEDIA_EXTS))
 
-    # Prefer full-line match to handle spaces in folders
-    media_pattern = r"(?:jpg|jpeg|png|gif|webp|mp4|webm|mkv)"
-    full_match = re.search(re.escape(dr) + r"/[^\r\n]*?\." + media_pattern, s, re.IGNORECASE)
-    if full_match:
-        cand = full_match.group(0)
-        rel = cand[len(dr):].lstrip("/")
-        if rel:
-            return rel
-
-    candidates = [tok for tok in re.split(r"\s+", s) if tok.startswith(dr)]
-    if not candidates and dr in s:
-        idx = s.find(dr)
-        if idx != -1:
-            cand = s[idx:].strip(" ,;\"'()[]")
-            candidates = [cand]
-
-    for cand in candidates:
-        if cand == dr or cand.startswith(dr + "/"):
-            rel = cand[len(dr):].lstrip("/")
-            if not rel:
-                continue
-            ext = os.path.splitext(rel)[1].lower()
-            if ext and ext in MEDIA_EXTS:
-                return rel
-        if cand.startswith(dr_short + "/"):
-            rel = cand[len(dr_short):].lstrip("/")
-            if not rel:
-                continue
-            ext = os.path.splitext(rel)[1].lower()
-            if ext and ext in MEDIA_EXTS:
-                return rel
-
-    # Fallback: search for any media path containing downloads/ without a leading slash
-    media_match = re.search(r"(?:^|\s)([^\s\"']+\.(?:jpg|jpeg|png|gif|webp|mp4|webm|mkv))(?:$|\s)", s, re.IGNORECASE)
-    if media_match:
-        cand = media_match.group(1)
-        cand = cand.strip(" ,;\"'()[]")
-        cand = cand.replace("\\", "/")
-        if dr in cand:
-            rel = cand.split(dr, 1)[-1].lstrip("/")
-            if rel:
-                return rel
-        if ("/" + dr_short + "/") in cand or cand.startswith(dr_short + "/"):
-            rel = cand.split(dr_short + "/", 1)[-1].lstrip("/")
-            if rel:
-                return rel
+    def __init__(self, downloads_root: str):
+        dr = downloads_root.replace("\\", "/").rstrip("/")
+        self.needle = dr.lstrip("/")
+        self._re = re.compile(
+            re.escape(self.needle) + r"/"
+            r"(?P<rel>[^\r\n]*?\.(?i:" + self._EXT_PATTERN + r"))"
+            r"(?=$|[\s\"',;)\]])",
+            re.MULTILINE,
+        )
 
-    return None
+    @staticmethod
+    def _is_path_char(c: str) -> bool:
+        return c.isalnum() or c in "_.-"
+
+    def _at_root(self, text: str, i: int) -> bool:
+        """Whether the match at ``i`` is the root itself: the absolute root,
+        or the root without its leading slash (also as ./downloads), but never
+        the tail of a longer path (/tmp/downloads is not /downloads)."""
+        if not i:
+            return True
+        if text[i - 1] != "/":
+            return not self._is_path_char(text[i - 1])
+        i -= 1
+        if i and text[i - 1] == ".":
+            i -= 1
+        return not i or not self._is_path_char(text[i - 1])
+
+    def _prepare(self, text: str) -> str:
+        if "\\" in text:
+            text = text.replace("\\", "/")
+        if "\x1b" in text:
+            text = _ANSI_ESCAPE_RE.sub("", text)
+        return text
+
+    def _scan(self, text: str):
+        search = self._re.search
+        pos = 0
+        while True:
+            m = search(text, pos)
+            if m is None:
+                return
+            if self._at_root(text, m.start()):
+                yield m.group("rel")
+                pos = m.end()
+            else:
+                # Not the root; a real path may still start inside this match
+                pos = m.start() + 1
+
+    def extract(self, line: str) -> Optional[str]:
+        if not self.needle or self.needle not in line:
+            return None
+        return next(self._scan(self._prepare(line)), None)
+
+    def iter_relpaths(self, text: str):
+        """Yield every relpath in ``text`` (a decoded log buffer), in order."""
+        if not self.needle or self.needle not in text:
+            return
+        yield from self._scan(self._prepare(text))
+
+
+@functools.lru_cache(maxsize=4)
+def _path_extractor(downloads_root: str) -> _LogPathExtractor:
+    return _LogPathExtractor(downloads_root)
+
+def _extract_relpath_from_log_line(line: str, downloads_root: str) -> Optional[str]:
+    return _path_extractor(downloads_root).extract(line)
 
 def _count_file_lines(path: str) -> int:
     """Count lines in a file by streaming in chunks — safe for very large files."""
@@ -516,7 +832,8 @@ def _count_file_lines(path: str) -> int:
         return 0
 
 
-def _tail_lines(path: str, max_lines: int = 500, chunk_size: int = 8192) -> List[str]:
+def _tail_text(path: str, max_lines: int = 500, chunk_size: int = 8192) -> str:
+    """Return roughly the last ``max_lines`` lines of a file as one string."""
     try:
         with open(path, "rb") as f:
             f.seek(0, os.SEEK_END)
@@ -531,57 +848,1428 @@ def _tail_lines(path: str, max_lines: int = 500, chunk_size: int = 8192) -> List
                 chunk = f.read(read_size)
                 buffer[:0] = chunk
                 lines = buffer.count(b"\n")
-            text = buffer.decode("utf-8", errors="ignore")
-            return text.splitlines()[-max_lines:]
+            if lines > max_lines:
+                # drop the partial/extra leading lines
+                cut = 0
+                for _ in range(lines - max_lines):
+                    cut = buffer.index(b"\n", cut) + 1
+                del buffer[:cut]
+            return buffer.decode("utf-8", errors="ignore")
     except Exception:
-        return []
+        return ""
+
+def _tail_lines(path: str, max_lines: int = 500, chunk_size: int = 8192) -> List[str]:
+    return _tail_text(path, max_lines, chunk_size).splitlines()[-max_lines:]
+
+# ---------------------------------------------------------------------
+# Download catalog (SQLite, fed by run events)
+# ---------------------------------------------------------------------
+
+CATALOG_DB = os.path.join(CONFIG_ROOT, "downloads.sqlite3")
+CATALOG_RECONCILE_CRON = os.environ.get("CATALOG_RECONCILE_CRON", "17 */6 * * *")
+
+_CATALOG_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    relpath    TEXT PRIMARY KEY,
+    kind       TEXT NOT NULL,
+    source     TEXT NOT NULL DEFAULT '',
+    run_id     TEXT,
+    size       INTEGER,
+    mtime      REAL,
+    media_type TEXT NOT NULL,
+    added_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_downloads_source ON downloads(kind, source, added_at DESC);
+CREATE INDEX IF NOT EXISTS idx_downloads_added ON downloads(added_at DESC);
+CREATE INDEX IF NOT EXISTS idx_downloads_run ON downloads(run_id);
+CREATE TABLE IF NOT EXISTS crawl_dirs (
+    relpath  TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    subdirs  TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS thumb_cache (
+    name        TEXT PRIMARY KEY,
+    size        INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_thumb_cache_access ON thumb_cache(last_access);
+CREATE TABLE IF NOT EXISTS media_meta (
+    relpath   TEXT PRIMARY KEY,
+    size      INTEGER NOT NULL,
+    mtime     REAL NOT NULL,
+    width     INTEGER,
+    height    INTEGER,
+    lqip      TEXT,
+    probed_at REAL NOT NULL
+);
+"""
+
+# Columns added after a table first shipped: (table, column, declaration)
+_CATALOG_ADDED_COLUMNS = (
+    ("media_meta", "duration", "REAL"),
+    ("media_meta", "codec", "TEXT"),
+    ("media_meta", "frames", "INTEGER"),
+    ("media_meta", "corrupt", "INTEGER NOT NULL DEFAULT 0"),
+    ("media_meta", "dhash", "INTEGER"),
+    ("media_meta", "dhash_failed_at", "REAL"),
+)
+
+def _catalog_migrate(conn: sqlite3.Connection) -> None:
+    for table, column, decl in _CATALOG_ADDED_COLUMNS:
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+_CATALOG_LOCAL = threading.local()
+_CATALOG_INIT_LOCK = threading.Lock()
+_CATALOG_READY = False
+
+def _catalog_conn() -> sqlite3.Connection:
+    """Per-thread connection to the catalog; creates the schema on first use."""
+    global _CATALOG_READY
+    conn = getattr(_CATALOG_LOCAL, "conn", None)
+    if conn is not None:
+        return conn
+    os.makedirs(CONFIG_ROOT, exist_ok=True)
+    conn = sqlite3.connect(CATALOG_DB, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if not _CATALOG_READY:
+        with _CATALOG_INIT_LOCK:
+            if not _CATALOG_READY:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.executescript(_CATALOG_SCHEMA)
+                _catalog_migrate(conn)
+                conn.commit()
+                _CATALOG_READY = True
+    _CATALOG_LOCAL.conn = conn
+    return conn
+
+def _media_type_for_ext(ext: str) -> Optional[str]:
+    if ext in IMAGE_EXTS:
+        return "image"
+    if ext in VIDEO_EXTS:
+        return "video"
+    return None
+
+def _catalog_record(rel: str, kind: str, source: str, run_id: Optional[str], replace: bool = True) -> bool:
+    """Add (or refresh) one downloaded file. ``replace=False`` keeps an
+    existing row untouched, e.g. for files gallery-dl skipped."""
+    media_type = _media_type_for_ext(os.path.splitext(rel)[1].lower())
+    if media_type is None:
+        return False
+    try:
+        st = os.stat(os.path.join(DOWNLOADS_ROOT, rel))
+    except OSError:
+        return False
+    conflict = (
+        "DO UPDATE SET kind=excluded.kind, source=excluded.source, run_id=excluded.run_id, "
+        "size=excluded.size, mtime=excluded.mtime, added_at=excluded.added_at"
+        if replace else "DO NOTHING"
+    )
+    try:
+        conn = _catalog_conn()
+        with conn:
+            conn.execute(
+                "INSERT INTO downloads (relpath, kind, source, run_id, size, mtime, media_type, added_at) "
+                f"VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(relpath) {conflict}",
+                (rel, kind, source, run_id, st.st_size, st.st_mtime, media_type, time.time()),
+            )
+        return True
+    except sqlite3.Error:
+        app.logger.warning("catalog: could not record %s", rel, exc_info=True)
+        return False
+
+def _catalog_forget(rels) -> None:
+    rels = list(rels)
+    if not rels:
+        return
+    try:
+        conn = _catalog_conn()
+        with conn:
+            conn.executemany("DELETE FROM downloads WHERE relpath = ?", [(r,) for r in rels])
+    except sqlite3.Error:
+        app.logger.warning("catalog: could not remove %d stale row(s)", len(rels), exc_info=True)
+
+def _catalog_rename_source(old_slug: str, new_slug: str) -> None:
+    try:
+        conn = _catalog_conn()
+        with conn:
+            conn.execute(
+                "UPDATE downloads SET source = ? WHERE kind = ? AND source = ?",
+                (new_slug, RUN_KIND_TASK, old_slug),
+            )
+    except sqlite3.Error:
+        app.logger.warning("catalog: could not rename source %s -> %s", old_slug, new_slug, exc_info=True)
+
+def _catalog_recent(kind: str, source: str, limit: int) -> List[dict]:
+    """Newest catalogued downloads for a task or the one-time downloader.
+
+    Rows whose file has disappeared are pruned on the way through.
+    """
+    items: List[dict] = []
+    missing: List[str] = []
+    offset = 0
+    try:
+        conn = _catalog_conn()
+        while len(items) < limit:
+            rows = conn.execute(
+                "SELECT relpath FROM downloads WHERE kind = ? AND source = ? "
+                "ORDER BY added_at DESC LIMIT ? OFFSET ?",
+                (kind, source, limit, offset),
+            ).fetchall()
+            if not rows:
+                break
+            offset += len(rows)
+            for row in rows:
+                rel = row["relpath"]
+                if not os.path.isfile(os.path.join(DOWNLOADS_ROOT, rel)):
+                    missing.append(rel)
+                    continue
+                items.append({
+                    "rel": rel,
+                    "ext": os.path.splitext(rel)[1].lower(),
+                    "filename": os.path.basename(rel),
+                })
+                if len(items) >= limit:
+                    break
+    except sqlite3.Error:
+        app.logger.warning("catalog: recent query failed for %s %s", kind, source, exc_info=True)
+    _catalog_forget(missing)
+    return items
 
-def _recent_downloads_from_log(log_path: str, limit: int) -> List[dict]:
-    if not os.path.exists(log_path):
+def _catalog_iter_media(media_types, batch_size: int = 1000):
+    """Stream (relpath, kind, source, mtime, media_type) rows without
+    materialising the whole library."""
+    try:
+        conn = _catalog_conn()
+        placeholders = ",".join("?" for _ in media_types)
+        cur = conn.cursor()
+        cur.row_factory = None  # plain tuples; sqlite3.Row is measurably slower per row
+        # Files the probe found unreadable are left out
+        cur.execute(
+            "SELECT d.relpath, d.kind, d.source, d.mtime, d.media_type FROM downloads d "
+            "LEFT JOIN media_meta m ON m.relpath = d.relpath AND m.corrupt = 1 AND m.size = d.size AND m.mtime = d.mtime "
+            f"WHERE d.media_type IN ({placeholders}) AND m.relpath IS NULL",
+            tuple(media_types),
+        )
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+    except sqlite3.Error:
+        app.logger.warning("catalog: media query failed", exc_info=True)
+
+def _catalog_known(rels, media_types) -> set:
+    """The subset of ``rels`` present in the catalog with one of ``media_types``
+    and not marked unreadable by the probe."""
+    rels = list(dict.fromkeys(rels))
+    known = set()
+    try:
+        conn = _catalog_conn()
+        types = ",".join("?" for _ in media_types)
+        for i in range(0, len(rels), 500):
+            chunk = rels[i:i + 500]
+            rows = conn.execute(
+                "SELECT d.relpath FROM downloads d "
+                "LEFT JOIN media_meta m ON m.relpath = d.relpath AND m.corrupt = 1 AND m.size = d.size AND m.mtime = d.mtime "
+                f"WHERE d.relpath IN ({','.join('?' for _ in chunk)}) AND d.media_type IN ({types}) AND m.relpath IS NULL",
+                (*chunk, *media_types),
+            )
+            known.update(row["relpath"] for row in rows)
+    except sqlite3.Error:
+        app.logger.warning("catalog: lookup failed", exc_info=True)
+    return known
+
+def _catalog_run_relpaths(kind: str, source: str, run_id: str, media_types) -> List[str]:
+    """Media recorded by one run, newest first."""
+    try:
+        conn = _catalog_conn()
+        placeholders = ",".join("?" for _ in media_types)
+        rows = conn.execute(
+            f"SELECT relpath FROM downloads WHERE kind = ? AND source = ? AND run_id = ?"
+            f" AND media_type IN ({placeholders}) ORDER BY added_at DESC",
+            (kind, source, run_id, *media_types),
+        )
+        return [row["relpath"] for row in rows]
+    except sqlite3.Error:
+        app.logger.warning("catalog: run query failed", exc_info=True)
         return []
 
-    lines = _tail_lines(log_path, max_lines=RECENT_LOG_TAIL_LINES)
-    items = []
-    seen = set()
+def _catalog_reconcile(batch_size: int = 1000) -> int:
+    """Drop rows whose files no longer exist. Returns the number removed."""
+    removed = 0
+    last = ""
+    try:
+        conn = _catalog_conn()
+        while True:
+            rows = conn.execute(
+                "SELECT relpath FROM downloads WHERE relpath > ? ORDER BY relpath LIMIT ?",
+                (last, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            last = rows[-1]["relpath"]
+            gone = [r["relpath"] for r in rows if not os.path.isfile(os.path.join(DOWNLOADS_ROOT, r["relpath"]))]
+            _catalog_forget(gone)
+            removed += len(gone)
+    except sqlite3.Error:
+        app.logger.warning("catalog: reconcile failed", exc_info=True)
+    app.logger.info("catalog: reconcile removed %d missing file(s)", removed)
+    return removed
+
+def _catalog_seed_from_logs() -> None:
+    """One-off backfill from existing log tails so an upgraded install
+    doesn't start with empty recent views."""
+    try:
+        conn = _catalog_conn()
+        if conn.execute("SELECT 1 FROM downloads LIMIT 1").fetchone():
+            return
+    except sqlite3.Error:
+        app.logger.warning("catalog: could not check for existing rows", exc_info=True)
+        return
 
-    for line in reversed(lines):
-        rel = _extract_relpath_from_log_line(line, DOWNLOADS_ROOT)
-        if not rel:
-            continue
-        if rel in seen:
+    sources = [(RUN_KIND_ONE_TIME, "", ONE_TIME_LOG_FILE)]
+    if os.path.isdir(TASKS_ROOT):
+        for slug in sorted(os.listdir(TASKS_ROOT)):
+            sources.append((RUN_KIND_TASK, slug, os.path.join(TASKS_ROOT, slug, "logs.txt")))
+
+    seeded = 0
+    for kind, source, log_path in sources:
+        if not os.path.isfile(log_path):
             continue
+        text = _tail_text(log_path, max_lines=MEDIA_WALL_LOG_TAIL_LINES)
+        for rel in dict.fromkeys(_path_extractor(DOWNLOADS_ROOT).iter_relpaths(text)):
+            if _catalog_record(rel, kind, source, None):
+                seeded += 1
+    app.logger.info("catalog: seeded %d file(s) from existing logs", seeded)
+
+def _catalog_on_run_event(event: dict) -> None:
+    etype = event.get("type")
+    if etype == "downloaded":
+        _catalog_record(event["rel"], event["kind"], event["source"], event["run_id"])
+    elif etype in ("skipped", "new_media"):
+        _catalog_record(event["rel"], event["kind"], event["source"], event["run_id"], replace=False)
+
+subscribe_run_events(_catalog_on_run_event)
+
+# ---------------------------------------------------------------------
+# Media probe (dimensions, codec, duration, frames, corruption, LQIP)
+# ---------------------------------------------------------------------
+
+MEDIA_META_BATCH = 32
+MEDIA_PROBE_TIMEOUT = int(os.environ.get("MEDIA_PROBE_TIMEOUT", "20"))
+# How long a batch waits for the shared pools before leaving the rest for later
+MEDIA_PROBE_QUEUE_TIMEOUT = int(os.environ.get("MEDIA_PROBE_QUEUE_TIMEOUT", "300"))
+MEDIA_PROBE_BACKFILL_LIMIT = int(os.environ.get("MEDIA_PROBE_BACKFILL_LIMIT", "5000"))
+
+_MEDIA_META_QUEUE: "queue.Queue[str]" = queue.Queue()
+_MEDIA_META_PENDING: set = set()
+_MEDIA_META_LOCK = threading.Lock()
+_MEDIA_META_THREAD_STARTED = False
+
+@functools.lru_cache(maxsize=1)
+def _ffprobe_available() -> bool:
+    return shutil.which("ffprobe") is not None
+
+def _probe_video(src: str) -> dict:
+    """ffprobe the first video stream; raises when ffprobe rejects the file."""
+    proc = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "stream=width,height,codec_name,nb_frames:format=duration",
+         "-of", "json", src],
+        capture_output=True, timeout=MEDIA_PROBE_TIMEOUT,
+    )
+    if proc.returncode != 0:
+        raise ValueError(proc.stderr.decode("utf-8", errors="replace")[-300:])
+    data = json.loads(proc.stdout or b"{}")
+    streams = data.get("streams") or []
+    if not streams:
+        raise ValueError("no video stream")
+    stream = streams[0]
+    def _num(value, cast):
+        try:
+            return cast(value)
+        except (TypeError, ValueError):
+            return None
+    return {
+        "width": _num(stream.get("width"), int),
+        "height": _num(stream.get("height"), int),
+        "codec": stream.get("codec_name"),
+        "frames": _num(stream.get("nb_frames"), int),
+        "duration": _num((data.get("format") or {}).get("duration"), float),
+    }
+
+def _probable(rel: str) -> bool:
+    ext = os.path.splitext(rel)[1].lower()
+    return ext in IMAGE_EXTS or (ext in VIDEO_EXTS and _ffprobe_available())
+
+def _media_meta_enqueue(rels) -> None:
+    """Queue files for probing; already-queued paths are ignored."""
+    global _MEDIA_META_THREAD_STARTED
+    with _MEDIA_META_LOCK:
+        fresh = [rel for rel in rels if rel not in _MEDIA_META_PENDING and _probable(rel)]
+        _MEDIA_META_PENDING.update(fresh)
+        if fresh and not _MEDIA_META_THREAD_STARTED:
+            _MEDIA_META_THREAD_STARTED = True
+            threading.Thread(target=_media_meta_worker, name="media-probe", daemon=True).start()
+    for rel in fresh:
+        _MEDIA_META_QUEUE.put(rel)
+
+def _media_meta_worker() -> None:
+    """Probe queued files in batches: images in the media process pool,
+    videos with ffprobe from the ffmpeg thread pool. A file that fails to
+    decode, or whose probe itself runs past MEDIA_PROBE_TIMEOUT, is stored
+    as corrupt so it is not retried until it changes.
+
+    Both pools are shared with thumbnails, variants and previews, so time
+    spent queued behind them does not count: probes still waiting after
+    MEDIA_PROBE_QUEUE_TIMEOUT are dropped from the batch unrecorded and
+    queued again by the next lookup or backfill."""
+    while True:
+        batch = [_MEDIA_META_QUEUE.get()]
+        while len(batch) < MEDIA_META_BATCH:
+            try:
+                batch.append(_MEDIA_META_QUEUE.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            rows = []
+            futures = {}
+            for rel in batch:
+                src = os.path.join(DOWNLOADS_ROOT, rel)
+                try:
+                    st = os.stat(src)
+                except OSError:
+                    continue
+                if os.path.splitext(rel)[1].lower() in VIDEO_EXTS:
+                    fut = _video_pool().submit(_probe_video, src)
+                else:
+                    fut = _media_pool().submit(media_worker.probe_image, src, timeout=MEDIA_PROBE_TIMEOUT)
+                futures[fut] = (rel, st)
+            _done, waiting = concurrent.futures.wait(futures, timeout=MEDIA_PROBE_QUEUE_TIMEOUT)
+            if waiting:
+                app.logger.info("probe: %d file(s) still queued after %ss, retrying later",
+                                len(waiting), MEDIA_PROBE_QUEUE_TIMEOUT)
+            for fut, (rel, st) in futures.items():
+                if fut in waiting:
+                    fut.cancel()
+                    continue
+                try:
+                    info = fut.result()
+                    corrupt = 0
+                except (concurrent.futures.CancelledError, concurrent.futures.BrokenExecutor):
+                    continue  # not the file's fault; probed again later
+                except Exception as exc:
+                    app.logger.info("probe: %s unreadable (%s)", rel, str(exc).strip()[:200] or type(exc).__name__)
+                    info, corrupt = {}, 1
+                rows.append((
+                    rel, st.st_size, st.st_mtime, info.get("width"), info.get("height"), info.get("lqip"),
+                    info.get("duration"), info.get("codec"), info.get("frames"), corrupt, time.time(),
+                ))
+            if rows:
+                conn = _catalog_conn()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO media_meta (relpath, size, mtime, width, height, lqip, "
+                        "duration, codec, frames, corrupt, probed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+        except Exception:
+            app.logger.exception("probe: batch failed")
+        finally:
+            with _MEDIA_META_LOCK:
+                _MEDIA_META_PENDING.difference_update(batch)
+
+def _media_probe_backfill() -> int:
+    """Queue catalogued files whose probe result is missing or stale."""
+    try:
+        rows = _catalog_conn().execute(
+            "SELECT d.relpath FROM downloads d LEFT JOIN media_meta m ON m.relpath = d.relpath "
+            "WHERE m.relpath IS NULL OR m.size != d.size OR m.mtime != d.mtime LIMIT ?",
+            (MEDIA_PROBE_BACKFILL_LIMIT,),
+        ).fetchall()
+    except sqlite3.Error:
+        app.logger.warning("probe: backfill query failed", exc_info=True)
+        return 0
+    _media_meta_enqueue(row["relpath"] for row in rows)
+    return len(rows)
+
+def _media_meta_lookup(rels) -> dict:
+    """{rel: {width, height, lqip}} for rels with current metadata; the
+    rest are queued for the background worker."""
+    rels = list(dict.fromkeys(rels))
+    found = {}
+    try:
+        conn = _catalog_conn()
+        for i in range(0, len(rels), 500):
+            chunk = rels[i:i + 500]
+            # Rows only count while size and mtime still match the catalog
+            rows = conn.execute(
+                "SELECT m.relpath, m.width, m.height, m.lqip FROM media_meta m "
+                "JOIN downloads d ON d.relpath = m.relpath AND d.size = m.size AND d.mtime = m.mtime "
+                f"WHERE m.relpath IN ({','.join('?' for _ in chunk)})",
+                chunk,
+            )
+            for row in rows:
+                meta = {}
+                if row["width"] and row["height"]:
+                    meta = {"width": row["width"], "height": row["height"]}
+                    if row["lqip"]:
+                        meta["lqip"] = row["lqip"]
+                found[row["relpath"]] = meta
+    except sqlite3.Error:
+        app.logger.warning("meta: lookup failed", exc_info=True)
+        return {}
+    _media_meta_enqueue(rel for rel in rels if rel not in found)
+    return {rel: meta for rel, meta in found.items() if meta}
+
+def _media_is_corrupt(rel: str) -> bool:
+    try:
+        row = _catalog_conn().execute(
+            "SELECT m.corrupt FROM media_meta m "
+            "JOIN downloads d ON d.relpath = m.relpath AND d.size = m.size AND d.mtime = m.mtime "
+            "WHERE m.relpath = ?", (rel,),
+        ).fetchone()
+    except sqlite3.Error:
+        return False
+    return bool(row and row["corrupt"])
+
+def _media_meta_on_run_event(event: dict) -> None:
+    if event.get("type") in ("downloaded", "new_media"):
+        _media_meta_enqueue([event["rel"]])
+
+subscribe_run_events(_media_meta_on_run_event)
+
+# ---------------------------------------------------------------------
+# Near-duplicate detection (64-bit dHash + BK-tree)
+# ---------------------------------------------------------------------
+
+DUPLICATE_SCAN_CRON = os.environ.get("DUPLICATE_SCAN_CRON", "*/15 * * * *").strip()
+DUPLICATE_MAX_DISTANCE = int(os.environ.get("DUPLICATE_MAX_DISTANCE", "8"))
+DHASH_BATCH = 256
+DHASH_MAX_PER_RUN = int(os.environ.get("DHASH_MAX_PER_RUN", "20000"))
+DHASH_RETRY_AFTER = 24 * 3600
+DUPLICATE_REPORT_MAX_CLUSTERS = 200
+
+_DHASH_LOCK = threading.Lock()
+# Kept and extended by the dhash job: the BK-tree of every hash, every pair
+# of hashes within DUPLICATE_MAX_DISTANCE and the catalog rows of the
+# hashes that have a near-duplicate
+_DUPLICATE_INDEX: Optional[dict] = None
+_DUPLICATE_REPORT_CACHE: dict = {"key": None, "report": None}
+_DUPLICATE_REPORT_LOCK = threading.Lock()
+
+def _to_sqlite_int(h: int) -> int:
+    return h - (1 << 64) if h >= (1 << 63) else h
+
+def _from_sqlite_int(h: int) -> int:
+    return h & 0xFFFFFFFFFFFFFFFF
+
+class BKTree:
+    """Burkhard-Keller tree over 64-bit hashes with Hamming distance.
 
-        abs_path = os.path.join(DOWNLOADS_ROOT, rel)
-        if not os.path.isfile(abs_path):
+    Children are keyed by their distance to the parent, so a radius-r
+    query only descends into children whose key lies in [d - r, d + r].
+    """
+
+    def __init__(self):
+        self._root = None  # [hash, {distance: node}]
+
+    def add(self, h: int) -> None:
+        if self._root is None:
+            self._root = [h, {}]
+            return
+        node = self._root
+        while True:
+            d = (h ^ node[0]).bit_count()
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [h, {}]
+                return
+            node = child
+
+    def query(self, h: int, radius: int) -> List[Tuple[int, int]]:
+        """(hash, distance) pairs within ``radius`` of ``h``."""
+        out = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            d = (h ^ node[0]).bit_count()
+            if d <= radius:
+                out.append((node[0], d))
+            for key, child in node[1].items():
+                if d - radius <= key <= d + radius:
+                    stack.append(child)
+        return out
+
+def _dhash_pending(conn: sqlite3.Connection, limit: int) -> List[str]:
+    rows = conn.execute(
+        "SELECT m.relpath FROM media_meta m "
+        "JOIN downloads d ON d.relpath = m.relpath AND d.size = m.size AND d.mtime = m.mtime "
+        "WHERE d.media_type = 'image' AND m.corrupt = 0 AND m.dhash IS NULL "
+        "AND (m.dhash_failed_at IS NULL OR m.dhash_failed_at < ?) LIMIT ?",
+        (time.time() - DHASH_RETRY_AFTER, limit),
+    ).fetchall()
+    return [row["relpath"] for row in rows]
+
+def _dhash_job() -> int:
+    """Hash probed images that have no dHash yet and add them to the
+    duplicate index. Probe rows are rewritten when a file changes, which
+    clears its hash, so each run only touches new or modified downloads.
+
+    A file that fails to hash keeps its probe result (marking files
+    corrupt is the probe worker's job); it is retried after
+    DHASH_RETRY_AFTER.
+    """
+    if not _DHASH_LOCK.acquire(blocking=False):
+        return 0
+    done = 0
+    hashed: List[Tuple[str, int]] = []
+    try:
+        conn = _catalog_conn()
+        while done < DHASH_MAX_PER_RUN:
+            rels = _dhash_pending(conn, DHASH_BATCH)
+            if not rels:
+                break
+            paths = [os.path.join(DOWNLOADS_ROOT, rel) for rel in rels]
+            try:
+                hashes = _media_pool().submit(media_worker.dhash_batch, paths).result(timeout=300)
+            except Exception:
+                app.logger.warning("dhash: batch failed", exc_info=True)
+                break
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "UPDATE media_meta SET dhash = ?, dhash_failed_at = ? WHERE relpath = ?",
+                    [
+                        (None, now, rel) if h is None else (_to_sqlite_int(h), None, rel)
+                        for rel, h in zip(rels, hashes)
+                    ],
+                )
+            hashed.extend((rel, h) for rel, h in zip(rels, hashes) if h is not None)
+            done += len(rels)
+        if done:
+            app.logger.info("dhash: hashed %d of %d image(s)", len(hashed), done)
+        index = _DUPLICATE_INDEX
+        if index is None or not _duplicate_index_current(conn, index) or not _duplicate_index_add(conn, index, hashed):
+            _duplicate_index_build(conn)
+    except sqlite3.Error:
+        app.logger.warning("dhash: catalog error", exc_info=True)
+    finally:
+        _DHASH_LOCK.release()
+    return done
+
+def _duplicate_member_rows(conn: sqlite3.Connection, rels) -> dict:
+    """{rel: row} for hashed, current catalog rows among ``rels``."""
+    rels = list(rels)
+    out = {}
+    for i in range(0, len(rels), 500):
+        chunk = rels[i:i + 500]
+        rows = conn.execute(
+            "SELECT m.relpath, m.width, m.height, d.size, d.kind, d.source FROM media_meta m "
+            "JOIN downloads d ON d.relpath = m.relpath AND d.size = m.size AND d.mtime = m.mtime "
+            f"WHERE m.relpath IN ({','.join('?' for _ in chunk)}) AND m.dhash IS NOT NULL AND m.corrupt = 0",
+            chunk,
+        ).fetchall()
+        out.update((row["relpath"], dict(row)) for row in rows)
+    return out
+
+def _duplicate_index_current(conn: sqlite3.Connection, index: dict) -> bool:
+    """False once a file with a near-duplicate was removed or changed; only
+    those rows are checked, not the whole library."""
+    rels = [row["relpath"] for rows in index["members"].values() for row in rows]
+    return len(_duplicate_member_rows(conn, rels)) == len(rels)
+
+def _duplicate_index_add(conn: sqlite3.Connection, index: dict, new: List[Tuple[str, int]]) -> bool:
+    """Query and insert only the newly hashed files, extending the index's
+    pairs and member rows. Returns False, leaving the index untouched, if
+    a file is already indexed under an older hash; the caller rebuilds."""
+    rel_hash, by_hash, tree = index["rel_hash"], index["by_hash"], index["tree"]
+    if any(rel in rel_hash for rel, _h in new):
+        return False
+    t0 = time.monotonic()
+    # Query before adding, so each pair is found once
+    pairs = []
+    linked = set()
+    for rel, h in new:
+        rel_hash[rel] = h
+        if h in by_hash:
+            by_hash[h].append(rel)
+            linked.add(h)
             continue
+        for other, d in tree.query(h, DUPLICATE_MAX_DISTANCE):
+            pairs.append((h, other, d))
+            linked.update((h, other))
+        tree.add(h)
+        by_hash[h] = [rel]
+    rows = _duplicate_member_rows(conn, (rel for h in linked for rel in by_hash[h]))
+    members = {h: [rows[rel] for rel in by_hash[h] if rel in rows] for h in linked}
+    # The report reads pairs and members; swap them in together
+    with _DUPLICATE_REPORT_LOCK:
+        index["pairs"].extend(pairs)
+        index["members"].update(members)
+        index["hashed"] += len(new)
+        if new:
+            index["built_at"] = time.time()
+    if new and index is _DUPLICATE_INDEX:
+        app.logger.info("dhash: added %d hash(es), %d pair(s) to the duplicate index in %.1fs",
+                        len(new), len(pairs), time.monotonic() - t0)
+    return True
+
+def _duplicate_index_build(conn: sqlite3.Connection) -> None:
+    """Build the duplicate index from every hashed file. Runs in the dhash
+    job, on its first run or after an indexed file changed; later runs
+    only add their new hashes. At radius 8 each BK-tree query visits a
+    large part of the tree, which is too slow for a request on a big
+    library."""
+    global _DUPLICATE_INDEX
+    t0 = time.monotonic()
+    rows = conn.execute(
+        "SELECT m.relpath, m.dhash FROM media_meta m "
+        "JOIN downloads d ON d.relpath = m.relpath AND d.size = m.size AND d.mtime = m.mtime "
+        "WHERE m.dhash IS NOT NULL AND m.corrupt = 0",
+    ).fetchall()
+    index = {
+        "max_distance": DUPLICATE_MAX_DISTANCE,
+        "hashed": 0,
+        "built_at": time.time(),
+        "tree": BKTree(),
+        "by_hash": {},
+        "rel_hash": {},
+        "pairs": [],
+        "members": {},
+    }
+    _duplicate_index_add(conn, index, [(row["relpath"], _from_sqlite_int(row["dhash"])) for row in rows])
+    index["built_at"] = time.time()
+    _DUPLICATE_INDEX = index
+    app.logger.info("dhash: duplicate index of %d hash(es), %d pair(s) built in %.1fs",
+                    len(index["by_hash"]), len(index["pairs"]), time.monotonic() - t0)
+
+def _duplicate_report(max_distance: int) -> Optional[dict]:
+    """Near-duplicate clusters across the library, grouped per task, from
+    the index the dhash job built (None until it has run once).
+
+    Clusters are connected components of "within max_distance", capped at
+    the index's radius. In each cluster the largest-resolution (then
+    largest) file is kept; every other member's bytes count as reclaimable
+    for its task.
+    """
+    index = _DUPLICATE_INDEX
+    if index is None:
+        return None
+    max_distance = min(max_distance, index["max_distance"])
+    key = (index["built_at"], max_distance)
+    with _DUPLICATE_REPORT_LOCK:
+        if _DUPLICATE_REPORT_CACHE["key"] == key:
+            return _DUPLICATE_REPORT_CACHE["report"]
+
+        members_by_hash = index["members"]
+        parent = {h: h for h in members_by_hash}
+        def find(h):
+            while parent[h] != h:
+                parent[h] = parent[parent[h]]
+                h = parent[h]
+            return h
+        for a, b, d in index["pairs"]:
+            if d <= max_distance:
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[ra] = rb
+
+        groups: dict = collections.defaultdict(list)
+        for h, members in members_by_hash.items():
+            groups[find(h)].extend((h, row) for row in members)
+
+        tasks: dict = {}
+        total = 0
+        for members in groups.values():
+            if len(members) < 2:
+                continue
+            keep_hash, keep = max(members, key=lambda m: ((m[1]["width"] or 0) * (m[1]["height"] or 0), m[1]["size"] or 0))
+            items = [{
+                "rel": row["relpath"], "size": row["size"], "width": row["width"], "height": row["height"],
+                "task": row["source"] if row["kind"] == RUN_KIND_TASK else None,
+                "distance": (h ^ keep_hash).bit_count(), "keep": row is keep,
+            } for h, row in members]
+            for task in {item["task"] for item in items if item["task"]}:
+                reclaimable = sum(i["size"] or 0 for i in items if i["task"] == task and not i["keep"])
+                entry = tasks.setdefault(task, {"slug": task, "clusters": [], "reclaimable_bytes": 0})
+                entry["clusters"].append({"keep": keep["relpath"], "items": items, "reclaimable_bytes": reclaimable})
+                entry["reclaimable_bytes"] += reclaimable
+                total += reclaimable
+        for entry in tasks.values():
+            entry["cluster_count"] = len(entry["clusters"])
+            entry["clusters"].sort(key=lambda c: c["reclaimable_bytes"], reverse=True)
+            del entry["clusters"][DUPLICATE_REPORT_MAX_CLUSTERS:]
+
+        report = {
+            "max_distance": max_distance,
+            "hashed": index["hashed"],
+            "built_at": index["built_at"],
+            "reclaimable_bytes": total,
+            "tasks": sorted(tasks.values(), key=lambda t: t["reclaimable_bytes"], reverse=True),
+        }
+        _DUPLICATE_REPORT_CACHE.update(key=key, report=report)
+        return report
 
-        ext = os.path.splitext(rel)[1].lower()
-        items.append({
-            "rel": rel,
-            "ext": ext,
-            "filename": os.path.basename(rel),
-        })
-        seen.add(rel)
+# ---------------------------------------------------------------------
+# Downloads crawler (incremental, parallel os.scandir)
+# ---------------------------------------------------------------------
 
-        if len(items) >= limit:
-            break
+CRAWL_WORKERS = int(os.environ.get("CRAWL_WORKERS", "8"))
+CRAWL_MAX_DIRS_PER_SECOND = float(os.environ.get("CRAWL_MAX_DIRS_PER_SECOND", "0") or "0")
+CRAWL_CRON = os.environ.get("CRAWL_CRON", "").strip()
+CRAWL_PROGRESS_SECONDS = 10
 
-    return items
+_CRAWL_LOCK = threading.Lock()
+_CRAWL_STOP = threading.Event()
+_CRAWL_STATUS: dict = {"running": False, "last": None, "progress": None}
+
+def _prefix_range(rel_dir: str) -> Tuple[str, str]:
+    """Key range covering everything below ``rel_dir`` ('0' sorts right after '/')."""
+    return rel_dir + "/", rel_dir + "0"
+
+
+class DownloadsCrawler:
+    """Incremental crawler for DOWNLOADS_ROOT.
+
+    Directories are listed with ``os.scandir`` on a thread pool, since on
+    network/FUSE shares per-directory latency dominates. Each directory's
+    mtime and child directory names are persisted in ``crawl_dirs``; a
+    later scan only re-lists directories whose mtime changed and merely
+    stats the rest. State is committed per directory, so an interrupted
+    scan resumes where it stopped. Media files found are merged into the
+    download catalog as ``scan`` rows.
+    """
+
+    def __init__(self, root: str = DOWNLOADS_ROOT, workers: int = CRAWL_WORKERS,
+                 max_dirs_per_second: float = CRAWL_MAX_DIRS_PER_SECOND,
+                 stop: Optional[threading.Event] = None):
+        self.root = root
+        self.workers = max(1, workers)
+        self.min_interval = 1.0 / max_dirs_per_second if max_dirs_per_second > 0 else 0.0
+        self.stop = stop or threading.Event()
+        self._rate_lock = threading.Lock()
+        self._next_slot = 0.0
+        self.stats = {
+            "dirs_listed": 0, "dirs_unchanged": 0, "dirs_removed": 0,
+            "files_seen": 0, "files_removed": 0, "errors": 0,
+            "started": time.time(), "elapsed": 0.0,
+        }
+
+    def _throttle(self) -> None:
+        if not self.min_interval:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _visit(self, rel: str, known: Optional[Tuple[int, List[str]]]):
+        """Runs on the pool: returns (rel, mtime_ns, subdirs, files or None)."""
+        if self.stop.is_set():
+            return rel, None, [], None
+        self._throttle()
+        path = os.path.join(self.root, rel) if rel else self.root
+        try:
+            mtime_ns = os.stat(path).st_mtime_ns
+        except OSError:
+            return rel, None, [], None
+        if known is not None and known[0] == mtime_ns:
+            return rel, mtime_ns, known[1], None
+        subdirs: List[str] = []
+        files: List[Tuple[str, int, float]] = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in MEDIA_EXTS and entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        files.append((entry.name, st.st_size, st.st_mtime))
+                except OSError:
+                    continue
+        return rel, mtime_ns, sorted(subdirs), files
+
+    def _forget_subtree(self, conn: sqlite3.Connection, rel: str) -> None:
+        lo, hi = _prefix_range(rel)
+        cur = conn.execute("DELETE FROM downloads WHERE relpath >= ? AND relpath < ?", (lo, hi))
+        self.stats["files_removed"] += cur.rowcount
+        conn.execute("DELETE FROM crawl_dirs WHERE relpath = ? OR (relpath >= ? AND relpath < ?)", (rel, lo, hi))
+        self.stats["dirs_removed"] += 1
+
+    def _sync_dir(self, conn: sqlite3.Connection, rel: str, mtime_ns: int,
+                  subdirs: List[str], files: List[Tuple[str, int, float]],
+                  old_subdirs: List[str]) -> None:
+        prefix = rel + "/" if rel else ""
+        present = set()
+        for name, size, mtime in files:
+            relpath = prefix + name
+            present.add(relpath)
+            conn.execute(
+                "INSERT INTO downloads (relpath, kind, source, run_id, size, mtime, media_type, added_at) "
+                "VALUES (?, 'scan', '', NULL, ?, ?, ?, ?) "
+                "ON CONFLICT(relpath) DO UPDATE SET size=excluded.size, mtime=excluded.mtime",
+                (relpath, size, mtime, _media_type_for_ext(os.path.splitext(name)[1].lower()), mtime),
+            )
+        if rel:
+            lo, hi = _prefix_range(rel)
+            rows = conn.execute("SELECT relpath FROM downloads WHERE relpath >= ? AND relpath < ?", (lo, hi))
+        else:
+            rows = conn.execute("SELECT relpath FROM downloads WHERE instr(relpath, '/') = 0")
+        stale = [r[0] for r in rows if "/" not in r[0][len(prefix):] and r[0] not in present]
+        if stale:
+            conn.executemany("DELETE FROM downloads WHERE relpath = ?", [(r,) for r in stale])
+            self.stats["files_removed"] += len(stale)
+        for gone in set(old_subdirs) - set(subdirs):
+            self._forget_subtree(conn, prefix + gone)
+        conn.execute(
+            "INSERT OR REPLACE INTO crawl_dirs (relpath, mtime_ns, subdirs) VALUES (?, ?, ?)",
+            (rel, mtime_ns, json.dumps(subdirs)),
+        )
+        self.stats["files_seen"] += len(files)
+
+    def run(self, progress=None) -> dict:
+        conn = _catalog_conn()
+        known = {
+            row["relpath"]: (row["mtime_ns"], json.loads(row["subdirs"]))
+            for row in conn.execute("SELECT relpath, mtime_ns, subdirs FROM crawl_dirs")
+        }
+        t0 = time.monotonic()
+        last_report = t0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="crawl") as pool:
+            pending = {pool.submit(self._visit, "", known.get(""))}
+            while pending:
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in done:
+                    try:
+                        rel, mtime_ns, subdirs, files = fut.result()
+                    except Exception:
+                        self.stats["errors"] += 1
+                        app.logger.debug("crawl: directory listing failed", exc_info=True)
+                        continue
+                    if self.stop.is_set():
+                        continue
+                    try:
+                        with conn:
+                            if mtime_ns is None:
+                                if rel in known:
+                                    self._forget_subtree(conn, rel)
+                                continue
+                            if files is None:
+                                self.stats["dirs_unchanged"] += 1
+                            else:
+                                self.stats["dirs_listed"] += 1
+                                old = known.get(rel, (None, []))[1]
+                                self._sync_dir(conn, rel, mtime_ns, subdirs, files, old)
+                    except sqlite3.Error:
+                        self.stats["errors"] += 1
+                        app.logger.warning("crawl: could not record directory %r", rel, exc_info=True)
+                        continue
+                    prefix = rel + "/" if rel else ""
+                    for name in subdirs:
+                        child = prefix + name
+                        pending.add(pool.submit(self._visit, child, known.get(child)))
+                now = time.monotonic()
+                self.stats["elapsed"] = round(now - t0, 1)
+                if progress is not None and now - last_report >= CRAWL_PROGRESS_SECONDS:
+                    last_report = now
+                    progress(dict(self.stats, queued=len(pending)))
+        self.stats["elapsed"] = round(time.monotonic() - t0, 1)
+        self.stats["stopped"] = self.stop.is_set()
+        return self.stats
+
+
+def _crawl_downloads() -> Optional[dict]:
+    """Run one incremental crawl unless one is already in progress."""
+    if not os.path.isdir(DOWNLOADS_ROOT):
+        return None
+    if not _CRAWL_LOCK.acquire(blocking=False):
+        app.logger.info("crawl: skipped (already running)")
+        return None
+    try:
+        _CRAWL_STOP.clear()
+        _CRAWL_STATUS.update(running=True, progress=None)
+
+        def _progress(stats):
+            _CRAWL_STATUS["progress"] = stats
+            app.logger.info(
+                "crawl: %s listed, %s unchanged, %s files, %s queued (%.0fs)",
+                stats["dirs_listed"], stats["dirs_unchanged"], stats["files_seen"], stats["queued"], stats["elapsed"],
+            )
+
+        stats = DownloadsCrawler(stop=_CRAWL_STOP).run(progress=_progress)
+        app.logger.info("crawl: finished %s", stats)
+        _CRAWL_STATUS["last"] = stats
+        return stats
+    except Exception:
+        app.logger.exception("crawl: failed")
+        return None
+    finally:
+        _CRAWL_STATUS.update(running=False, progress=None)
+        _CRAWL_LOCK.release()
+
+# ---------------------------------------------------------------------
+# Downloads watcher (optional, inotify via ctypes — Linux only)
+# ---------------------------------------------------------------------
+
+DOWNLOADS_WATCH_ENABLED = os.environ.get("DOWNLOADS_WATCH", "0") == "1"
+DOWNLOADS_WATCH_DEBOUNCE_SECONDS = float(os.environ.get("DOWNLOADS_WATCH_DEBOUNCE", "2") or "2")
+DOWNLOADS_WATCH_FALLBACK_MINUTES = int(os.environ.get("DOWNLOADS_WATCH_FALLBACK_MINUTES", "30") or "30")
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_IGNORED     = 0x00008000
+_IN_ONLYDIR     = 0x01000000
+_IN_ISDIR       = 0x40000000
+_INOTIFY_EVENT  = struct.Struct("iIII")
+
+
+class DownloadsWatcher:
+    """Recursive inotify watch on DOWNLOADS_ROOT.
+
+    Close-write and moved-in events for media files are debounced and
+    published as ``new_media`` events. New directories get watches as they
+    appear. If the kernel's watch limit is hit (or the event queue
+    overflows) the watcher keeps the watches it has and falls back to
+    periodic incremental crawls for completeness.
+    """
+
+    MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_ONLYDIR
+
+    def __init__(self, root: str = DOWNLOADS_ROOT):
+        self.root = os.path.abspath(root)
+        self.degraded = False
+        self._fd = -1
+        self._libc = None
+        self._wds: dict = {}
+        self._pending: dict = {}
+
+    def _add_watch(self, path: str) -> bool:
+        if self.degraded:
+            return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                self._degrade("inotify watch limit reached (raise fs.inotify.max_user_watches)")
+            elif err not in (errno.ENOENT, errno.ENOTDIR):
+                app.logger.debug("watch: could not watch %s: %s", path, os.strerror(err))
+            return False
+        self._wds[wd] = path
+        return True
+
+    def _add_tree(self, top: str, announce_existing: bool) -> None:
+        stack = [top]
+        while stack:
+            path = stack.pop()
+            if not self._add_watch(path):
+                if self.degraded:
+                    return
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif announce_existing:
+                            # files that landed before the watch existed
+                            self._touch(entry.path)
+            except OSError:
+                continue
+
+    def _degrade(self, reason: str) -> None:
+        if self.degraded:
+            return
+        self.degraded = True
+        app.logger.warning("watch: %s — falling back to a crawl every %d min", reason, DOWNLOADS_WATCH_FALLBACK_MINUTES)
+        try:
+            _bg_scheduler.add_job(
+                _crawl_downloads, "interval", minutes=DOWNLOADS_WATCH_FALLBACK_MINUTES,
+                id="downloads_watch_fallback", replace_existing=True,
+            )
+        except Exception:
+            app.logger.warning("watch: could not schedule fallback crawl", exc_info=True)
+        threading.Thread(target=_crawl_downloads, daemon=True).start()
+
+    def _touch(self, path: str) -> None:
+        if os.path.splitext(path)[1].lower() in MEDIA_EXTS:
+            self._pending[path] = time.monotonic()
+
+    def _flush(self, force: bool = False) -> None:
+        cutoff = time.monotonic() - DOWNLOADS_WATCH_DEBOUNCE_SECONDS
+        ready = [p for p, t in self._pending.items() if force or t <= cutoff]
+        for path in ready:
+            del self._pending[path]
+            if not os.path.isfile(path):
+                continue
+            rel = os.path.relpath(path, self.root).replace(os.sep, "/")
+            _publish_run_event({"type": "new_media", "kind": "watch", "source": "", "run_id": None, "rel": rel})
+
+    def _handle(self, buf: bytes) -> None:
+        pos = 0
+        while pos + _INOTIFY_EVENT.size <= len(buf):
+            wd, mask, _cookie, length = _INOTIFY_EVENT.unpack_from(buf, pos)
+            pos += _INOTIFY_EVENT.size
+            name = buf[pos:pos + length].rstrip(b"\0")
+            pos += length
+            if mask & _IN_Q_OVERFLOW:
+                app.logger.warning("watch: event queue overflowed — running a crawl to catch up")
+                threading.Thread(target=_crawl_downloads, daemon=True).start()
+                continue
+            if mask & _IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            parent = self._wds.get(wd)
+            if parent is None or not name:
+                continue
+            path = os.path.join(parent, os.fsdecode(name))
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._add_tree(path, announce_existing=True)
+            elif mask & (_IN_CLOSE_WRITE | _IN_MOVED_TO):
+                self._touch(path)
+
+    def start(self) -> bool:
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            self._fd = self._libc.inotify_init1(os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            app.logger.warning("watch: inotify is not available on this platform")
+            return False
+        if self._fd < 0:
+            app.logger.warning("watch: inotify_init1 failed: %s", os.strerror(ctypes.get_errno()))
+            return False
+        threading.Thread(target=self._run, name="downloads-watch", daemon=True).start()
+        return True
+
+    def _run(self) -> None:
+        self._add_tree(self.root, announce_existing=False)
+        app.logger.info("watch: watching %d director(ies) under %s (degraded=%s)", len(self._wds), self.root, self.degraded)
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        while True:
+            timeout_ms = int(DOWNLOADS_WATCH_DEBOUNCE_SECONDS * 1000) if self._pending else None
+            try:
+                if poller.poll(timeout_ms):
+                    self._handle(os.read(self._fd, 65536))
+                self._flush()
+            except Exception:
+                app.logger.exception("watch: event loop error")
+                time.sleep(1)
+
+
+_DOWNLOADS_WATCHER: Optional[DownloadsWatcher] = None
+
+def _start_downloads_watcher() -> None:
+    global _DOWNLOADS_WATCHER
+    if _DOWNLOADS_WATCHER is not None or not os.path.isdir(DOWNLOADS_ROOT):
+        return
+    watcher = DownloadsWatcher()
+    if watcher.start():
+        _DOWNLOADS_WATCHER = watcher
+
+# ---------------------------------------------------------------------
+# Media worker pool (Pillow work runs in separate processes)
+# ---------------------------------------------------------------------
+
+_MEDIA_POOL: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_MEDIA_POOL_LOCK = threading.Lock()
+
+def _media_pool() -> concurrent.futures.ProcessPoolExecutor:
+    global _MEDIA_POOL
+    with _MEDIA_POOL_LOCK:
+        if _MEDIA_POOL is None:
+            # spawn, not fork: forking this multi-threaded process is unsafe
+            _MEDIA_POOL = concurrent.futures.ProcessPoolExecutor(
+                max_workers=MEDIA_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_MEDIA_POOL.shutdown, wait=False, cancel_futures=True)
+        return _MEDIA_POOL
+
+def _wall_thumbnails_enabled() -> bool:
+    return MEDIA_WALL_THUMBNAILS and media_worker.pillow_available()
+
+def _wall_cache_name(rel: str, st: os.stat_result, ext: str) -> str:
+    """Cache name keyed by source path, mtime and size: a changed source
+    gets a new name, an unchanged one is never reprocessed."""
+    key = f"{rel}\0{st.st_mtime_ns}\0{st.st_size}"
+    return hashlib.sha1(key.encode("utf-8", errors="ignore")).hexdigest() + ext
+
+# Video entries on the wall: "<key>.poster.jpg" plus an optional "<key>.preview.mp4"
+WALL_POSTER_SUFFIX = ".poster.jpg"
+WALL_PREVIEW_SUFFIX = ".preview.mp4"
+
+_VIDEO_POOL: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+def _video_pool() -> concurrent.futures.ThreadPoolExecutor:
+    # Threads are enough here: each job just waits on an ffmpeg child
+    global _VIDEO_POOL
+    with _MEDIA_POOL_LOCK:
+        if _VIDEO_POOL is None:
+            _VIDEO_POOL = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, MEDIA_WALL_VIDEO_WORKERS), thread_name_prefix="ffmpeg",
+            )
+        return _VIDEO_POOL
 
-def _clean_dir(path: str):
-    os.makedirs(path, exist_ok=True)
-    for fn in os.listdir(path):
+def _run_ffmpeg(args: List[str], dst: str) -> bool:
+    """Run ffmpeg writing to a temp file, then move it into place."""
+    tmp = dst + ".tmp"
+    cmd = ["ffmpeg", "-nostdin", "-v", "error", "-y"] + args + [tmp]
+    try:
+        proc = subprocess.run(cmd, capture_output=True, timeout=MEDIA_WALL_FFMPEG_TIMEOUT)
+        if proc.returncode == 0 and os.path.getsize(tmp) > 0:
+            os.replace(tmp, dst)
+            return True
+        app.logger.debug("ffmpeg failed (%s): %s", proc.returncode, proc.stderr[-500:])
+    except subprocess.TimeoutExpired:
+        app.logger.warning("ffmpeg timed out after %ss for %s", MEDIA_WALL_FFMPEG_TIMEOUT, dst)
+    except OSError:
+        app.logger.debug("ffmpeg could not run for %s", dst, exc_info=True)
+    try:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    except Exception:
+        app.logger.debug("Could not remove tmp file %s", tmp)
+    return False
+
+def _make_video_poster(src: str, dst: str) -> bool:
+    scale = f"scale='min({MEDIA_WALL_THUMB_EDGE},iw)':-2"
+    # Seek a second in to skip black intro frames; very short clips fall back to the first frame
+    for offset in ("1", "0"):
+        if _run_ffmpeg(["-ss", offset, "-i", src, "-frames:v", "1", "-vf", scale, "-q:v", "5", "-f", "mjpeg"], dst):
+            return True
+    return False
+
+def _make_video_preview(src: str, dst: str) -> bool:
+    return _run_ffmpeg([
+        "-i", src, "-t", str(MEDIA_WALL_VIDEO_PREVIEW_SECONDS), "-an",
+        "-vf", "scale='min(480,iw)':-2,fps=15",
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "32", "-pix_fmt", "yuv420p",
+        "-movflags", "+faststart", "-f", "mp4",
+    ], dst)
+
+@functools.lru_cache(maxsize=1)
+def _ffmpeg_available() -> bool:
+    return shutil.which("ffmpeg") is not None
+
+# How originals are materialized in MEDIA_WALL_DIR
+WALL_CACHE_MODES = ("copy", "hardlink", "reflink", "symlink")
+_FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+def _reflink(src: str, dst: str) -> None:
+    with open(src, "rb") as fin, open(dst, "wb") as fout:
+        fcntl.ioctl(fout.fileno(), _FICLONE, fin.fileno())
+
+def _link_file(mode: str, src: str, dst: str) -> None:
+    if mode == "hardlink":
+        os.link(src, dst)
+    elif mode == "reflink":
+        _reflink(src, dst)
+    elif mode == "symlink":
+        os.symlink(os.path.abspath(src), dst)
+    else:
+        shutil.copy2(src, dst)
+
+@functools.lru_cache(maxsize=1)
+def _wall_cache_mode() -> str:
+    """Resolve MEDIA_WALL_CACHE_MODE; "auto" probes /config once and picks
+    reflink, then hardlink, falling back to copy across devices."""
+    if MEDIA_WALL_CACHE_MODE in WALL_CACHE_MODES:
+        return MEDIA_WALL_CACHE_MODE
+    if MEDIA_WALL_CACHE_MODE != "auto":
+        app.logger.warning("mediawall: unknown MEDIA_WALL_CACHE_MODE '%s', using copy", MEDIA_WALL_CACHE_MODE)
+        return "copy"
+    try:
+        os.makedirs(MEDIA_WALL_DIR, exist_ok=True)
+        if os.stat(DOWNLOADS_ROOT).st_dev != os.stat(MEDIA_WALL_DIR).st_dev:
+            app.logger.info("mediawall: cache mode auto -> copy (downloads on another device)")
+            return "copy"
+    except OSError:
+        return "copy"
+    probe = os.path.join(MEDIA_WALL_DIR, ".probe")
+    chosen = "copy"
+    try:
+        with open(probe, "wb") as f:
+            f.write(b"probe")
+        for mode in ("reflink", "hardlink"):
+            try:
+                _link_file(mode, probe, probe + "." + mode)
+                chosen = mode
+                break
+            except OSError:
+                continue
+    except OSError:
+        app.logger.debug("mediawall: cache mode probe failed", exc_info=True)
+    finally:
+        for path in (probe, probe + ".reflink", probe + ".hardlink"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                app.logger.debug("Could not remove probe file %s", path)
+    app.logger.info("mediawall: cache mode auto -> %s", chosen)
+    return chosen
+
+def _copy_into_wall(src: str, dst: str) -> bool:
+    """Place an original on the wall using the configured cache mode,
+    falling back to a plain copy (e.g. EXDEV on a cross-device link)."""
+    tmp = dst + ".tmp"
+    mode = _wall_cache_mode()
+    for attempt in ((mode, "copy") if mode != "copy" else ("copy",)):
         try:
-            os.remove(os.path.join(path, fn))
+            if os.path.lexists(tmp):
+                os.remove(tmp)
+            _link_file(attempt, src, tmp)
+            os.replace(tmp, dst)
+            return True
         except Exception:
-            app.logger.warning("Could not remove media wall cache file %s", fn, exc_info=True)
+            app.logger.log(
+                logging.DEBUG if attempt != "copy" else logging.WARNING,
+                "Could not %s media wall file %s", attempt, src, exc_info=True,
+            )
+    try:
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+    except Exception:
+        app.logger.debug("Could not remove tmp file %s", tmp)
+    return False
 
-def _refresh_media_wall_cache_from_downloads() -> dict:
-    ensure_data_dirs(ensure_downloads=True)
+def _read_wall_manifest() -> dict:
+    try:
+        with open(MEDIA_WALL_MANIFEST_FILE, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and isinstance(manifest.get("items"), list):
+            return manifest
+    except FileNotFoundError:
+        pass
+    except Exception:
+        app.logger.warning("mediawall: unreadable manifest, starting fresh", exc_info=True)
+    return {"version": 0, "items": []}
+
+def _write_wall_manifest(version: int, items: List[dict]) -> None:
+    """Atomically replace the manifest; readers see the old or the new one, never a mix."""
+    tmp = MEDIA_WALL_MANIFEST_FILE + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": version, "generated_at": int(time.time()), "items": items}, f)
+    os.replace(tmp, MEDIA_WALL_MANIFEST_FILE)
+
+# Parsed manifest for request handlers, reloaded when the file changes
+_WALL_MANIFEST_CACHE: dict = {"key": None, "manifest": {"version": 0, "items": []}}
+
+def _wall_manifest() -> dict:
+    try:
+        st = os.stat(MEDIA_WALL_MANIFEST_FILE)
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+    except OSError:
+        key = None
+    if key != _WALL_MANIFEST_CACHE["key"]:
+        _WALL_MANIFEST_CACHE["manifest"] = _read_wall_manifest() if key else {"version": 0, "items": []}
+        _WALL_MANIFEST_CACHE["key"] = key
+    return _WALL_MANIFEST_CACHE["manifest"]
+
+_WALL_COPY_POOL: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+def _wall_copy_pool() -> concurrent.futures.ThreadPoolExecutor:
+    global _WALL_COPY_POOL
+    with _MEDIA_POOL_LOCK:
+        if _WALL_COPY_POOL is None:
+            _WALL_COPY_POOL = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, MEDIA_WALL_COPY_WORKERS), thread_name_prefix="wall-copy",
+            )
+        return _WALL_COPY_POOL
+
+def _parse_task_weights(raw: str) -> dict:
+    """``"slug=3,other=0.5"`` -> {"slug": 3.0, "other": 0.5}"""
+    weights = {}
+    for part in raw.split(","):
+        slug, sep, value = part.partition("=")
+        if not sep:
+            continue
+        try:
+            weights[slug.strip()] = max(0.0, float(value))
+        except ValueError:
+            app.logger.warning("mediawall: ignoring task weight '%s'", part.strip())
+    return weights
+
+_WALL_TASK_WEIGHTS = _parse_task_weights(MEDIA_WALL_TASK_WEIGHTS)
 
-    allowed = set(IMAGE_EXTS)
-    if MEDIA_WALL_CACHE_VIDEOS:
-        allowed |= set(VIDEO_EXTS)
+def _weighted_sample(rows, k: int, exclude: set) -> List[str]:
+    """Weighted sampling without replacement in one pass (A-Res).
+
+    Each row gets the key log(-log u) - log w and the k smallest keys win,
+    which is equivalent to Efraimidis-Spirakis' u ** (1/w) but stays finite
+    for tiny weights (a plain 0.5 ** age would underflow for old files).
+    Memory is O(k) no matter how many rows stream past.
+    """
+    if k <= 0:
+        return []
+    log_video = math.log(MEDIA_WALL_VIDEO_WEIGHT) if MEDIA_WALL_VIDEO_WEIGHT > 0 else None
+    log_tasks = {slug: (math.log(w) if w > 0 else None) for slug, w in _WALL_TASK_WEIGHTS.items()}
+    decay = math.log(2) / (MEDIA_WALL_RECENCY_HALF_LIFE_DAYS * 86400) if MEDIA_WALL_RECENCY_HALF_LIFE_DAYS > 0 else 0.0
+    now = time.time()
+    expovariate, log = random.expovariate, math.log
+    heap: List[Tuple[float, str]] = []  # max-heap on key via negation
+    for rel, kind, source, mtime, media_type in rows:
+        if rel in exclude:
+            continue
+        log_w = 0.0
+        if media_type == "video":
+            if log_video is None:
+                continue
+            log_w = log_video
+        if kind == RUN_KIND_TASK and source in log_tasks:
+            if log_tasks[source] is None:
+                continue
+            log_w += log_tasks[source]
+        if decay and mtime and mtime < now:
+            log_w -= (now - mtime) * decay
+        key = log(expovariate(1.0) or 5e-324) - log_w
+        if len(heap) < k:
+            heapq.heappush(heap, (-key, rel))
+        elif key < -heap[0][0]:
+            heapq.heapreplace(heap, (-key, rel))
+    return [rel for _, rel in sorted(heap, reverse=True)]
+
+def _pick_wall_items(media_types: List[str], previous: List[dict], prefer: Optional[List[str]] = None) -> List[str]:
+    """Keep most of the current wall and rotate in MEDIA_WALL_ROTATE_PERCENT
+    fresh picks, so a refresh only touches the entries that changed.
+
+    With ``prefer`` (an ingest), those paths replace wall entries instead
+    of sampled picks.
+    """
+    limit = MEDIA_WALL_COPY_LIMIT
+    previous_rels = [e["rel"] for e in previous if e.get("rel")]
+    known = _catalog_known(previous_rels + list(prefer or []), media_types)
+    if prefer is not None:
+        added = [rel for rel in dict.fromkeys(prefer) if rel in known][:limit]
+        added_set = set(added)
+        still_valid = [rel for rel in dict.fromkeys(previous_rels) if rel in known and rel not in added_set]
+        return added + random.sample(still_valid, k=min(len(still_valid), limit - len(added)))
+    still_valid = [rel for rel in dict.fromkeys(previous_rels) if rel in known]
+    rotate = max(1, math.ceil(limit * MEDIA_WALL_ROTATE_PERCENT / 100))
+    kept = random.sample(still_valid, k=min(len(still_valid), limit - rotate))
+    fresh = _weighted_sample(_catalog_iter_media(media_types), limit - len(kept), set(kept))
+    return kept + fresh
+
+def _refresh_media_wall_cache_from_downloads(prefer: Optional[List[str]] = None) -> dict:
+    """Bring MEDIA_WALL_DIR in line with a newly sampled target set.
+
+    Missing entries are generated first, then the manifest is swapped, and
+    only then are stale files removed, so the wall is never empty mid-refresh.
+    ``prefer`` puts specific downloads on the wall (see _pick_wall_items).
+    """
+    ensure_data_dirs(ensure_downloads=True)
 
     if not MEDIA_WALL_REFRESH_LOCK.acquire(blocking=False):
         app.logger.info("mediawall: refresh skipped (lock busy)")
@@ -589,143 +2277,208 @@ def _refresh_media_wall_cache_from_downloads() -> dict:
 
     try:
         app.logger.info("mediawall: refresh started (cache_videos=%s, copy_limit=%s)", MEDIA_WALL_CACHE_VIDEOS, MEDIA_WALL_COPY_LIMIT)
-        items = set()
+        os.makedirs(MEDIA_WALL_DIR, exist_ok=True)
+        media_types = ["image"] + (["video"] if MEDIA_WALL_CACHE_VIDEOS else [])
+        previous = _read_wall_manifest()
+        picked = _pick_wall_items(media_types, previous["items"], prefer)
 
-        tasks_seen = 0
-        if os.path.isdir(TASKS_ROOT):
-            for slug in sorted(os.listdir(TASKS_ROOT)):
-                task_dir = os.path.join(TASKS_ROOT, slug)
-                if not os.path.isdir(task_dir):
-                    continue
-                log_path = os.path.join(task_dir, "logs.txt")
-                if not os.path.exists(log_path):
-                    continue
-                tasks_seen += 1
-                try:
-                    for line in _tail_lines(log_path, max_lines=MEDIA_WALL_LOG_TAIL_LINES):
-                        rel = _extract_relpath_from_log_line(line, DOWNLOADS_ROOT)
-                        if not rel:
-                            continue
-                        ext = os.path.splitext(rel)[1].lower()
-                        if ext in allowed:
-                            src = os.path.join(DOWNLOADS_ROOT, rel)
-                            if os.path.isfile(src):
-                                items.add(rel)
-                except Exception:
-                    continue
-        app.logger.info("mediawall: scanned logs (tasks=%s, items=%s)", tasks_seen, len(items))
-
-        if not items:
-            app.logger.info("mediawall: no log items found, scanning downloads...")
-            for root, _dirs, files in os.walk(DOWNLOADS_ROOT):
-                for fn in files:
-                    ext = os.path.splitext(fn)[1].lower()
-                    if ext not in allowed:
-                        continue
-                    path = os.path.join(root, fn)
-                    rel = os.path.relpath(path, DOWNLOADS_ROOT)
-                    if os.path.isfile(path):
-                        items.add(rel)
+        if not picked and prefer is None:
+            app.logger.info("mediawall: catalog empty, crawling downloads...")
+            _crawl_downloads()
+            picked = _pick_wall_items(media_types, previous["items"])
 
-        if not items:
+        if not picked:
             app.logger.info("mediawall: refresh found 0 items")
             return {"picked": 0, "copied": 0}
 
-        items_list = list(items)
-        pick_count = min(MEDIA_WALL_COPY_LIMIT, len(items_list))
-        picked = random.sample(items_list, k=pick_count)
-
-        _clean_dir(MEDIA_WALL_DIR)
-
-        copied = 0
+        thumbs = _wall_thumbnails_enabled()
+        thumb_ext = ".jpg" if MEDIA_WALL_THUMB_FORMAT == "jpeg" else ".webp"
         failed = 0
+        entries = []
         for rel in picked:
             src = os.path.join(DOWNLOADS_ROOT, rel)
-            dst = os.path.join(MEDIA_WALL_DIR, _cache_name_for_relpath(rel))
-            tmp = dst + ".tmp"
             try:
-                if not os.path.isfile(src):
+                st = os.stat(src)
+            except OSError:
+                failed += 1
+                continue
+            ext = os.path.splitext(rel)[1].lower()
+            # GIFs keep their animation; videos become a poster (+ preview clip)
+            if thumbs and ext in IMAGE_EXTS and ext != ".gif":
+                entries.append({"rel": rel, "src": src, "st": st, "name": _wall_cache_name(rel, st, thumb_ext), "action": "thumb"})
+            elif ext in VIDEO_EXTS and _ffmpeg_available():
+                entry = {"rel": rel, "src": src, "st": st, "name": _wall_cache_name(rel, st, WALL_POSTER_SUFFIX), "action": "poster"}
+                if MEDIA_WALL_VIDEO_PREVIEWS:
+                    entry["preview"] = _wall_cache_name(rel, st, WALL_PREVIEW_SUFFIX)
+                entries.append(entry)
+            else:
+                entries.append({"rel": rel, "src": src, "st": st, "name": _wall_cache_name(rel, st, ext), "action": "copy"})
+
+        copied = generated = reused = 0
+        futures = {}
+        for entry in entries:
+            src, action, preview = entry["src"], entry["action"], entry.get("preview")
+            dst = os.path.join(MEDIA_WALL_DIR, entry["name"])
+            if preview and not os.path.exists(os.path.join(MEDIA_WALL_DIR, preview)):
+                fut = _video_pool().submit(_make_video_preview, src, os.path.join(MEDIA_WALL_DIR, preview))
+                futures[fut] = (entry, "preview")
+            if os.path.exists(dst):
+                reused += 1
+            elif action == "poster":
+                futures[_video_pool().submit(_make_video_poster, src, dst)] = (entry, action)
+            elif action == "thumb":
+                fut = _media_pool().submit(
+                    media_worker.make_thumbnail, src, dst,
+                    MEDIA_WALL_THUMB_EDGE, MEDIA_WALL_THUMB_FORMAT, MEDIA_WALL_THUMB_QUALITY,
+                )
+                futures[fut] = (entry, action)
+            else:
+                futures[_wall_copy_pool().submit(_copy_into_wall, src, dst)] = (entry, action)
+
+        for fut, (entry, action) in futures.items():
+            rel, src = entry["rel"], entry["src"]
+            try:
+                # ffmpeg enforces its own timeout; the margin covers the poster retry
+                ok = fut.result(timeout=MEDIA_WALL_FFMPEG_TIMEOUT * 2 + 10 if action in ("poster", "preview") else 120)
+            except Exception:
+                app.logger.warning("mediawall: %s failed for %s", action, rel, exc_info=action == "thumb")
+                ok = False
+            if action == "thumb":
+                if not ok:
+                    # Fall back to the original file under its own cache name
+                    entry["name"] = _wall_cache_name(rel, entry["st"], os.path.splitext(rel)[1].lower())
+                    ok = _copy_into_wall(src, os.path.join(MEDIA_WALL_DIR, entry["name"]))
+                    copied += int(ok)
+                else:
+                    generated += 1
+            elif ok:
+                if action == "copy":
+                    copied += 1
+                else:
+                    generated += 1
+            if not ok:
+                if action == "preview":
+                    entry.pop("preview", None)
+                else:
+                    entry["failed"] = True
                     failed += 1
-                    continue
-                shutil.copy2(src, tmp)
-                os.replace(tmp, dst)
-                copied += 1
+                if action in ("poster", "preview"):
+                    app.logger.warning("mediawall: could not generate video %s for %s", action, rel)
+
+        manifest_items = []
+        for entry in entries:
+            if entry.get("failed"):
+                continue
+            item = {"name": entry["name"], "rel": entry["rel"], "mtime": int(entry["st"].st_mtime)}
+            if entry.get("preview"):
+                item["preview"] = entry["preview"]
+            manifest_items.append(item)
+        version = int(previous.get("version") or 0) + 1
+        _write_wall_manifest(version, manifest_items)
+
+        live = {e["name"] for e in manifest_items} | {e["preview"] for e in manifest_items if "preview" in e}
+        removed = 0
+        for fn in os.listdir(MEDIA_WALL_DIR):
+            if fn in live:
+                continue
+            try:
+                os.remove(os.path.join(MEDIA_WALL_DIR, fn))
+                removed += 1
             except Exception:
-                failed += 1
-                app.logger.warning("Could not copy media wall file %s", rel, exc_info=True)
-                try:
-                    if os.path.exists(tmp):
-                        os.remove(tmp)
-                except Exception:
-                    app.logger.debug("Could not remove tmp file %s", tmp)
+                app.logger.warning("Could not remove media wall cache file %s", fn, exc_info=True)
 
-        app.logger.info("mediawall: refresh completed (picked=%s, copied=%s, failed=%s)", len(picked), copied, failed)
-        return {"picked": len(picked), "copied": copied, "failed": failed}
+        app.logger.info(
+            "mediawall: refresh completed (version=%s, picked=%s, generated=%s, copied=%s, reused=%s, removed=%s, failed=%s)",
+            version, len(picked), generated, copied, reused, removed, failed,
+        )
+        return {
+            "picked": len(picked), "generated": generated, "copied": copied,
+            "reused": reused, "removed": removed, "failed": failed, "version": version,
+        }
     finally:
         MEDIA_WALL_REFRESH_LOCK.release()
 
-_MEDIA_WALL_SCAN_THREAD_STARTED = False
+_MEDIA_WALL_INGEST_LOCK = threading.Lock()
+_MEDIA_WALL_INGEST_PENDING: List[str] = []
+_MEDIA_WALL_LAST_INGEST = 0.0
 
-def _media_wall_scan_worker():
-    last_minute = None
-    last_expr = None
-    next_run = None
-    last_status_minute = None
+def _media_wall_refresh_job() -> None:
+    if not MEDIA_WALL_ENABLED:
+        return
+    _refresh_media_wall_cache_from_downloads()
+    touch_mediawall_notify()
 
-    # one-time warmup if enabled and cache empty
-    app.logger.info("mediawall: scan worker started (enabled=%s)", MEDIA_WALL_ENABLED)
+def _schedule_media_wall_refresh() -> None:
+    """(Re)register the wall refresh job from the saved cron expression."""
+    if not MEDIA_WALL_ENABLED:
+        if _bg_scheduler.get_job("media_wall_refresh"):
+            _bg_scheduler.remove_job("media_wall_refresh")
+        return
+    expr = _get_media_wall_scan_cron()
+    trigger = _make_cron_trigger(expr)
+    if trigger is None:
+        app.logger.warning("mediawall: invalid cron expr '%s'", expr)
+        return
+    _bg_scheduler.add_job(
+        _media_wall_refresh_job, trigger=trigger, id="media_wall_refresh",
+        replace_existing=True, coalesce=True, max_instances=1,
+    )
+    app.logger.info("mediawall: refresh scheduled (expr='%s')", expr)
 
-    if MEDIA_WALL_ENABLED and not os.listdir(MEDIA_WALL_DIR):
+def _media_wall_warmup() -> None:
+    """One-shot refresh when the wall is enabled but has no manifest entries yet."""
+    if MEDIA_WALL_ENABLED and not _wall_manifest()["items"]:
         app.logger.info("mediawall: warmup refresh (cache empty)")
-        _refresh_media_wall_cache_from_downloads()
+        _bg_scheduler.add_job(_media_wall_refresh_job, id="media_wall_warmup", replace_existing=True)
+
+def _media_wall_ingest_pending() -> None:
+    global _MEDIA_WALL_LAST_INGEST
+    with _MEDIA_WALL_INGEST_LOCK:
+        rels = list(_MEDIA_WALL_INGEST_PENDING)
+        _MEDIA_WALL_INGEST_PENDING.clear()
+        _MEDIA_WALL_LAST_INGEST = time.monotonic()
+    if not rels or not MEDIA_WALL_ENABLED:
+        return
+    result = _refresh_media_wall_cache_from_downloads(prefer=rels)
+    if result.get("skipped"):
+        # A scheduled refresh holds the lock; try again shortly
+        with _MEDIA_WALL_INGEST_LOCK:
+            _MEDIA_WALL_INGEST_PENDING[:0] = rels
+        _bg_scheduler.add_job(
+            _media_wall_ingest_pending, id="media_wall_ingest", replace_existing=True,
+            next_run_time=dt.datetime.now() + dt.timedelta(seconds=5),
+        )
+        return
+    app.logger.info("mediawall: ingested %s new file(s) from finished runs", len(rels))
+    if MEDIA_WALL_AUTO_REFRESH_ON_TASK_END:
         touch_mediawall_notify()
 
-    while True:
-        if not MEDIA_WALL_ENABLED:
-            time.sleep(2)
-            continue
-
-        expr = _get_media_wall_scan_cron()
-        now = dt.datetime.now()
-        now_minute = now.replace(second=0, microsecond=0)
-        minute_key = now_minute.strftime("%Y-%m-%d %H:%M")
-
-        if expr != last_expr:
-            last_expr = expr
-            try:
-                next_run = croniter(expr, now_minute).get_next(dt.datetime)
-                app.logger.info("mediawall: schedule updated expr='%s', next_run=%s", expr, next_run)
-            except Exception:
-                app.logger.warning("mediawall: invalid cron expr '%s'", expr)
-                next_run = None
-
-        if next_run and now_minute >= next_run and minute_key != last_minute:
-            last_minute = minute_key
-            app.logger.info("mediawall: trigger refresh at %s (expr='%s')", now_minute, expr)
-            _refresh_media_wall_cache_from_downloads()
-            touch_mediawall_notify()
-            try:
-                next_run = croniter(expr, now_minute).get_next(dt.datetime)
-                app.logger.info("mediawall: next_run=%s", next_run)
-            except Exception:
-                app.logger.warning("mediawall: failed to compute next run for expr '%s'", expr)
-                next_run = None
-        elif minute_key != last_status_minute:
-            last_status_minute = minute_key
-            app.logger.info("mediawall: waiting (now=%s, next_run=%s, expr='%s')", now_minute, next_run, expr)
-
-        time.sleep(5)
+def _media_wall_ingest_run(slug: str, run_id: str) -> None:
+    """Put a finished run's new media on the wall.
 
-def _start_media_wall_scan_thread():
-    global _MEDIA_WALL_SCAN_THREAD_STARTED
-    if _MEDIA_WALL_SCAN_THREAD_STARTED:
+    Runs at most once per MEDIA_WALL_MIN_REFRESH_SECONDS; files from runs
+    finishing in between are queued and ingested together.
+    """
+    if not (MEDIA_WALL_ENABLED and MEDIA_WALL_AUTO_INGEST_ON_TASK_END):
+        return
+    media_types = ["image"] + (["video"] if MEDIA_WALL_CACHE_VIDEOS else [])
+    rels = _catalog_run_relpaths(RUN_KIND_TASK, slug, run_id, media_types)
+    if not rels:
         return
-    _MEDIA_WALL_SCAN_THREAD_STARTED = True
-    threading.Thread(target=_media_wall_scan_worker, daemon=True).start()
+    with _MEDIA_WALL_INGEST_LOCK:
+        _MEDIA_WALL_INGEST_PENDING.extend(rels)
+        due = _MEDIA_WALL_LAST_INGEST + MEDIA_WALL_MIN_REFRESH_SECONDS
+    delay = max(0.0, due - time.monotonic())
+    _bg_scheduler.add_job(
+        _media_wall_ingest_pending, id="media_wall_ingest", replace_existing=True,
+        next_run_time=dt.datetime.now() + dt.timedelta(seconds=delay),
+    )
 
 # Initialize persisted media wall state
 MEDIA_WALL_ENABLED = _get_media_wall_enabled()
-_start_media_wall_scan_thread()
+# Spawned media pool workers re-import the main module as __mp_main__ when
+# running under the dev server; they must not start background work.
+_IS_POOL_WORKER = __name__ == "__mp_main__"
 
 def load_tasks():
     now = time.time()
@@ -815,8 +2568,23 @@ def load_tasks():
 
 # ── Kiosk helpers ────────────────────────────────────────────────────────────
 
+_KIOSK_SETTINGS_CACHE: dict = {}  # kslug -> ((mtime_ns, size), raw json)
+
 def _kiosk_settings(kslug: str) -> dict:
-    raw = read_text(os.path.join(KIOSKS_ROOT, kslug, "settings.json"))
+    """Parsed settings.json; the raw text is cached until the file's mtime
+    or size changes, and each call returns a fresh dict."""
+    p = os.path.join(KIOSKS_ROOT, kslug, "settings.json")
+    try:
+        st = os.stat(p)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return {}
+    hit = _KIOSK_SETTINGS_CACHE.get(kslug)
+    if hit and hit[0] == stamp:
+        raw = hit[1]
+    else:
+        raw = read_text(p)
+        _KIOSK_SETTINGS_CACHE[kslug] = (stamp, raw)
     try:
         return json.loads(raw) if raw else {}
     except Exception:
@@ -826,19 +2594,498 @@ def _kiosk_settings(kslug: str) -> dict:
 def _save_kiosk_settings(kslug: str, settings: dict) -> None:
     p = os.path.join(KIOSKS_ROOT, kslug, "settings.json")
     os.makedirs(os.path.dirname(p), exist_ok=True)
-    write_text(p, json.dumps(settings, indent=2))
+    raw = json.dumps(settings, indent=2)
+    write_text(p, raw)
+    st = os.stat(p)
+    _KIOSK_SETTINGS_CACHE[kslug] = ((st.st_mtime_ns, st.st_size), raw)
 
-def _list_kiosks() -> list:
-    result = []
+
+class KioskIndex:
+    """In-memory index of every kiosk's images/ folder (name, size, mtime,
+    content hash), persisted as ``kiosks/<k>/index.json``.
+
+    Upload and remove actions update it directly. Any other change is
+    picked up by comparing the folder's mtime with the one recorded at the
+    last scan, so a request normally costs one stat per kiosk; rescans keep
+    hashes of files whose size and mtime are unchanged. Writes of
+    index.json are batched a couple of seconds behind the changes.
+    """
+
+    VERSION = 1
+    FLUSH_DELAY = 2.0
+
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.RLock()
+        self._kiosks: dict = {}  # kslug -> {"dir_mtime_ns", "generation", "images": {fn: [size, mtime_ns, hash]}}
+        self._slugs: Tuple[Optional[int], List[str]] = (None, [])
+        self._dirty: set = set()
+        self._timer: Optional[threading.Timer] = None
+
+    def _images_dir(self, kslug: str) -> str:
+        return os.path.join(self.root, kslug, "images")
+
+    def _index_path(self, kslug: str) -> str:
+        return os.path.join(self.root, kslug, "index.json")
+
+    def slugs(self) -> List[str]:
+        """Kiosk slugs, re-listed only when KIOSKS_ROOT's mtime changes."""
+        try:
+            mtime = os.stat(self.root).st_mtime_ns
+        except OSError:
+            return []
+        with self._lock:
+            if self._slugs[0] != mtime:
+                self._slugs = (mtime, sorted(
+                    k for k in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, k))
+                ))
+            return list(self._slugs[1])
+
+    def _load(self, kslug: str) -> dict:
+        entry = self._kiosks.get(kslug)
+        if entry is None:
+            entry = {"dir_mtime_ns": None, "generation": 0, "images": {}}
+            raw = read_text(self._index_path(kslug))
+            try:
+                saved = json.loads(raw) if raw else None
+            except ValueError:
+                saved = None
+            if isinstance(saved, dict) and saved.get("version") == self.VERSION:
+                entry["dir_mtime_ns"] = saved.get("dir_mtime_ns")
+                entry["images"] = {fn: list(v) for fn, v in (saved.get("images") or {}).items()}
+            self._kiosks[kslug] = entry
+        return entry
+
+    def _scan(self, kslug: str, entry: dict, dir_mtime: Optional[int]) -> None:
+        idir = self._images_dir(kslug)
+        old = entry["images"]
+        images = {}
+        if dir_mtime is not None:
+            with os.scandir(idir) as it:
+                for de in it:
+                    try:
+                        if not de.is_file():
+                            continue
+                        st = de.stat()
+                    except OSError:
+                        continue
+                    prev = old.get(de.name)
+                    keep = prev is not None and prev[0] == st.st_size and prev[1] == st.st_mtime_ns
+                    images[de.name] = [st.st_size, st.st_mtime_ns, prev[2] if keep else None]
+        if images != old or entry["dir_mtime_ns"] != dir_mtime:
+            entry["images"] = images
+            entry["dir_mtime_ns"] = dir_mtime
+            entry["generation"] += 1
+            self._mark_dirty(kslug)
+
+    def get(self, kslug: str, full: bool = False) -> dict:
+        """Reconciled entry for ``kslug``; ``full`` rescans even when the
+        folder mtime is unchanged (catches files overwritten in place)."""
+        try:
+            dir_mtime = os.stat(self._images_dir(kslug)).st_mtime_ns
+        except OSError:
+            dir_mtime = None
+        with self._lock:
+            entry = self._load(kslug)
+            if full or dir_mtime != entry["dir_mtime_ns"]:
+                self._scan(kslug, entry, dir_mtime)
+            return entry
+
+    def images(self, kslug: str) -> List[Tuple[str, int, int]]:
+        """Sorted (name, size, mtime_ns) of the kiosk's images."""
+        with self._lock:
+            entry = self.get(kslug)
+            return [(fn, v[0], v[1]) for fn, v in sorted(entry["images"].items())]
+
+    def count(self, kslug: str) -> int:
+        with self._lock:
+            return len(self.get(kslug)["images"])
+
+    def generation(self, kslug: str) -> int:
+        with self._lock:
+            return self.get(kslug)["generation"]
+
+    def hash(self, kslug: str, fn: str) -> Optional[str]:
+        """Content hash of an image, computed on first use and kept in the index."""
+        with self._lock:
+            info = self.get(kslug)["images"].get(fn)
+            if info is None:
+                return None
+            if info[2] is not None:
+                return info[2]
+        digest = _kiosk_file_hash(os.path.join(self._images_dir(kslug), fn))
+        with self._lock:
+            info = self._kiosks[kslug]["images"].get(fn)
+            if info is not None and digest is not None:
+                info[2] = digest
+                self._mark_dirty(kslug)
+        return digest
+
+    def add(self, kslug: str, fn: str, digest: Optional[str] = None) -> None:
+        """Record a file just written to images/ (``digest``: its hash, if known)."""
+        path = os.path.join(self._images_dir(kslug), fn)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            entry = self.get(kslug)
+            entry["images"][fn] = [st.st_size, st.st_mtime_ns, digest]
+            entry["generation"] += 1
+            self._sync_dir_mtime(kslug, entry)
+
+    def remove(self, kslug: str, fn: str) -> None:
+        with self._lock:
+            entry = self.get(kslug)
+            if entry["images"].pop(fn, None) is not None:
+                entry["generation"] += 1
+            self._sync_dir_mtime(kslug, entry)
+
+    def _sync_dir_mtime(self, kslug: str, entry: dict) -> None:
+        # Our own write changed the folder mtime; record it so the next
+        # request does not rescan for a change the index already has
+        try:
+            entry["dir_mtime_ns"] = os.stat(self._images_dir(kslug)).st_mtime_ns
+        except OSError:
+            entry["dir_mtime_ns"] = None
+        self._mark_dirty(kslug)
+
+    def drop(self, kslug: str) -> None:
+        with self._lock:
+            self._kiosks.pop(kslug, None)
+            self._dirty.discard(kslug)
+
+    def _mark_dirty(self, kslug: str) -> None:
+        self._dirty.add(kslug)
+        if self._timer is None:
+            self._timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._timer = None
+            pending = {k: self._kiosks[k] for k in self._dirty if k in self._kiosks}
+            self._dirty.clear()
+            snapshots = {
+                k: json.dumps({"version": self.VERSION, "dir_mtime_ns": e["dir_mtime_ns"], "images": e["images"]})
+                for k, e in pending.items()
+            }
+        for kslug, raw in snapshots.items():
+            path = self._index_path(kslug)
+            if not os.path.isdir(os.path.dirname(path)):
+                continue
+            try:
+                with open(path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(raw)
+                os.replace(path + ".tmp", path)
+            except OSError:
+                app.logger.warning("kiosk: could not write index for %s", kslug, exc_info=True)
+
+_KIOSK_INDEX = KioskIndex(KIOSKS_ROOT)
+
+# Display variants: uploads are pre-sized for the kiosk's screen so players
+# never decode full-resolution originals. Originals stay in images/.
+KIOSK_DISPLAY_WIDTH = int(os.environ.get("KIOSK_DISPLAY_WIDTH", "1920"))
+KIOSK_DISPLAY_HEIGHT = int(os.environ.get("KIOSK_DISPLAY_HEIGHT", "1080"))
+KIOSK_DISPLAY_QUALITY = int(os.environ.get("KIOSK_DISPLAY_QUALITY", "85"))
+KIOSK_DISPLAY_FITS = ("contain", "cover", "center")
+KIOSK_DISPLAY_SUFFIX = ".jpg"
+# Display variants in the media pool at once from backfills and playlist
+# requests, so /thumb renders and probes still get workers
+KIOSK_DISPLAY_CONCURRENCY = max(1, int(os.environ.get("KIOSK_DISPLAY_CONCURRENCY", "0") or "0") or MEDIA_WORKERS // 2)
+
+_KIOSK_DISPLAY_LOCK = threading.Lock()
+_KIOSK_DISPLAY_SLOT_FREED = threading.Condition(_KIOSK_DISPLAY_LOCK)
+_KIOSK_DISPLAY_PENDING: set = set()
+_KIOSK_DISPLAY_FAILED: dict = {}  # variant path -> source mtime that failed to decode
+
+def _kiosk_display_spec(settings: dict) -> Tuple[int, int, str, str]:
+    fit = settings.get("fit", "contain")
+    return (
+        int(settings.get("display_width") or KIOSK_DISPLAY_WIDTH),
+        int(settings.get("display_height") or KIOSK_DISPLAY_HEIGHT),
+        fit if fit in KIOSK_DISPLAY_FITS else "contain",
+        "white" if settings.get("background") == "white" else "black",
+    )
+
+def _kiosk_display_dir(kslug: str, settings: dict) -> str:
+    """Variant directory for the kiosk's current screen size, fit and
+    background. Changing any of them switches to a fresh directory, so a
+    variant rendered for an old spec is never served."""
+    width, height, fit, background = _kiosk_display_spec(settings)
+    return os.path.join(KIOSKS_ROOT, kslug, "display", f"{width}x{height}-{fit}-{background}")
+
+def _kiosk_display_eligible(fn: str) -> bool:
+    ext = os.path.splitext(fn)[1].lower()
+    return ext in IMAGE_EXTS and ext != ".gif" and media_worker.pillow_available()
+
+def _kiosk_queue_display(src: str, dst: str, settings: dict, wait: Optional[bool] = None) -> bool:
+    """Render ``dst`` in the media pool. With ``wait`` set, at most
+    KIOSK_DISPLAY_CONCURRENCY variants are queued at a time: True blocks
+    until a slot frees up, False skips the file when none is free. Uploads
+    pass None and are always queued."""
+    try:
+        mtime = os.stat(src).st_mtime
+    except OSError:
+        return False
+    with _KIOSK_DISPLAY_LOCK:
+        if dst in _KIOSK_DISPLAY_PENDING or _KIOSK_DISPLAY_FAILED.get(dst) == mtime:
+            return False
+        if wait is not None and len(_KIOSK_DISPLAY_PENDING) >= KIOSK_DISPLAY_CONCURRENCY:
+            if not wait or not _KIOSK_DISPLAY_SLOT_FREED.wait_for(
+                lambda: len(_KIOSK_DISPLAY_PENDING) < KIOSK_DISPLAY_CONCURRENCY, timeout=600,
+            ):
+                return False
+            if dst in _KIOSK_DISPLAY_PENDING:
+                return False
+        _KIOSK_DISPLAY_PENDING.add(dst)
+    width, height, fit, background = _kiosk_display_spec(settings)
+    rgb = (255, 255, 255) if background == "white" else (0, 0, 0)
+
+    def _done(fut):
+        with _KIOSK_DISPLAY_LOCK:
+            _KIOSK_DISPLAY_PENDING.discard(dst)
+            _KIOSK_DISPLAY_SLOT_FREED.notify_all()
+            if not fut.cancelled() and fut.exception() is not None:
+                _KIOSK_DISPLAY_FAILED[dst] = mtime
+                app.logger.warning("kiosk: display variant failed for %s: %s", src, fut.exception())
+
+    try:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        fut = _media_pool().submit(
+            media_worker.make_display_variant, src, dst, width, height, fit, rgb, KIOSK_DISPLAY_QUALITY,
+        )
+    except Exception:
+        with _KIOSK_DISPLAY_LOCK:
+            _KIOSK_DISPLAY_PENDING.discard(dst)
+            _KIOSK_DISPLAY_SLOT_FREED.notify_all()
+        app.logger.warning("kiosk: could not queue display variant for %s", src, exc_info=True)
+        return False
+    fut.add_done_callback(_done)
+    return True
+
+def _kiosk_display_variant(kslug: str, fn: str, settings: dict, src_mtime_ns: Optional[int] = None,
+                           wait: Optional[bool] = None) -> Optional[str]:
+    """Path of an up-to-date display variant of ``fn``; when there is none
+    yet, one is queued in the media pool (see _kiosk_queue_display for
+    ``wait``) and None is returned. Pass the original's mtime when the kiosk
+    index already has it."""
+    if not _kiosk_display_eligible(fn):
+        return None
+    src = os.path.join(KIOSKS_ROOT, kslug, "images", fn)
+    dst = os.path.join(_kiosk_display_dir(kslug, settings), fn + KIOSK_DISPLAY_SUFFIX)
+    try:
+        if src_mtime_ns is None:
+            src_mtime_ns = os.stat(src).st_mtime_ns
+        if os.stat(dst).st_mtime_ns >= src_mtime_ns:
+            return dst
+    except OSError:
+        pass
+    _kiosk_queue_display(src, dst, settings, wait)
+    return None
+
+def _kiosk_display_backfill(kslug: Optional[str] = None) -> int:
+    """Queue display variants for images that lack a current one and drop
+    variants of removed images or of earlier display specs. Variants are
+    fed to the pool KIOSK_DISPLAY_CONCURRENCY at a time, so this job runs
+    until the last one is queued."""
     if not os.path.isdir(KIOSKS_ROOT):
-        return result
-    for kslug in sorted(os.listdir(KIOSKS_ROOT)):
-        kdir = os.path.join(KIOSKS_ROOT, kslug)
+        return 0
+    queued = 0
+    for k in [kslug] if kslug else sorted(os.listdir(KIOSKS_ROOT)):
+        kdir = os.path.join(KIOSKS_ROOT, k)
         if not os.path.isdir(kdir):
             continue
+        settings = _kiosk_settings(k)
+        ddir = _kiosk_display_dir(k, settings)
+        droot = os.path.join(kdir, "display")
+        if os.path.isdir(droot):
+            for name in os.listdir(droot):
+                if os.path.join(droot, name) != ddir:
+                    shutil.rmtree(os.path.join(droot, name), ignore_errors=True)
+        _KIOSK_INDEX.get(k, full=True)  # a full rescan also catches images overwritten in place
+        images = {fn: mtime for fn, _size, mtime in _KIOSK_INDEX.images(k)}
+        names = set(images)
+        if os.path.isdir(ddir):
+            for vname in os.listdir(ddir):
+                if vname.endswith(KIOSK_DISPLAY_SUFFIX) and vname[:-len(KIOSK_DISPLAY_SUFFIX)] not in names:
+                    try:
+                        os.remove(os.path.join(ddir, vname))
+                    except OSError:
+                        pass
+        for fn in sorted(names):
+            if _kiosk_display_eligible(fn) and _kiosk_display_variant(k, fn, settings, images[fn], wait=True) is None:
+                queued += 1
+    if queued:
+        app.logger.info("kiosk: queued %d display variant(s)", queued)
+    return queued
+
+# Content hashes name kiosk media URLs (?v=<hash>), so players can cache
+# them forever and the playlist version changes whenever any file does.
+KIOSK_MEDIA_MAX_AGE = 31536000
+KIOSK_PLAYLIST_POLL_SECONDS = max(10, int(os.environ.get("KIOSK_PLAYLIST_POLL_SECONDS", "300")))
+
+_KIOSK_HASH_LOCK = threading.Lock()
+_KIOSK_HASH_CACHE: dict = {}  # path -> (size, mtime_ns, digest)
+
+def _kiosk_file_hash(path: str) -> Optional[str]:
+    """Short content hash of a kiosk file, recomputed only when its size or
+    mtime changes."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    with _KIOSK_HASH_LOCK:
+        hit = _KIOSK_HASH_CACHE.get(path)
+    if hit and hit[:2] == (st.st_size, st.st_mtime_ns):
+        return hit[2]
+    h = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return None
+    digest = h.hexdigest()[:16]
+    with _KIOSK_HASH_LOCK:
+        _KIOSK_HASH_CACHE[path] = (st.st_size, st.st_mtime_ns, digest)
+    return digest
+
+def _kiosk_send(path: str, token: Optional[str] = None) -> Response:
+    """Serve a kiosk file; a ``?v=`` matching ``token`` (by default the
+    file's content hash) makes the response immutable, anything else is
+    revalidated."""
+    version = request.args.get("v")
+    if version and version == (token or _kiosk_file_hash(path)):
+        resp = _send_path(path, KIOSK_MEDIA_MAX_AGE)
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
+    return _send_path(path)
+
+# Library sources: a kiosk can also play downloads straight from /downloads,
+# picked by an indexed catalog query (no copies). Playlists are ordered
+# server-side — a stable shuffle seeded per kiosk, or newest first — and
+# served in pages.
+KIOSK_PAGE_SIZE = 200
+KIOSK_PAGE_MAX = 1000
+KIOSK_LIBRARY_MAX = int(os.environ.get("KIOSK_LIBRARY_MAX", "200000"))
+KIOSK_PLAYLIST_TTL = 60
+KIOSK_ORIENTATIONS = ("any", "landscape", "portrait")
+
+_KIOSK_PLAYLIST_LOCK = threading.Lock()
+_KIOSK_PLAYLIST_CACHE: dict = {}  # kslug -> (settings key, expires, entries, version)
+
+def _kiosk_sources(settings: dict) -> dict:
+    src = settings.get("sources") or {}
+    return {
+        "enabled": bool(src.get("enabled")),
+        "tasks": [t for t in src.get("tasks") or [] if is_valid_slug(t)],
+        "folders": [f.strip("/") for f in src.get("folders") or [] if f.strip("/") and ".." not in f],
+        "days": int(src.get("days") or 0),
+        "images_only": src.get("images_only", True) is not False,
+        "orientation": src.get("orientation") if src.get("orientation") in KIOSK_ORIENTATIONS else "any",
+    }
+
+def _kiosk_library_rows(sources: dict) -> List[tuple]:
+    """(relpath, media_type, size, mtime, added_at) for downloads matching
+    the kiosk's sources. Task and folder filters are OR-ed (no filter means
+    the whole library); age, media type and orientation narrow the result.
+    Corrupt files are skipped; orientation needs probed dimensions."""
+    where = [f"d.media_type IN ({'?' if sources['images_only'] else '?, ?'})", "COALESCE(m.corrupt, 0) = 0"]
+    params: list = ["image"] if sources["images_only"] else ["image", "video"]
+    picks = []
+    if sources["tasks"]:
+        picks.append(f"(d.kind = ? AND d.source IN ({','.join('?' for _ in sources['tasks'])}))")
+        params += [RUN_KIND_TASK, *sources["tasks"]]
+    for folder in sources["folders"]:
+        # Prefix range on the primary key: "a/b/" <= relpath < "a/b0" ('0' follows '/')
+        picks.append("(d.relpath >= ? AND d.relpath < ?)")
+        params += [folder + "/", folder + "0"]
+    if picks:
+        where.append("(" + " OR ".join(picks) + ")")
+    if sources["days"] > 0:
+        where.append("d.added_at >= ?")
+        params.append(time.time() - sources["days"] * 86400)
+    if sources["orientation"] == "landscape":
+        where.append("m.width > m.height")
+    elif sources["orientation"] == "portrait":
+        where.append("m.height > m.width")
+    params.append(KIOSK_LIBRARY_MAX)
+    conn = _catalog_conn()
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur.execute(
+        "SELECT d.relpath, d.media_type, d.size, d.mtime, d.added_at FROM downloads d "
+        "LEFT JOIN media_meta m ON m.relpath = d.relpath AND m.size = d.size AND m.mtime = d.mtime "
+        f"WHERE {' AND '.join(where)} ORDER BY d.added_at DESC LIMIT ?",
+        params,
+    ).fetchall()
+
+def _kiosk_library_token(size, mtime) -> str:
+    return hashlib.sha1(f"{size}:{mtime}".encode("ascii")).hexdigest()[:12]
+
+def _kiosk_shuffle_key(seed: str, key: str) -> bytes:
+    return hashlib.sha1(f"{seed}\0{key}".encode("utf-8", errors="ignore")).digest()
+
+def _kiosk_playlist(kslug: str, settings: dict) -> Tuple[List[dict], str]:
+    """Ordered playlist entries and their version hash, cached for
+    KIOSK_PLAYLIST_TTL seconds; settings changes and kiosk index changes
+    (uploads, removals) rebuild it straight away."""
+    cache_key = json.dumps([settings, _KIOSK_INDEX.generation(kslug)], sort_keys=True)
+    now = time.monotonic()
+    with _KIOSK_PLAYLIST_LOCK:
+        hit = _KIOSK_PLAYLIST_CACHE.get(kslug)
+    if hit and hit[0] == cache_key and hit[1] > now:
+        return hit[2], hit[3]
+
+    entries = []
+    for fn, _size, mtime_ns in _KIOSK_INDEX.images(kslug):
+        # Originals stand in until the display variant is rendered
+        variant = _kiosk_display_variant(kslug, fn, settings, mtime_ns, wait=False)
+        digest = _kiosk_file_hash(variant) if variant else _KIOSK_INDEX.hash(kslug, fn)
+        if digest is not None:
+            entries.append({
+                "key": fn, "name": fn, "type": "image", "hash": digest,
+                "url": url_for("kiosk_display_file" if variant else "kiosk_media", kslug=kslug, filename=fn, v=digest),
+            })
+    sources = _kiosk_sources(settings)
+    if sources["enabled"]:
+        try:
+            rows = _kiosk_library_rows(sources)
+        except sqlite3.Error:
+            app.logger.warning("kiosk: library query failed for %s", kslug, exc_info=True)
+            rows = []
+        for rel, media_type, size, mtime, _added in rows:
+            token = _kiosk_library_token(size, mtime)
+            entries.append({
+                "key": rel, "name": os.path.basename(rel), "type": media_type, "hash": token,
+                "url": url_for("kiosk_library_file", kslug=kslug, subpath=rel, v=token),
+            })
+
+    if settings.get("order", "random") == "random":
+        seed = str(settings.get("shuffle_seed", kslug))
+        entries.sort(key=lambda e: _kiosk_shuffle_key(seed, e["key"]))
+    digest = hashlib.sha1(json.dumps(
+        [settings.get("interval", 10), settings.get("order", "random")], sort_keys=True,
+    ).encode("utf-8"))
+    for e in entries:
+        digest.update(f"\0{e['url']}".encode("utf-8", errors="ignore"))
+    version = digest.hexdigest()[:16]
+    with _KIOSK_PLAYLIST_LOCK:
+        _KIOSK_PLAYLIST_CACHE[kslug] = (cache_key, now + KIOSK_PLAYLIST_TTL, entries, version)
+    return entries, version
+
+def _kiosk_playlist_invalidate(kslug: str) -> None:
+    with _KIOSK_PLAYLIST_LOCK:
+        _KIOSK_PLAYLIST_CACHE.pop(kslug, None)
+
+def _list_kiosks() -> list:
+    result = []
+    for kslug in _KIOSK_INDEX.slugs():
         settings = _kiosk_settings(kslug)
-        idir = os.path.join(kdir, "images")
-        count = sum(1 for f in os.listdir(idir) if os.path.isfile(os.path.join(idir, f))) if os.path.isdir(idir) else 0
+        count = _KIOSK_INDEX.count(kslug)
         result.append({
             "slug": kslug,
             "name": settings.get("name", kslug),
@@ -866,8 +3113,9 @@ def mediawall_toggle():
         MEDIA_WALL_ENABLED = not MEDIA_WALL_ENABLED
         new_value = MEDIA_WALL_ENABLED
     _set_media_wall_enabled(new_value)
+    _schedule_media_wall_refresh()
     if new_value:
-        _start_media_wall_scan_thread()
+        _media_wall_warmup()
     status = "enabled" if new_value else "disabled"
     os.environ["MEDIA_WALL_ENABLED"] = "1" if new_value else "0"
     flash(f"Media wall {status}", "success")
@@ -893,69 +3141,144 @@ def mediawall_refresh():
     flash("Media wall refresh started.", "success")
     return redirect(url_for("config_page"))
 
+# ---------------------------------------------------------------------
+# File offload (X-Accel-Redirect / X-Sendfile)
+# ---------------------------------------------------------------------
+
+# "x-accel": nginx internal redirect to /_accel/{downloads,config}/...
+# "x-sendfile": absolute path for Apache mod_xsendfile / lighttpd
+FILE_OFFLOAD_MODES = ("x-accel", "x-sendfile")
+FILE_OFFLOAD = os.environ.get("ARTILLERY_FILE_OFFLOAD", "").strip().lower()
+FILE_OFFLOAD_ACCEL_PREFIX = "/_accel"
+
+if FILE_OFFLOAD and FILE_OFFLOAD not in FILE_OFFLOAD_MODES:
+    app.logger.warning("Unknown ARTILLERY_FILE_OFFLOAD '%s' — files are served by the app", FILE_OFFLOAD)
+    FILE_OFFLOAD = ""
+
+def _accel_uri(path: str) -> Optional[str]:
+    """Internal nginx URI for a file under DOWNLOADS_ROOT or CONFIG_ROOT."""
+    for root, name in ((DOWNLOADS_ROOT, "downloads"), (CONFIG_ROOT, "config")):
+        for base in {os.path.abspath(root), os.path.realpath(root)}:
+            if os.path.commonpath([path, base]) == base:
+                rel = os.path.relpath(path, base).replace(os.sep, "/")
+                return f"{FILE_OFFLOAD_ACCEL_PREFIX}/{name}/{urllib.parse.quote(rel)}"
+    return None
+
+def _send_path(path: str, max_age: Optional[int] = None) -> Response:
+    """send_file for an already-validated path. With ARTILLERY_FILE_OFFLOAD
+    set, only headers are returned and the front server streams the bytes,
+    answering Range and conditional requests itself."""
+    path = os.path.abspath(path)
+    target = None
+    if FILE_OFFLOAD == "x-sendfile":
+        target = path
+    elif FILE_OFFLOAD == "x-accel":
+        target = _accel_uri(path)
+    if target is None:
+        return send_file(path, conditional=True, max_age=max_age)
+    resp = _werkzeug_send_file(
+        path, request.environ, conditional=False, etag=False,
+        max_age=max_age if max_age is not None else app.get_send_file_max_age(path),
+        use_x_sendfile=True, response_class=app.response_class,
+    )
+    del resp.headers["X-Sendfile"]
+    resp.headers["X-Sendfile" if FILE_OFFLOAD == "x-sendfile" else "X-Accel-Redirect"] = target
+    return resp
+
 # ---------------------------------------------------------------------
 # Cached wall file route (fast: served from /config/media_wall)
 # ---------------------------------------------------------------------
 
+WALL_FILE_MAX_AGE = 31536000
+
 @app.route("/wall/<path:filename>")
 def wall_file(filename):
     ensure_data_dirs(ensure_downloads=False)
-    return send_from_directory(MEDIA_WALL_DIR, filename, conditional=True)
+    path = safe_join(MEDIA_WALL_DIR, filename)
+    if path is None:
+        return Response("", status=404)
+    linked = os.path.islink(path)
+    if linked:
+        # Symlink cache mode: only follow links that resolve into /downloads
+        real = os.path.realpath(path)
+        root = os.path.realpath(DOWNLOADS_ROOT)
+        if os.path.commonpath([real, root]) != root or not os.path.isfile(real):
+            return Response("", status=404)
+        path = real
+    elif not os.path.isfile(path):
+        return Response("", status=404)
+    resp = _send_image_variant(path, WALL_FILE_MAX_AGE) if "w" in request.args else None
+    if resp is None:
+        resp = _send_path(path, WALL_FILE_MAX_AGE)
+    # Cache names hash the source path, mtime and size, so a name never changes content
+    resp.cache_control.public = True
+    resp.cache_control.immutable = True
+    return resp
 
 @app.route('/mediawall/api/list_cache')
 def mediawall_list_cache():
     """
-    Return JSON: { items: [{ name, url, mtime }, ...] }
-    Reads files from CONFIG_DIR/media_wall
+    Return JSON: { version, items: [{ name, url, mtime, srcset?, preview?, width?, height?, lqip? }, ...] }
+    Built from the wall manifest and revalidated by ETag, so an unchanged
+    wall costs one stat and a 304.
     """
-    config_dir = os.environ.get('CONFIG_DIR', '/config')
-    media_dir = os.path.join(config_dir, 'media_wall')
+    manifest = _wall_manifest()
+    meta = _media_meta_lookup(e["rel"] for e in manifest["items"] if e.get("rel"))
     items = []
-    try:
-        allowed_img_ext = {'jpg','jpeg','png','gif','webp'}
-        allowed_vid_ext = {'mp4','webm','mkv'}
-        cache_videos = os.environ.get('MEDIA_WALL_CACHE_VIDEOS', '0') in ('1','true','True')
-        if os.path.isdir(media_dir):
-            for fname in sorted(os.listdir(media_dir), reverse=True):
-                fpath = os.path.join(media_dir, fname)
-                if not os.path.isfile(fpath):
-                    continue
-                ext = (fname.rsplit('.',1)[-1] or "").lower()
-                if ext in allowed_img_ext or (cache_videos and ext in allowed_vid_ext):
-                    try:
-                        mtime = int(os.path.getmtime(fpath))
-                    except Exception:
-                        mtime = 0
-                    try:
-                        file_url = url_for('wall_file', filename=fname)
-                    except Exception:
-                        file_url = '/wall/' + fname
-                    items.append({'name': fname, 'url': file_url, 'mtime': mtime})
-    except Exception:
-        app.logger.exception("Error listing media wall cache directory")
-    return jsonify({'items': items})
+    for entry in manifest["items"]:
+        item = {'name': entry['name'], 'url': url_for('wall_file', filename=entry['name']), 'mtime': entry.get('mtime', 0)}
+        if os.path.splitext(entry['name'])[1].lower() in IMAGE_EXTS - {'.gif'}:
+            item['srcset'] = _srcset(item['url'])
+        if entry.get('preview'):
+            item['preview'] = url_for('wall_file', filename=entry['preview'])
+        item.update(meta.get(entry.get('rel'), {}))
+        items.append(item)
+    resp = jsonify({'version': manifest['version'], 'items': items})
+    # Only metadata of the entries on the wall goes into the ETag; probes of
+    # other files (e.g. while downloads run) leave it unchanged
+    meta_sig = hashlib.sha1(
+        json.dumps([meta.get(e.get('rel')) for e in manifest['items']], sort_keys=True).encode('utf-8')
+    ).hexdigest()[:12]
+    resp.set_etag(f"wall-{manifest['version']}-{manifest.get('generated_at', 0)}-{meta_sig}")
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
 @app.route("/mediawall/events")
 def mediawall_events():
-    """SSE endpoint that emits mediawall_update when notify file mtime changes."""
+    """SSE endpoint that emits mediawall_update whenever the wall changes."""
     if not MEDIA_WALL_SSE_ENABLED:
         return Response("", status=204)
     def gen():
-        last_mtime = 0
+        seen = _MEDIAWALL_NOTIFIER.version
+        last_mtime = None
+        idle = 0.0
         try:
+            yield ": connected\n\n"  # sends headers now rather than at the first update
             while True:
-                try:
-                    if os.path.exists(MEDIAWALL_NOTIFY_FILE):
+                # Cross-process mode also has to poll the notify file another worker may touch
+                timeout = 1.0 if MEDIAWALL_NOTIFY_CROSS_PROCESS else 15.0
+                version = _MEDIAWALL_NOTIFIER.wait(seen, timeout)
+                changed = version != seen
+                seen = version
+                if MEDIAWALL_NOTIFY_CROSS_PROCESS:
+                    try:
                         m = os.path.getmtime(MEDIAWALL_NOTIFY_FILE)
-                        if m != last_mtime:
-                            last_mtime = m
-                            yield f'event: mediawall_update\ndata: {int(m)}\n\n'
-                    time.sleep(1)
-                except Exception:
-                    time.sleep(1)
+                    except OSError:
+                        m = None
+                    if last_mtime is not None and m != last_mtime:
+                        changed = True
+                    last_mtime = m
+                if changed:
+                    idle = 0.0
+                    yield f'event: mediawall_update\ndata: {version}\n\n'
+                    continue
+                idle += timeout
+                if idle >= 15.0:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
         except GeneratorExit:
             return
-    return Response(gen(), mimetype='text/event-stream')
+    return Response(gen(), mimetype='text/event-stream', headers={"X-Accel-Buffering": "no"})
 
 # ---------------------------------------------------------------------
 # Home page (uses cache folder; never scans /downloads)
@@ -970,12 +3293,7 @@ def home():
     recent_rows = [[] for _ in range(MEDIA_WALL_ROWS)]
 
     if MEDIA_WALL_ENABLED:
-        os.makedirs(MEDIA_WALL_DIR, exist_ok=True)
-        cached_files = [
-            fn for fn in os.listdir(MEDIA_WALL_DIR)
-            if os.path.splitext(fn)[1].lower() in MEDIA_EXTS and not fn.endswith(".tmp")
-        ]
-        cached_files = cached_files[:MEDIA_WALL_ITEMS_ON_PAGE]
+        cached_files = [e["name"] for e in _wall_manifest()["items"][:MEDIA_WALL_ITEMS_ON_PAGE]]
 
         urls = [url_for("wall_file", filename=fn) for fn in cached_files]
         has_media = len(urls) > 0
@@ -1005,12 +3323,13 @@ def recent_downloads():
 
     task_items = []
     for task in tasks:
-        log_path = os.path.join(TASKS_ROOT, task["slug"], "logs.txt")
-        items = _recent_downloads_from_log(log_path, RECENT_DOWNLOADS_PER_TASK)
+        items = _catalog_recent(RUN_KIND_TASK, task["slug"], RECENT_DOWNLOADS_PER_TASK)
         for item in items:
             item["url"] = url_for("media_file", subpath=item["rel"])
             item["is_image"] = item["ext"] in IMAGE_EXTS
             item["is_video"] = item["ext"] in VIDEO_EXTS
+            _add_thumb_urls(item)
+        _add_media_meta(items)
         task_items.append({
             "name": task["name"],
             "slug": task["slug"],
@@ -1077,6 +3396,7 @@ def tasks():
                     flash(f"A task named '{name}' already exists.", "error")
                     return redirect(url_for("tasks", selected=original_slug))
                 os.rename(old_folder, task_folder)
+                _catalog_rename_source(original_slug, slug)
 
         os.makedirs(task_folder, exist_ok=True)
 
@@ -1169,6 +3489,37 @@ def api_disk():
         return jsonify({"error": "unavailable"}), 500
 
 
+@app.route("/api/crawl")
+def api_crawl():
+    """Progress of a running downloads crawl and statistics of the last one."""
+    return jsonify(_CRAWL_STATUS)
+
+
+@app.route("/api/duplicates")
+def api_duplicates():
+    """Near-duplicate image clusters per task with reclaimable bytes, served
+    from the dhash job's index. Optional ``?task=<slug>`` and
+    ``?distance=<bits>`` (default and maximum DUPLICATE_MAX_DISTANCE)."""
+    try:
+        distance = max(0, min(DUPLICATE_MAX_DISTANCE, int(request.args.get("distance", DUPLICATE_MAX_DISTANCE))))
+    except ValueError:
+        return jsonify({"error": "distance must be an integer"}), 400
+    report = _duplicate_report(distance)
+    if report is None:
+        # No index yet (fresh start): build it in the background
+        threading.Thread(target=_dhash_job, name="dhash", daemon=True).start()
+        report = {"max_distance": distance, "hashed": 0, "built_at": None, "reclaimable_bytes": 0, "tasks": [], "building": True}
+    report = dict(report)
+    slug = request.args.get("task")
+    if slug:
+        report["tasks"] = [t for t in report["tasks"] if t["slug"] == slug]
+    try:
+        report["pending"] = len(_dhash_pending(_catalog_conn(), DHASH_MAX_PER_RUN))
+    except sqlite3.Error:
+        report["pending"] = None
+    return jsonify(report)
+
+
 @app.route("/api/tasks")
 def api_tasks():
     """Return a lightweight JSON representation of tasks for front-end polling."""
@@ -1220,6 +3571,7 @@ def config_page():
             raw = request.form.get("media_wall_scan_cron", "").strip()
             if croniter.is_valid(raw):
                 _set_media_wall_scan_cron(raw)
+                _schedule_media_wall_refresh()
                 scan_cron = raw
                 flash("Media wall schedule saved.", "success")
             else:
@@ -1271,7 +3623,11 @@ def config_backup():
                 kdir = os.path.join(KIOSKS_ROOT, kname)
                 if not os.path.isdir(kdir):
                     continue
-                for root, _dirs, files in os.walk(kdir):
+                for root, dirs, files in os.walk(kdir):
+                    if root == kdir:
+                        # display/ and index.json are rebuilt from images/; uploads/ holds unfinished parts
+                        dirs[:] = [d for d in dirs if d not in ("display", "uploads")]
+                        files = [f for f in files if f != "index.json"]
                     for fn in files:
                         fp = os.path.join(root, fn)
                         arcname = "config/kiosks/" + kname + "/" + os.path.relpath(fp, kdir)
@@ -1433,17 +3789,20 @@ def one_time_download_logs():
 @app.route("/one-time/recent")
 def one_time_recent():
     ensure_data_dirs(ensure_downloads=False)
-    items = _recent_downloads_from_log(ONE_TIME_LOG_FILE, ONE_TIME_RECENT_DOWNLOADS)
+    items = _catalog_recent(RUN_KIND_ONE_TIME, "", ONE_TIME_RECENT_DOWNLOADS)
     out = []
     for item in items:
         item_url = url_for("media_file", subpath=item["rel"])
-        out.append({
+        entry = {
             "rel": item["rel"],
             "url": item_url,
             "filename": item.get("filename") or os.path.basename(item["rel"]),
             "is_image": item.get("ext") in IMAGE_EXTS,
             "is_video": item.get("ext") in VIDEO_EXTS,
-        })
+        }
+        _add_thumb_urls(entry)
+        out.append(entry)
+    _add_media_meta(out)
     return jsonify({"items": out})
 
 @app.route("/one-time/status")
@@ -1507,46 +3866,56 @@ def run_one_time_download(url: str):
         url,
     ]
 
+    spool = None
+    if DOWNLOAD_HOOK_ENABLED:
+        spool = _DownloadSpool(_download_spool_path(RUN_KIND_ONE_TIME, ""))
+        cmd_parts = _inject_download_hook(cmd_parts, spool.path)
+
     now = dt.datetime.utcnow().isoformat() + "Z"
     try:
         with open(ONE_TIME_LOG_FILE, "a", encoding="utf-8") as logf:
-            logf.write(f"\n\n==== One-time download started at {now} ====\n")
-            logf.write(f"URL: {url}\n")
-            logf.write(f"Command: {' '.join(shlex.quote(p) for p in cmd_parts)}\n\n")
-            logf.flush()
+            pipeline = RunOutputPipeline(logf, RUN_KIND_ONE_TIME, "", now, spool=spool)
+            pipeline.write(f"\n\n==== One-time download started at {now} ====\n")
+            pipeline.write(f"URL: {url}\n")
+            pipeline.write(f"Command: {' '.join(shlex.quote(p) for p in cmd_parts)}\n\n")
+            pipeline.flush()
 
             proc = subprocess.Popen(
                 cmd_parts,
-                stdout=logf,
+                stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
                 env=env,
             )
+            pipeline.start(proc.stdout)
             try:
                 Path(ONE_TIME_PID_FILE).write_text(str(proc.pid))
             except Exception:
                 app.logger.warning("Could not write one-time PID file", exc_info=True)
 
+            stop_logged = False
             while proc.poll() is None:
-                if os.path.exists(ONE_TIME_STOP_FILE):
+                if os.path.exists(ONE_TIME_STOP_FILE) and not stop_logged:
                     try:
                         proc.terminate()
-                        logf.write("\nStop requested. Terminating one-time download...\n")
-                        logf.flush()
+                        pipeline.write("\nStop requested. Terminating one-time download...\n")
+                        stop_logged = True
                     except Exception:
                         app.logger.warning("Could not terminate one-time download process", exc_info=True)
                 time.sleep(0.25)
 
             returncode = proc.returncode
+            pipeline.finish()
 
-        with open(ONE_TIME_LOG_FILE, "a", encoding="utf-8") as logf:
             if returncode == 0:
-                logf.write("\nOne-time download finished successfully.\n")
+                pipeline.write("\nOne-time download finished successfully.\n")
             else:
-                logf.write(f"\nOne-time download exited with code {returncode}.\n")
+                pipeline.write(f"\nOne-time download exited with code {returncode}.\n")
+        _publish_run_event({
+            "type": "run_finished", "kind": RUN_KIND_ONE_TIME, "source": "",
+            "run_id": now, "success": returncode == 0,
+        })
     except Exception as exc:
-        with open(ONE_TIME_LOG_FILE, "a", encoding="utf-8") as logf:
-            logf.write(f"\nERROR while running one-time download: {exc}\n")
+        _append_run_log(ONE_TIME_LOG_FILE, f"\nERROR while running one-time download: {exc}\n", RUN_KIND_ONE_TIME, "")
     finally:
         try:
             if os.path.exists(ONE_TIME_PID_FILE):
@@ -1572,8 +3941,11 @@ def run_task_background(task_folder: str):
     urls_file     = os.path.join(task_folder, "urls.txt")
     error_path    = os.path.join(task_folder, "error")
 
+    slug = os.path.basename(task_folder.rstrip("/"))
+
     # Rotate previous log and clear transient state before starting
     _rotate_logs(task_folder)
+    _publish_run_event({"type": "reset", "kind": RUN_KIND_TASK, "source": slug, "run_id": None})
     _clear_last_error(task_folder)
     try:
         if os.path.exists(error_path):
@@ -1583,15 +3955,13 @@ def run_task_background(task_folder: str):
 
     command = read_text(command_path)
     if not command:
-        with open(logs_path, "a", encoding="utf-8") as logf:
-            logf.write("\nNo command configured for this task.\n")
+        _append_run_log(logs_path, "\nNo command configured for this task.\n", RUN_KIND_TASK, slug)
         if os.path.exists(lock_path):
             os.remove(lock_path)
         return
 
     if not os.path.exists(urls_file):
-        with open(logs_path, "a", encoding="utf-8") as logf:
-            logf.write("\nurls.txt not found for this task.\n")
+        _append_run_log(logs_path, "\nurls.txt not found for this task.\n", RUN_KIND_TASK, slug)
         if os.path.exists(lock_path):
             os.remove(lock_path)
         return
@@ -1601,8 +3971,7 @@ def run_task_background(task_folder: str):
     try:
         cmd_parts = shlex.split(command)
     except ValueError as exc:
-        with open(logs_path, "a", encoding="utf-8") as logf:
-            logf.write(f"\nFailed to parse command: {exc}\n")
+        _append_run_log(logs_path, f"\nFailed to parse command: {exc}\n", RUN_KIND_TASK, slug)
         if os.path.exists(lock_path):
             os.remove(lock_path)
         return
@@ -1611,22 +3980,30 @@ def run_task_background(task_folder: str):
     env["GALLERY_DL_CONFIG"] = CONFIG_FILE
     env["PATH"] = env.get("PATH", "") + os.pathsep + "/usr/local/bin"
 
+    # Injected per run rather than saved into command.txt: the spool is per run
+    spool = None
+    if DOWNLOAD_HOOK_ENABLED and cmd_parts and os.path.basename(cmd_parts[0]) == "gallery-dl":
+        spool = _DownloadSpool(_download_spool_path(RUN_KIND_TASK, slug), cwd=task_folder)
+        cmd_parts = _inject_download_hook(cmd_parts, spool.path)
+
+    success = False
     try:
         with open(logs_path, "a", encoding="utf-8") as logf:
+            pipeline = RunOutputPipeline(logf, RUN_KIND_TASK, slug, now, spool=spool)
             config_exists = os.path.exists(CONFIG_FILE)
-            logf.write(f"\n\n==== Run at {now} ====\n")
-            logf.write(f"Artillery: using config {CONFIG_FILE} (exists={config_exists})\n")
-            logf.write(f"$ {' '.join(cmd_parts)}\n\n")
-            logf.flush()
+            pipeline.write(f"\n\n==== Run at {now} ====\n")
+            pipeline.write(f"Artillery: using config {CONFIG_FILE} (exists={config_exists})\n")
+            pipeline.write(f"$ {' '.join(cmd_parts)}\n\n")
+            pipeline.flush()
 
             proc = subprocess.Popen(
                 cmd_parts,
                 cwd=task_folder,
-                stdout=logf,
+                stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                text=True,
                 env=env,
             )
+            pipeline.start(proc.stdout)
             try:
                 Path(pid_path).write_text(str(proc.pid))
             except Exception:
@@ -1641,41 +4018,39 @@ def run_task_background(task_folder: str):
                 proc.wait()
                 returncode = -1
                 timed_out = True
-                logf.write(f"\nTask killed: exceeded {timeout}s timeout.\n")
-                logf.flush()
-
-        run_end = dt.datetime.utcnow()
-        duration = (run_end - dt.datetime.fromisoformat(now.rstrip("Z"))).total_seconds()
-        write_text(last_run_path, now)
-
-        was_stopped = os.path.exists(stopped_path)
-        try:
-            if was_stopped:
-                os.remove(stopped_path)
-        except Exception:
-            app.logger.debug("Could not remove stopped sentinel for %s", task_folder)
+            pipeline.finish()
+            if timed_out:
+                pipeline.write(f"\nTask killed: exceeded {timeout}s timeout.\n")
+
+            run_end = dt.datetime.utcnow()
+            duration = (run_end - dt.datetime.fromisoformat(now.rstrip("Z"))).total_seconds()
+            write_text(last_run_path, now)
+            was_stopped = os.path.exists(stopped_path)
+            try:
+                if was_stopped:
+                    os.remove(stopped_path)
+            except Exception:
+                app.logger.debug("Could not remove stopped sentinel for %s", task_folder)
 
-        success = returncode == 0 and not timed_out
-        with open(logs_path, "a", encoding="utf-8") as logf:
+            success = returncode == 0 and not timed_out
             if success:
-                logf.write("\nTask finished successfully.\n")
+                pipeline.write("\nTask finished successfully.\n")
             elif was_stopped:
-                logf.write("\nTask stopped.\n")
+                pipeline.write("\nTask stopped.\n")
             elif timed_out:
-                logf.write(f"\nTask timed out after {timeout}s.\n")
+                pipeline.write(f"\nTask timed out after {timeout}s.\n")
                 Path(error_path).touch()
                 _write_last_error(task_folder, f"Timed out after {timeout}s.")
             else:
-                logf.write(f"\nTask exited with code {returncode}.\n")
+                pipeline.write(f"\nTask exited with code {returncode}.\n")
                 Path(error_path).touch()
-                _write_last_error(task_folder, _extract_errors_from_log(logs_path))
+                _write_last_error(task_folder, pipeline.error_summary())
 
         _record_run(task_folder, success=success, duration=duration, stopped=was_stopped)
 
     except Exception as exc:
         app.logger.exception("Unhandled error in run_task_background for %s", task_folder)
-        with open(logs_path, "a", encoding="utf-8") as logf:
-            logf.write(f"\nERROR while running task: {exc}\n")
+        _append_run_log(logs_path, f"\nERROR while running task: {exc}\n", RUN_KIND_TASK, slug)
         try:
             Path(error_path).touch()
             _write_last_error(task_folder, str(exc))
@@ -1691,10 +4066,13 @@ def run_task_background(task_folder: str):
                 app.logger.debug("Could not remove lock/pid file %s in cleanup", p)
 
         try:
-            slug = os.path.basename(task_folder.rstrip("/"))
             _TASK_CACHE.pop(slug, None)
             _invalidate_task_cache()
-            touch_mediawall_notify()
+            _publish_run_event({
+                "type": "run_finished", "kind": RUN_KIND_TASK, "source": slug,
+                "run_id": now, "success": success,
+            })
+            _media_wall_ingest_run(slug, now)
             app.logger.info("task %s finished", slug)
         except Exception:
             app.logger.exception("Error in post-run cleanup for %s", task_folder)
@@ -1797,6 +4175,7 @@ def task_action(slug):
         logs_path = os.path.join(task_folder, "logs.txt")
         try:
             write_text(logs_path, "")
+            _publish_run_event({"type": "reset", "kind": RUN_KIND_TASK, "source": slug, "run_id": None})
             flash("Logs cleared.", "success")
         except Exception as exc:
             flash(f"Failed to clear logs: {exc}", "error")
@@ -1908,12 +4287,13 @@ def task_recent(slug):
     task_folder = os.path.join(TASKS_ROOT, slug)
     if not os.path.isdir(task_folder):
         return jsonify({"error": "Task not found"}), 404
-    log_path = os.path.join(task_folder, "logs.txt")
-    items = _recent_downloads_from_log(log_path, RECENT_DOWNLOADS_PER_TASK)
+    items = _catalog_recent(RUN_KIND_TASK, slug, RECENT_DOWNLOADS_PER_TASK)
     for item in items:
         item["url"] = url_for("media_file", subpath=item["rel"])
         item["is_image"] = item["ext"] in IMAGE_EXTS
         item["is_video"] = item["ext"] in VIDEO_EXTS
+        _add_thumb_urls(item)
+    _add_media_meta(items)
     return jsonify({"slug": slug, "items": items})
 
 
@@ -1929,39 +4309,61 @@ def task_logs_stream(slug):
     if not os.path.isdir(task_folder):
         return Response("", status=404)
 
+    logs_path = os.path.join(task_folder, "logs.txt")
+
+    def _tail_payload() -> str:
+        initial = "\n".join(_tail_lines(logs_path, 50)) if os.path.exists(logs_path) else ""
+        return f"data: {json.dumps({'content': initial, 'reset': True})}\n\n"
+
     def gen():
-        logs_path = os.path.join(task_folder, "logs.txt")
-        last_pos = 0
-        if os.path.exists(logs_path):
-            initial = "\n".join(_tail_lines(logs_path, 50))
-            yield f"data: {json.dumps({'content': initial, 'reset': True})}\n\n"
-            try:
-                last_pos = os.path.getsize(logs_path)
-            except Exception:
-                app.logger.debug("Could not get initial size of log file %s", logs_path)
-        else:
-            yield f"data: {json.dumps({'content': '', 'reset': True})}\n\n"
-        while True:
+        # Output arrives as run events from the runner's pipeline; the log
+        # file is only read for the initial tail and after a reset/overflow.
+        events: queue.Queue = queue.Queue(maxsize=2000)
+        state = {"overflow": False}
+
+        def on_event(ev):
+            if ev.get("kind") != RUN_KIND_TASK or ev.get("source") != slug:
+                return
+            if ev["type"] not in ("output", "reset"):
+                return
             try:
-                time.sleep(1)
-                if not os.path.exists(logs_path):
+                events.put_nowait(ev)
+            except queue.Full:
+                state["overflow"] = True
+
+        subscribe_run_events(on_event)
+        try:
+            yield _tail_payload()
+            while True:
+                try:
+                    ev = events.get(timeout=15)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
                     continue
-                size = os.path.getsize(logs_path)
-                if size < last_pos:
-                    # log was cleared — re-send tail
-                    initial = "\n".join(_tail_lines(logs_path, 50))
-                    yield f"data: {json.dumps({'content': initial, 'reset': True})}\n\n"
-                    last_pos = size
-                elif size > last_pos:
-                    with open(logs_path, "r", encoding="utf-8", errors="replace") as _lf:
-                        _lf.seek(last_pos)
-                        new_text = _lf.read()
-                    last_pos = size
-                    yield f"data: {json.dumps({'content': new_text, 'reset': False})}\n\n"
-            except GeneratorExit:
-                return
-            except Exception:
-                app.logger.debug("SSE stream error for %s", slug, exc_info=True)
+                batch = [ev]
+                while len(batch) < 500:
+                    try:
+                        batch.append(events.get_nowait())
+                    except queue.Empty:
+                        break
+                if state["overflow"]:
+                    state["overflow"] = False
+                    yield _tail_payload()
+                    continue
+                # A reset means the log was rotated or cleared: it now holds
+                # exactly the output that followed the last reset.
+                reset = False
+                for i in range(len(batch) - 1, -1, -1):
+                    if batch[i]["type"] == "reset":
+                        batch = batch[i + 1:]
+                        reset = True
+                        break
+                new_text = "".join(e.get("text", "") for e in batch)
+                yield f"data: {json.dumps({'content': new_text, 'reset': reset})}\n\n"
+        except GeneratorExit:
+            return
+        finally:
+            unsubscribe_run_events(on_event)
 
     return Response(
         gen(),
@@ -2051,6 +4453,7 @@ def kiosks_list():
             "name": name,
             "interval": max(1, int(request.form.get("interval") or 10)),
             "order": request.form.get("order", "random"),
+            "shuffle_seed": secrets.token_hex(4),
         })
         flash(f"Kiosk '{name}' created.", "success")
         return redirect(url_for("kiosk_manage", kslug=kslug))
@@ -2072,6 +4475,12 @@ def kiosk_manage(kslug):
         action = request.form.get("action")
 
         if action == "settings":
+            try:
+                display_width = int(request.form.get("display_width") or KIOSK_DISPLAY_WIDTH)
+                display_height = int(request.form.get("display_height") or KIOSK_DISPLAY_HEIGHT)
+            except ValueError:
+                flash("Screen width and height must be whole numbers.", "error")
+                return redirect(url_for("kiosk_manage", kslug=kslug))
             settings = _kiosk_settings(kslug)
             settings["name"]       = request.form.get("name", settings.get("name", kslug)).strip() or kslug
             settings["interval"]   = max(1, int(request.form.get("interval") or 10))
@@ -2082,13 +4491,25 @@ def kiosk_manage(kslug):
             settings["background"] = request.form.get("background", "black")
             settings["ken_burns"]  = "1" if request.form.get("ken_burns") else "0"
             settings["show_clock"] = "1" if request.form.get("show_clock") else "0"
+            spec = _kiosk_display_spec(_kiosk_settings(kslug))
+            settings["display_width"]  = max(320, min(7680, display_width))
+            settings["display_height"] = max(240, min(4320, display_height))
             _save_kiosk_settings(kslug, settings)
+            if _kiosk_display_spec(settings) != spec:
+                _bg_scheduler.add_job(
+                    _kiosk_display_backfill, args=[kslug], id=f"kiosk_display_{kslug}", replace_existing=True,
+                )
             flash("Settings saved.", "success")
 
         elif action == "add_images":
             uploaded = request.files.getlist("images")
             idir = os.path.join(kdir, "images")
+            # Partial copies live in uploads/ (same filesystem), out of sight
+            # of the kiosk index and playlist until they are moved into place
+            udir = os.path.join(kdir, "uploads")
             os.makedirs(idir, exist_ok=True)
+            os.makedirs(udir, exist_ok=True)
+            settings = _kiosk_settings(kslug)
             added = 0
             skipped = []
             for f in uploaded:
@@ -2101,16 +4522,27 @@ def kiosk_manage(kslug):
                 if ext not in IMAGE_EXTS:
                     skipped.append(fn)
                     continue
-                raw = f.read(20 * 1024 * 1024 + 1)
-                if len(raw) > 20 * 1024 * 1024:
-                    flash(f"Skipped {fn}: too large (max 20 MB per file).", "warning")
-                    continue
+                dest = os.path.join(idir, fn)
+                tmp = os.path.join(udir, f"form-{secrets.token_hex(8)}.tmp")
                 try:
-                    with open(os.path.join(idir, fn), "wb") as out:
-                        out.write(raw)
+                    # Copy in chunks so large files never sit in memory
+                    with open(tmp, "wb") as out:
+                        shutil.copyfileobj(f.stream, out, 1024 * 1024)
+                        too_large = out.tell() > KIOSK_UPLOAD_MAX_BYTES
+                    if too_large:
+                        os.remove(tmp)
+                        flash(f"Skipped {fn}: too large (max {KIOSK_UPLOAD_MAX_BYTES // (1024 * 1024)} MB per file).", "warning")
+                        continue
+                    os.replace(tmp, dest)
                     added += 1
+                    _KIOSK_INDEX.add(kslug, fn)
+                    _kiosk_display_variant(kslug, fn, settings)
                 except Exception:
                     app.logger.warning("Could not save uploaded kiosk image %s", fn, exc_info=True)
+                    try:
+                        os.remove(tmp)
+                    except OSError:
+                        pass
             if added:
                 flash(f"Uploaded {added} image(s).", "success")
             if skipped:
@@ -2123,29 +4555,239 @@ def kiosk_manage(kslug):
                 try:
                     if os.path.isfile(fp):
                         os.remove(fp)
+                        _KIOSK_INDEX.remove(kslug, fn)
+                        variant = os.path.join(_kiosk_display_dir(kslug, _kiosk_settings(kslug)), fn + KIOSK_DISPLAY_SUFFIX)
+                        if os.path.isfile(variant):
+                            os.remove(variant)
+                        with _KIOSK_HASH_LOCK:
+                            _KIOSK_HASH_CACHE.pop(fp, None)
+                            _KIOSK_HASH_CACHE.pop(variant, None)
                         flash("Image removed.", "success")
                 except Exception:
                     app.logger.warning("Could not remove kiosk image %s", fn, exc_info=True)
                     flash("Could not remove image.", "error")
 
+        elif action == "sources":
+            try:
+                days = max(0, int(request.form.get("source_days") or 0))
+            except ValueError:
+                flash("Days must be a whole number.", "error")
+                return redirect(url_for("kiosk_manage", kslug=kslug))
+            settings = _kiosk_settings(kslug)
+            settings["sources"] = _kiosk_sources({"sources": {
+                "enabled": bool(request.form.get("sources_enabled")),
+                "tasks": request.form.getlist("source_tasks"),
+                "folders": [ln.strip() for ln in request.form.get("source_folders", "").splitlines()],
+                "days": days,
+                "images_only": bool(request.form.get("source_images_only")),
+                "orientation": request.form.get("source_orientation", "any"),
+            }})
+            _save_kiosk_settings(kslug, settings)
+            flash("Sources saved.", "success")
+
+        elif action == "reshuffle":
+            settings = _kiosk_settings(kslug)
+            settings["shuffle_seed"] = secrets.token_hex(4)
+            _save_kiosk_settings(kslug, settings)
+            flash("Playlist reshuffled.", "success")
+
+        elif action == "rebuild_display":
+            shutil.rmtree(os.path.join(kdir, "display"), ignore_errors=True)
+            _bg_scheduler.add_job(
+                _kiosk_display_backfill, args=[kslug], id=f"kiosk_display_{kslug}", replace_existing=True,
+            )
+            flash("Rebuilding display images in the background.", "success")
+
+        _kiosk_playlist_invalidate(kslug)
         return redirect(url_for("kiosk_manage", kslug=kslug))
 
     settings = _kiosk_settings(kslug)
-    idir = os.path.join(kdir, "images")
-    kiosk_images = []
-    if os.path.isdir(idir):
-        for fn in sorted(os.listdir(idir)):
-            if os.path.isfile(os.path.join(idir, fn)):
-                kiosk_images.append(fn)
+    kiosk_images = [fn for fn, _size, _mtime in _KIOSK_INDEX.images(kslug)]
 
     return render_template(
         "kiosk_manage.html",
         kslug=kslug,
         settings=settings,
         kiosk_images=kiosk_images,
+        display_default=(KIOSK_DISPLAY_WIDTH, KIOSK_DISPLAY_HEIGHT),
+        sources=_kiosk_sources(settings),
+        tasks=load_tasks(),
+        upload_max_mb=KIOSK_UPLOAD_MAX_BYTES // (1024 * 1024),
     )
 
 
+# ── Kiosk chunked uploads ───────────────────────────────────────────────────
+#
+# POST   /kiosks/<k>/uploads                {filename, size}  -> {id, offset, chunk_size}
+# PUT    /kiosks/<k>/uploads/<id>?offset=N  raw bytes         -> {offset}
+#        (optional X-Chunk-SHA256 header, verified before the chunk counts)
+# GET    /kiosks/<k>/uploads/<id>                             -> {offset, size, filename}
+# POST   /kiosks/<k>/uploads/<id>/complete  {sha256}          -> {name}
+# DELETE /kiosks/<k>/uploads/<id>
+#
+# Chunks are streamed to uploads/<id>.part with constant memory; a client
+# resumes by asking for the current offset. Sessions idle for a day are
+# removed when the next one starts.
+
+KIOSK_UPLOAD_MAX_BYTES = int(float(os.environ.get("KIOSK_UPLOAD_MAX_MB", "200")) * 1024 * 1024)
+KIOSK_UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+KIOSK_UPLOAD_STALE_SECONDS = 86400
+_UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+def _kiosk_upload_paths(kslug: str, upload_id: str) -> Tuple[str, str]:
+    udir = os.path.join(KIOSKS_ROOT, kslug, "uploads")
+    return os.path.join(udir, upload_id + ".part"), os.path.join(udir, upload_id + ".json")
+
+def _kiosk_upload_session(kslug: str, upload_id: str) -> Optional[dict]:
+    if not is_valid_slug(kslug) or not _UPLOAD_ID_RE.match(upload_id):
+        return None
+    part, meta = _kiosk_upload_paths(kslug, upload_id)
+    raw = read_text(meta)
+    try:
+        session = json.loads(raw) if raw else None
+    except ValueError:
+        return None
+    if session is None or not os.path.isfile(part):
+        return None
+    session["offset"] = os.path.getsize(part)
+    return session
+
+def _kiosk_upload_cleanup(kslug: str) -> None:
+    udir = os.path.join(KIOSKS_ROOT, kslug, "uploads")
+    if not os.path.isdir(udir):
+        return
+    cutoff = time.time() - KIOSK_UPLOAD_STALE_SECONDS
+    for fn in os.listdir(udir):
+        fp = os.path.join(udir, fn)
+        try:
+            if os.path.getmtime(fp) < cutoff:
+                os.remove(fp)
+        except OSError:
+            pass
+
+@app.route("/kiosks/<kslug>/uploads", methods=["POST"])
+def kiosk_upload_start(kslug):
+    if not is_valid_slug(kslug) or not os.path.isdir(os.path.join(KIOSKS_ROOT, kslug)):
+        return jsonify({"error": "Kiosk not found"}), 404
+    body = request.get_json(silent=True) or {}
+    fn = secure_filename(str(body.get("filename") or ""))
+    ext = os.path.splitext(fn)[1].lower()
+    if not fn or ext not in IMAGE_EXTS:
+        return jsonify({"error": f"Unsupported type (allowed: {', '.join(sorted(IMAGE_EXTS))})"}), 400
+    try:
+        size = int(body.get("size"))
+    except (TypeError, ValueError):
+        return jsonify({"error": "size is required"}), 400
+    if size <= 0 or size > KIOSK_UPLOAD_MAX_BYTES:
+        return jsonify({"error": f"File too large (max {KIOSK_UPLOAD_MAX_BYTES // (1024 * 1024)} MB)"}), 413
+    _kiosk_upload_cleanup(kslug)
+    upload_id = secrets.token_hex(16)
+    part, meta = _kiosk_upload_paths(kslug, upload_id)
+    os.makedirs(os.path.dirname(part), exist_ok=True)
+    open(part, "wb").close()
+    write_text(meta, json.dumps({"filename": fn, "size": size, "created": time.time()}))
+    return jsonify({"id": upload_id, "offset": 0, "chunk_size": KIOSK_UPLOAD_CHUNK_BYTES}), 201
+
+@app.route("/kiosks/<kslug>/uploads/<upload_id>", methods=["GET"])
+def kiosk_upload_status(kslug, upload_id):
+    session = _kiosk_upload_session(kslug, upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    return jsonify({
+        "offset": session["offset"], "size": session["size"], "filename": session["filename"],
+        "chunk_size": KIOSK_UPLOAD_CHUNK_BYTES,
+    })
+
+@app.route("/kiosks/<kslug>/uploads/<upload_id>", methods=["PUT"])
+def kiosk_upload_chunk(kslug, upload_id):
+    """Append the request body at ``?offset=``, which must equal the bytes
+    received so far (409 with the current offset otherwise). A chunk whose
+    X-Chunk-SHA256 does not match is discarded (422)."""
+    session = _kiosk_upload_session(kslug, upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    try:
+        offset = int(request.args.get("offset", ""))
+    except ValueError:
+        return jsonify({"error": "offset is required"}), 400
+    part, _meta = _kiosk_upload_paths(kslug, upload_id)
+    with open(part, "r+b") as out:
+        try:
+            fcntl.flock(out, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            return jsonify({"error": "Another chunk is being written", "offset": session["offset"]}), 409
+        current = os.fstat(out.fileno()).st_size
+        if offset != current:
+            return jsonify({"error": "Offset mismatch", "offset": current}), 409
+        out.seek(current)
+        written = 0
+        h = hashlib.sha256()
+        while True:
+            chunk = request.stream.read(1024 * 1024)
+            if not chunk:
+                break
+            written += len(chunk)
+            if current + written > session["size"]:
+                out.truncate(current)
+                return jsonify({"error": "Chunk exceeds the declared size", "offset": current}), 413
+            h.update(chunk)
+            out.write(chunk)
+        expected = request.headers.get("X-Chunk-SHA256", "").lower()
+        if expected and expected != h.hexdigest():
+            out.truncate(current)
+            return jsonify({"error": "Chunk checksum mismatch", "offset": current}), 422
+    return jsonify({"offset": current + written})
+
+@app.route("/kiosks/<kslug>/uploads/<upload_id>/complete", methods=["POST"])
+def kiosk_upload_complete(kslug, upload_id):
+    """Verify size and sha256, move the file into images/ and queue its
+    display variant."""
+    session = _kiosk_upload_session(kslug, upload_id)
+    if session is None:
+        return jsonify({"error": "Upload not found"}), 404
+    if session["offset"] != session["size"]:
+        return jsonify({"error": "Upload incomplete", "offset": session["offset"]}), 409
+    part, meta = _kiosk_upload_paths(kslug, upload_id)
+    h = hashlib.sha256()
+    with open(part, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    expected = str((request.get_json(silent=True) or {}).get("sha256") or "").lower()
+    if expected and expected != h.hexdigest():
+        for fp in (part, meta):
+            try:
+                os.remove(fp)
+            except OSError:
+                pass
+        return jsonify({"error": "Checksum mismatch"}), 422
+    fn = session["filename"]
+    dest = os.path.join(KIOSKS_ROOT, kslug, "images", fn)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    os.replace(part, dest)
+    try:
+        os.remove(meta)
+    except OSError:
+        pass
+    st = os.stat(dest)
+    with _KIOSK_HASH_LOCK:
+        _KIOSK_HASH_CACHE[dest] = (st.st_size, st.st_mtime_ns, h.hexdigest()[:16])
+    _KIOSK_INDEX.add(kslug, fn, h.hexdigest()[:16])
+    _kiosk_display_variant(kslug, fn, _kiosk_settings(kslug), st.st_mtime_ns)
+    _kiosk_playlist_invalidate(kslug)
+    return jsonify({"name": fn, "sha256": h.hexdigest()})
+
+@app.route("/kiosks/<kslug>/uploads/<upload_id>", methods=["DELETE"])
+def kiosk_upload_abort(kslug, upload_id):
+    if _kiosk_upload_session(kslug, upload_id) is None:
+        return jsonify({"error": "Upload not found"}), 404
+    for fp in _kiosk_upload_paths(kslug, upload_id):
+        try:
+            os.remove(fp)
+        except OSError:
+            pass
+    return Response("", status=204)
+
+
 @app.route("/kiosks/<kslug>/delete", methods=["POST"])
 def kiosk_delete(kslug):
     if not is_valid_slug(kslug):
@@ -2155,6 +4797,7 @@ def kiosk_delete(kslug):
     if os.path.isdir(kdir):
         try:
             shutil.rmtree(kdir)
+            _KIOSK_INDEX.drop(kslug)
             flash("Kiosk deleted.", "success")
         except Exception:
             app.logger.exception("Could not delete kiosk %s", kslug)
@@ -2172,38 +4815,121 @@ def kiosk_display(kslug):
     if not os.path.isdir(kdir):
         return "Kiosk not found", 404
     settings = _kiosk_settings(kslug)
-    return render_template("kiosk_display.html", kslug=kslug, settings=settings)
+    return render_template(
+        "kiosk_display.html", kslug=kslug, settings=settings,
+        playlist_poll_seconds=KIOSK_PLAYLIST_POLL_SECONDS,
+    )
 
 
 @app.route("/kiosk/<kslug>/images")
 def kiosk_images_api(kslug):
+    """One page of the playlist (``?offset=&limit=``, KIOSK_PAGE_SIZE by
+    default). ``?after=<key>`` starts the page right after that entry
+    instead, so a player walking the pages neither skips nor repeats items
+    when new downloads shift the list; ``offset`` is the fallback when the
+    entry is gone. URLs carry a content token. ``version`` hashes the whole
+    ordered playlist, ``page_version`` only this page, and the latter is
+    the (weak) ETag, so a page nothing changed on costs players a 304.
+    ``next_offset`` is null on the last page."""
     if not is_valid_slug(kslug):
         return jsonify({"error": "Invalid"}), 400
-    idir = os.path.join(KIOSKS_ROOT, kslug, "images")
+    if not os.path.isdir(os.path.join(KIOSKS_ROOT, kslug)):
+        return jsonify({"error": "Not found"}), 404
+    try:
+        offset = max(0, int(request.args.get("offset", 0)))
+        limit = max(1, min(KIOSK_PAGE_MAX, int(request.args.get("limit", KIOSK_PAGE_SIZE))))
+    except ValueError:
+        return jsonify({"error": "offset and limit must be integers"}), 400
     settings = _kiosk_settings(kslug)
-    images = []
-    if os.path.isdir(idir):
-        for fn in os.listdir(idir):
-            if os.path.isfile(os.path.join(idir, fn)):
-                images.append({
-                    "name": fn,
-                    "url": url_for("kiosk_media", kslug=kslug, filename=fn),
-                })
-    return jsonify({
+    entries, version = _kiosk_playlist(kslug, settings)
+    after = request.args.get("after")
+    if after:
+        offset = next((i + 1 for i, e in enumerate(entries) if e["key"] == after), offset)
+    page = entries[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(entries) else None
+    page_digest = hashlib.sha1(json.dumps(
+        # Where the page starts may shift; players only care whether it is first/last
+        [settings.get("interval", 10), settings.get("order", "random"), offset == 0, next_offset is None],
+    ).encode("utf-8"))
+    for e in page:
+        page_digest.update(f"\0{e['url']}".encode("utf-8", errors="ignore"))
+    page_version = page_digest.hexdigest()[:16]
+    resp = jsonify({
         "slug": kslug,
         "name": settings.get("name", kslug),
         "interval": settings.get("interval", 10),
         "order": settings.get("order", "random"),
-        "images": images,
+        "version": version,
+        "page_version": page_version,
+        "total": len(entries),
+        "offset": offset,
+        "next_offset": next_offset,
+        "images": [{k: e[k] for k in ("key", "name", "type", "hash", "url")} for e in page],
     })
+    # Weak: total and version may differ while this page's content does not
+    resp.set_etag(f"kiosk-{page_version}", weak=True)
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
 
 @app.route("/kiosk/<kslug>/media/<filename>")
 def kiosk_media(kslug, filename):
     if not is_valid_slug(kslug) or "/" in filename or "\\" in filename or ".." in filename:
         return "Invalid", 400
-    idir = os.path.join(KIOSKS_ROOT, kslug, "images")
-    return send_from_directory(idir, filename)
+    path = safe_join(os.path.join(KIOSKS_ROOT, kslug, "images"), filename)
+    if path is None or not os.path.isfile(path):
+        return Response("", status=404)
+    return _kiosk_send(path, _KIOSK_INDEX.hash(kslug, filename))
+
+
+@app.route("/kiosk/<kslug>/display/<filename>")
+def kiosk_display_file(kslug, filename):
+    """Display-sized variant of a kiosk image (see _kiosk_display_variant)."""
+    if not is_valid_slug(kslug) or "/" in filename or "\\" in filename or ".." in filename:
+        return "Invalid", 400
+    path = safe_join(_kiosk_display_dir(kslug, _kiosk_settings(kslug)), filename + KIOSK_DISPLAY_SUFFIX)
+    if path is None or not os.path.isfile(path):
+        return Response("", status=404)
+    return _kiosk_send(path)
+
+
+@app.route("/kiosk/<kslug>/library/<path:subpath>")
+def kiosk_library_file(kslug, subpath):
+    """A download played by a kiosk's library sources. Stills are scaled to
+    the kiosk's screen width through the variant cache."""
+    if not is_valid_slug(kslug):
+        return "Invalid", 400
+    src = safe_join(DOWNLOADS_ROOT, subpath)
+    try:
+        st = os.stat(src) if src else None
+    except OSError:
+        st = None
+    if st is None or not os.path.isfile(src):
+        return Response("", status=404)
+    path = None
+    ext = os.path.splitext(src)[1].lower()
+    if ext in IMAGE_EXTS and ext != ".gif" and _variant_encoders() and not _media_is_corrupt(subpath):
+        width = _kiosk_display_spec(_kiosk_settings(kslug))[0]
+        path = _THUMB_CACHE.get(src, width, _negotiate_variant_format())
+    resp = _kiosk_send(path or src, _kiosk_library_token(st.st_size, st.st_mtime))
+    resp.vary.add("Accept")
+    return resp
+
+
+@app.route("/kiosk/<kslug>/sw.js")
+def kiosk_service_worker(kslug):
+    """Service worker that keeps the kiosk playing offline (see kiosk_sw.js)."""
+    if not is_valid_slug(kslug):
+        return "Invalid", 400
+    scope = url_for("kiosk_display", kslug=kslug)
+    resp = Response(
+        render_template("kiosk_sw.js", kslug=kslug, scope=scope),
+        mimetype="application/javascript",
+    )
+    # Registered from /kiosk/<kslug>, which sits outside this script's default scope
+    resp.headers["Service-Worker-Allowed"] = scope
+    resp.cache_control.no_cache = True
+    return resp
 
 
 @app.route("/kiosk/<kslug>/manifest.json")
@@ -2224,6 +4950,262 @@ def kiosk_manifest(kslug):
     }
     return jsonify(manifest)
 
+# ---------------------------------------------------------------------
+# Thumbnail / variant cache (?w= on /media and /wall, /thumb/<path>)
+# ---------------------------------------------------------------------
+
+IMAGE_VARIANT_WIDTHS = (240, 480, 960)
+IMAGE_VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", "75"))
+IMAGE_VARIANT_TIMEOUT = 30
+THUMB_CACHE_DIR = os.path.join(CONFIG_ROOT, "thumbs")
+THUMB_CACHE_MAX_BYTES = int(float(os.environ.get("THUMB_CACHE_MAX_MB", "1024")) * 1024 * 1024)
+THUMB_DEFAULT_WIDTH = 480
+# Preference order when the client accepts several
+_VARIANT_FORMATS = (("avif", "image/avif"), ("webp", "image/webp"))
+
+@functools.lru_cache(maxsize=1)
+def _variant_encoders() -> frozenset:
+    return media_worker.encoder_formats()
+
+def _variant_width(raw: Optional[str]) -> Optional[int]:
+    """Round a requested width up to the next step (capped at the largest)."""
+    try:
+        want = int(raw or "")
+    except ValueError:
+        return None
+    if want <= 0:
+        return None
+    return next((w for w in IMAGE_VARIANT_WIDTHS if w >= want), IMAGE_VARIANT_WIDTHS[-1])
+
+def _negotiate_variant_format() -> str:
+    # Only explicit types count: "*/*" does not mean the client decodes AVIF
+    accepted = {mime for mime, q in request.accept_mimetypes if q > 0}
+    encoders = _variant_encoders()
+    for fmt, mime in _VARIANT_FORMATS:
+        if fmt in encoders and mime in accepted:
+            return fmt
+    return "jpeg"
+
+class ThumbnailCache:
+    """Resized images on disk, capped at ``max_bytes`` with LRU eviction.
+
+    Entries are tracked in the catalog's ``thumb_cache`` table, so
+    eviction picks the least recently used rows instead of walking the
+    directory. Concurrent requests for a missing entry share one render.
+    """
+
+    # Hits only rewrite last_access when it is older than this, to keep
+    # a busy grid from turning every hit into a write
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._inflight: dict = {}
+        self._total: Optional[int] = None
+        self.stats = {
+            "hits": 0, "misses": 0, "coalesced": 0, "failures": 0,
+            "evictions": 0, "evicted_bytes": 0,
+            "generated": 0, "generate_seconds_total": 0.0, "generate_seconds_max": 0.0,
+        }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, name[:2], name)
+
+    def _total_bytes(self, conn: sqlite3.Connection) -> int:
+        if self._total is None:
+            self._total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM thumb_cache").fetchone()[0]
+        return self._total
+
+    def get(self, src: str, width: int, fmt: str) -> Optional[str]:
+        """Path of ``src`` scaled to ``width`` in ``fmt``; rendered on first use."""
+        try:
+            st = os.stat(src)
+        except OSError:
+            return None
+        key = hashlib.sha1(f"{src}\0{st.st_mtime_ns}\0{st.st_size}".encode("utf-8", errors="ignore")).hexdigest()
+        name = f"{key}-{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+        path = self._path(name)
+        conn = _catalog_conn()
+        row = conn.execute("SELECT last_access FROM thumb_cache WHERE name = ?", (name,)).fetchone()
+        if row is not None and os.path.exists(path):
+            with self._lock:
+                self.stats["hits"] += 1
+            now = time.time()
+            if now - row["last_access"] > self.TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE thumb_cache SET last_access = ? WHERE name = ?", (now, name))
+            return path
+
+        with self._lock:
+            fut = self._inflight.get(name)
+            if fut is None:
+                fut = concurrent.futures.Future()
+                self._inflight[name] = fut
+                self.stats["misses"] += 1
+                leader = True
+            else:
+                self.stats["coalesced"] += 1
+                leader = False
+        if leader:
+            self._render(src, name, path, width, fmt, fut)
+        try:
+            return fut.result(timeout=IMAGE_VARIANT_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            # The render keeps going; _finished records it when it lands
+            app.logger.warning("thumbs: %s at %spx not ready after %ss", src, width, IMAGE_VARIANT_TIMEOUT)
+            return None
+
+    def _render(self, src: str, name: str, path: str, width: int, fmt: str, fut: concurrent.futures.Future) -> None:
+        """Start rendering ``name`` in the media pool. The outcome is recorded
+        by a done callback, not by the waiting request, so a render that
+        outlives its request's timeout still lands in the byte budget."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        t0 = time.perf_counter()
+        try:
+            job = _media_pool().submit(media_worker.make_variant, src, path, width, fmt, IMAGE_VARIANT_QUALITY)
+        except Exception:
+            app.logger.warning("thumbs: could not queue %s at %spx", src, width, exc_info=True)
+            self._resolve(name, fut, None, failed=True)
+            return
+        job.add_done_callback(lambda job: self._finished(job, src, name, path, width, t0, fut))
+
+    def _finished(self, job, src: str, name: str, path: str, width: int, t0: float,
+                  fut: concurrent.futures.Future) -> None:
+        try:
+            job.result()
+            size = os.path.getsize(path)
+        except Exception:
+            app.logger.warning("thumbs: could not render %s at %spx", src, width, exc_info=True)
+            self._resolve(name, fut, None, failed=True)
+            return
+        elapsed = time.perf_counter() - t0
+        conn = _catalog_conn()
+        try:
+            with self._lock:
+                self.stats["generated"] += 1
+                self.stats["generate_seconds_total"] += elapsed
+                self.stats["generate_seconds_max"] = max(self.stats["generate_seconds_max"], elapsed)
+                with conn:
+                    old = conn.execute("SELECT size FROM thumb_cache WHERE name = ?", (name,)).fetchone()
+                    conn.execute(
+                        "INSERT INTO thumb_cache (name, size, last_access) VALUES (?, ?, ?) "
+                        "ON CONFLICT(name) DO UPDATE SET size=excluded.size, last_access=excluded.last_access",
+                        (name, size, time.time()),
+                    )
+                self._total = self._total_bytes(conn) + size - (old["size"] if old else 0)
+                if self._total > self.max_bytes:
+                    self._evict(conn, keep=name)
+        except Exception:
+            app.logger.warning("thumbs: could not record %s", name, exc_info=True)
+        self._resolve(name, fut, path)
+
+    def _resolve(self, name: str, fut: concurrent.futures.Future, result: Optional[str], failed: bool = False) -> None:
+        with self._lock:
+            if failed:
+                self.stats["failures"] += 1
+            self._inflight.pop(name, None)
+        fut.set_result(result)
+
+    def _evict(self, conn: sqlite3.Connection, keep: str) -> None:
+        """Drop least recently used entries down to 90% of the budget."""
+        target = int(self.max_bytes * 0.9)
+        while self._total > target:
+            rows = conn.execute(
+                "SELECT name, size FROM thumb_cache WHERE name != ? ORDER BY last_access LIMIT 200", (keep,),
+            ).fetchall()
+            if not rows:
+                break
+            victims = []
+            for row in rows:
+                if self._total <= target:
+                    break
+                try:
+                    os.remove(self._path(row["name"]))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    app.logger.warning("thumbs: could not evict %s", row["name"], exc_info=True)
+                    continue
+                victims.append(row["name"])
+                self._total -= row["size"]
+                self.stats["evictions"] += 1
+                self.stats["evicted_bytes"] += row["size"]
+            with conn:
+                conn.executemany("DELETE FROM thumb_cache WHERE name = ?", [(n,) for n in victims])
+
+    def metrics(self) -> dict:
+        conn = _catalog_conn()
+        with self._lock:
+            out = dict(self.stats)
+        lookups = out["hits"] + out["misses"] + out["coalesced"]
+        out["hit_rate"] = round(out["hits"] / lookups, 4) if lookups else None
+        out["generate_seconds_avg"] = (
+            round(out["generate_seconds_total"] / out["generated"], 4) if out["generated"] else None
+        )
+        out["generate_seconds_total"] = round(out["generate_seconds_total"], 3)
+        out["generate_seconds_max"] = round(out["generate_seconds_max"], 4)
+        out["entries"] = conn.execute("SELECT COUNT(*) FROM thumb_cache").fetchone()[0]
+        out["bytes"] = self._total_bytes(conn)
+        out["max_bytes"] = self.max_bytes
+        return out
+
+_THUMB_CACHE = ThumbnailCache(THUMB_CACHE_DIR, THUMB_CACHE_MAX_BYTES)
+
+def _send_image_variant(src: str, max_age: Optional[int] = None) -> Optional[Response]:
+    """Serve a resized variant when the request carries ``?w=``; None means
+    the caller should send the original (no width, not a still image, or
+    Pillow missing/failed)."""
+    width = _variant_width(request.args.get("w"))
+    ext = os.path.splitext(src)[1].lower()
+    if width is None or ext not in IMAGE_EXTS or ext == ".gif" or not _variant_encoders():
+        return None
+    path = _THUMB_CACHE.get(src, width, _negotiate_variant_format())
+    if path is None:
+        return None
+    resp = _send_path(path, max_age)
+    resp.vary.add("Accept")
+    return resp
+
+def _srcset(url: str) -> str:
+    sep = "&" if "?" in url else "?"
+    return ", ".join(f"{url}{sep}w={w} {w}w" for w in IMAGE_VARIANT_WIDTHS)
+
+def _add_thumb_urls(item: dict) -> None:
+    """Preview URLs for a recent-downloads item (originals stay on ``url``)."""
+    if item.get("is_image") and os.path.splitext(item["rel"])[1].lower() != ".gif":
+        thumb = url_for("thumb_file", subpath=item["rel"])
+        item["thumb"] = f"{thumb}?w={IMAGE_VARIANT_WIDTHS[0]}"
+        item["srcset"] = _srcset(thumb)
+
+def _add_media_meta(items: List[dict]) -> None:
+    meta = _media_meta_lookup(item["rel"] for item in items if item.get("is_image"))
+    for item in items:
+        item.update(meta.get(item["rel"], {}))
+
+@app.route("/thumb/<path:subpath>")
+def thumb_file(subpath):
+    """Resized preview of a download; ``?w=`` defaults to THUMB_DEFAULT_WIDTH.
+    Falls back to the original when no variant can be made."""
+    ensure_data_dirs(ensure_downloads=True)
+    src = safe_join(DOWNLOADS_ROOT, subpath)
+    if src is None or not os.path.isfile(src):
+        return Response("", status=404)
+    width = _variant_width(request.args.get("w")) or THUMB_DEFAULT_WIDTH
+    ext = os.path.splitext(src)[1].lower()
+    path = None
+    if ext in IMAGE_EXTS and ext != ".gif" and _variant_encoders() and not _media_is_corrupt(subpath):
+        path = _THUMB_CACHE.get(src, width, _negotiate_variant_format())
+    resp = _send_path(path or src)
+    resp.vary.add("Accept")
+    return resp
+
+@app.route("/api/thumbs")
+def api_thumbs():
+    """Thumbnail cache metrics: hit rate, evictions, generation latency."""
+    return jsonify(_THUMB_CACHE.metrics())
+
 # ---------------------------------------------------------------------
 # Original media route (serves from /downloads)
 # ---------------------------------------------------------------------
@@ -2231,16 +5213,56 @@ def kiosk_manifest(kslug):
 @app.route("/media/<path:subpath>")
 def media_file(subpath):
     ensure_data_dirs(ensure_downloads=True)
-    return send_from_directory(DOWNLOADS_ROOT, subpath)
+    src = safe_join(DOWNLOADS_ROOT, subpath)
+    if src is None or not os.path.isfile(src):
+        return Response("", status=404)
+    if "w" in request.args and not _media_is_corrupt(subpath):
+        resp = _send_image_variant(src)
+        if resp is not None:
+            return resp
+    return _send_path(src)
 
 # ---------------------------------------------------------------------
 # Main (dev only)
 # ---------------------------------------------------------------------
 
 # ── Start APScheduler (skip double-start under Werkzeug reloader) ──────────────
-if not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+if not _IS_POOL_WORKER and (not app.debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
     try:
         _load_all_schedules()
+        _wall_cache_mode()  # probe the cache filesystem once, before any refresh
+        _schedule_media_wall_refresh()
+        _media_wall_warmup()
+        _bg_scheduler.add_job(
+            _kiosk_display_backfill, id="kiosk_display_backfill", replace_existing=True,
+            next_run_time=dt.datetime.now() + dt.timedelta(seconds=60),
+        )
+        _bg_scheduler.add_job(
+            _media_probe_backfill, trigger=CronTrigger(minute="*/30"),
+            id="media_probe_backfill", replace_existing=True,
+            next_run_time=dt.datetime.now() + dt.timedelta(seconds=30),
+        )
+        _bg_scheduler.add_job(
+            _catalog_reconcile,
+            trigger=_make_cron_trigger(CATALOG_RECONCILE_CRON) or CronTrigger(hour="*/6", minute=17),
+            id="catalog_reconcile",
+            replace_existing=True,
+        )
+        if CRAWL_CRON:
+            crawl_trigger = _make_cron_trigger(CRAWL_CRON)
+            if crawl_trigger is not None:
+                _bg_scheduler.add_job(_crawl_downloads, trigger=crawl_trigger, id="downloads_crawl", replace_existing=True)
+            else:
+                app.logger.warning("Invalid CRAWL_CRON '%s' — scheduled crawl disabled", CRAWL_CRON)
+        if DUPLICATE_SCAN_CRON:
+            dhash_trigger = _make_cron_trigger(DUPLICATE_SCAN_CRON)
+            if dhash_trigger is not None:
+                _bg_scheduler.add_job(_dhash_job, trigger=dhash_trigger, id="dhash_index", replace_existing=True)
+            else:
+                app.logger.warning("Invalid DUPLICATE_SCAN_CRON '%s' — duplicate scan disabled", DUPLICATE_SCAN_CRON)
+        threading.Thread(target=_catalog_seed_from_logs, daemon=True).start()
+        if DOWNLOADS_WATCH_ENABLED:
+            _start_downloads_watcher()
         _bg_scheduler.start()
         atexit.register(lambda: _bg_scheduler.shutdown(wait=False))
         app.logger.info("APScheduler started; %d job(s) loaded.", len(_bg_scheduler.get_jobs()))
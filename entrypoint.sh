@@ -74,6 +74,36 @@ umask "$UMASK"
 
 
 
+# Optional bundled nginx in front of gunicorn: it streams media files the
+# app hands over with X-Accel-Redirect instead of tying up gunicorn threads.
+NGINX_ENABLED="${NGINX_ENABLED:-0}"
+NGINX_PORT="${NGINX_PORT:-8080}"
+NGINX_UPSTREAM="${NGINX_UPSTREAM:-127.0.0.1:80}"
+
+if [ "$NGINX_ENABLED" = "1" ]; then
+  if command -v nginx > /dev/null 2>&1; then
+    mkdir -p /tmp/nginx
+    NGINX_USER_SED=""
+    if [ "$APP_USER_SPEC" = "root" ]; then
+      NGINX_USER_SED="s|^#user __NGINX_USER__;|user root;|"
+    fi
+    sed -e "$NGINX_USER_SED" \
+        -e "s|__NGINX_PORT__|$NGINX_PORT|g" \
+        -e "s|__NGINX_UPSTREAM__|$NGINX_UPSTREAM|g" \
+        -e "s|__CONFIG_DIR__|$CONFIG_DIR|g" \
+        -e "s|__DOWNLOADS_DIR__|$DOWNLOADS_DIR|g" \
+        /app/nginx/artillery.conf > /tmp/nginx/nginx.conf
+    if [ "$APP_USER_SPEC" != "root" ]; then
+      chown -R "$APP_USER_SPEC" /tmp/nginx
+    fi
+    export ARTILLERY_FILE_OFFLOAD="${ARTILLERY_FILE_OFFLOAD:-x-accel}"
+    log "Starting nginx on :$NGINX_PORT (proxying to $NGINX_UPSTREAM, file offload: $ARTILLERY_FILE_OFFLOAD)..."
+    gosu "$APP_USER_SPEC" nginx -c /tmp/nginx/nginx.conf
+  else
+    log "NGINX_ENABLED=1 but nginx is not installed — files are served by gunicorn"
+  fi
+fi
+
 log "Starting web app as $APP_USER_SPEC..."
 # Exec gunicorn as the chosen user so it writes files with correct ownership
 exec gosu "$APP_USER_SPEC" "$@"
@@ -0,0 +1,214 @@
+"""Media processing helpers executed in Artillery's worker process pool.
+
+This module must stay free of Flask/app imports: pool workers are spawned
+fresh and import only this file, so they never re-run the web app's
+startup code (scheduler, background threads).
+"""
+import base64
+import contextlib
+import io
+import os
+import signal
+import threading
+from typing import FrozenSet, List, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Pillow is optional; callers fall back to copying originals
+    Image = None
+    ImageOps = None
+    features = None
+
+try:
+    import numpy as np
+except ImportError:  # optional; dhash_batch falls back to plain Python
+    np = None
+
+
+def pillow_available() -> bool:
+    return Image is not None
+
+
+def encoder_formats() -> FrozenSet[str]:
+    """Output formats this Pillow build can write ("jpeg" always, if Pillow is present)."""
+    if Image is None:
+        return frozenset()
+    formats = {"jpeg"}
+    for fmt in ("webp", "avif"):
+        if features.check(fmt):
+            formats.add(fmt)
+    return frozenset(formats)
+
+
+def _save(im, dst: str, fmt: str, quality: int) -> None:
+    tmp = dst + ".tmp"
+    if fmt == "jpeg":
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        im.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    elif fmt == "avif":
+        im.save(tmp, "AVIF", quality=quality, speed=8)
+    else:
+        im.save(tmp, "WEBP", quality=quality, method=4)
+    os.replace(tmp, dst)
+
+
+def _prepare(im, edge: int):
+    im.draft("RGB", (edge, edge))  # JPEG: decode at a reduced scale
+    im = ImageOps.exif_transpose(im)
+    if im.mode not in ("RGB", "RGBA"):
+        im = im.convert("RGBA" if "transparency" in im.info or im.mode in ("LA", "PA") else "RGB")
+    return im
+
+
+def make_thumbnail(src: str, dst: str, max_edge: int, fmt: str = "webp", quality: int = 80) -> Tuple[int, int]:
+    """Write a downsized copy of ``src`` (longest edge <= max_edge) to ``dst``.
+
+    Returns the thumbnail's (width, height).
+    """
+    with Image.open(src) as im:
+        im = _prepare(im, max_edge)
+        im.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        _save(im, dst, fmt, quality)
+        return im.size
+
+
+def make_variant(src: str, dst: str, width: int, fmt: str = "webp", quality: int = 75) -> Tuple[int, int]:
+    """Write ``src`` scaled to ``width`` pixels wide (never upscaled) to ``dst``.
+
+    Unlike make_thumbnail this bounds the width only, matching srcset "w"
+    descriptors. Returns the variant's (width, height).
+    """
+    with Image.open(src) as im:
+        im = _prepare(im, width)
+        if im.width > width:
+            im = im.resize((width, max(1, round(im.height * width / im.width))), Image.LANCZOS)
+        _save(im, dst, fmt, quality)
+        return im.size
+
+
+def make_display_variant(src: str, dst: str, width: int, height: int, fit: str = "contain",
+                         background: Tuple[int, int, int] = (0, 0, 0), quality: int = 85) -> Tuple[int, int]:
+    """Write ``src`` sized for a ``width`` x ``height`` screen to ``dst`` as
+    progressive JPEG. ``fit`` follows the kiosk setting: "contain" fits the
+    image inside the screen, "cover" fills it and crops the overflow,
+    "center" crops to the screen at native scale. Never upscales; alpha is
+    flattened onto ``background``. Returns the variant's (width, height).
+    """
+    with Image.open(src) as im:
+        im = _prepare(im, max(im.size) if fit == "center" else max(width, height))
+        if fit == "contain":
+            im.thumbnail((width, height), Image.LANCZOS)
+        else:
+            if fit == "cover":
+                scale = max(width / im.width, height / im.height)
+                if scale < 1:
+                    im = im.resize((max(1, round(im.width * scale)), max(1, round(im.height * scale))), Image.LANCZOS)
+            w, h = min(width, im.width), min(height, im.height)
+            left, top = (im.width - w) // 2, (im.height - h) // 2
+            im = im.crop((left, top, left + w, top + h))
+        if im.mode == "RGBA":
+            flat = Image.new("RGB", im.size, background)
+            flat.paste(im, mask=im.getchannel("A"))
+            im = flat
+        _save(im, dst, "jpeg", quality)
+        return im.size
+
+
+class ProbeTimeout(Exception):
+    """A probe ran longer than its own time limit (queue time not included)."""
+
+
+@contextlib.contextmanager
+def _time_limit(seconds: Optional[float]):
+    """Raise ProbeTimeout inside the block once ``seconds`` have passed.
+
+    Pool workers run jobs on their main thread, where SIGALRM can interrupt
+    the decode; elsewhere (threads, platforms without setitimer) the block
+    runs unbounded.
+    """
+    if not seconds or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _expired(signum, frame):
+        raise ProbeTimeout(f"probe took longer than {seconds}s")
+
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+# EXIF orientations that swap width and height
+_ROTATED_ORIENTATIONS = (5, 6, 7, 8)
+
+
+def probe_image(src: str, edge: int = 16, quality: int = 40, timeout: Optional[float] = None) -> dict:
+    """Probe an image: displayed width/height, codec, frame count and a
+    tiny blurred preview as a data URI for placeholders. WebP keeps the
+    preview around 100-200 bytes; JPEG's fixed header overhead makes it 600+.
+
+    Raises on files Pillow cannot decode (truncated, corrupt, not an image),
+    and ProbeTimeout when decoding takes longer than ``timeout`` seconds.
+    """
+    with _time_limit(timeout), Image.open(src) as im:
+        width, height = im.size
+        codec = (im.format or "").lower()
+        frames = getattr(im, "n_frames", 1)
+        if im.getexif().get(0x0112) in _ROTATED_ORIENTATIONS:
+            width, height = height, width
+        im = _prepare(im, edge)
+        im.thumbnail((edge, edge), Image.BILINEAR)  # forces a decode, so corruption surfaces here
+        if im.mode != "RGB":
+            im = im.convert("RGB")
+        fmt = "webp" if features.check("webp") else "jpeg"
+        buf = io.BytesIO()
+        im.save(buf, fmt.upper(), quality=quality)
+    return {
+        "width": width, "height": height, "codec": codec, "frames": frames,
+        "lqip": f"data:image/{fmt};base64," + base64.b64encode(buf.getvalue()).decode("ascii"),
+    }
+
+
+def _dhash_pixels(src: str) -> bytes:
+    """9x8 grayscale pixels of ``src``, the input of a 64-bit dHash."""
+    with Image.open(src) as im:
+        im.draft("L", (64, 64))
+        im = ImageOps.exif_transpose(im).convert("L")
+        return im.resize((9, 8), Image.BILINEAR).tobytes()
+
+
+def dhash_batch(paths: List[str]) -> List[Optional[int]]:
+    """Unsigned 64-bit difference hashes for ``paths`` (None where a file
+    cannot be decoded). Bit i is set when the right-hand neighbour of
+    pixel i is brighter than pixel i; the comparison runs over the whole batch at once
+    when NumPy is available."""
+    pixels: List[Optional[bytes]] = []
+    for path in paths:
+        try:
+            pixels.append(_dhash_pixels(path))
+        except Exception:
+            pixels.append(None)
+    ok = [i for i, p in enumerate(pixels) if p is not None]
+    hashes: List[Optional[int]] = [None] * len(paths)
+    if not ok:
+        return hashes
+    if np is not None:
+        grid = np.frombuffer(b"".join(pixels[i] for i in ok), dtype=np.uint8).reshape(len(ok), 8, 9)
+        bits = (grid[:, :, 1:] > grid[:, :, :-1]).reshape(len(ok), 64)
+        packed = np.packbits(bits, axis=1).view(">u8").ravel()
+        for i, h in zip(ok, packed.tolist()):
+            hashes[i] = h
+    else:
+        for i in ok:
+            p = pixels[i]
+            h = 0
+            for row in range(8):
+                for col in range(8):
+                    h = (h << 1) | (p[row * 9 + col + 1] > p[row * 9 + col])
+            hashes[i] = h
+    return hashes
@@ -0,0 +1,113 @@
+// Offline-first playback for kiosk "{{ kslug }}".
+//
+// Image URLs carry a content hash (?v=...), so a cached response never goes
+// stale: they are served cache-first and precached whenever the playlist
+// changes. Videos are left to the network (and the HTTP cache): they are
+// large, and the player fetches them with Range requests. The page and the playlist are network-first with the cache as the
+// offline fallback; the playlist is revalidated by ETag, so an unchanged
+// kiosk costs one 304 per poll.
+var CACHE    = {{ ("kiosk-" ~ kslug)|tojson }};
+var PAGE     = {{ scope|tojson }};
+var PLAYLIST = {{ url_for("kiosk_images_api", kslug=kslug)|tojson }};
+var MEDIA    = [{{ (scope ~ "/media/")|tojson }}, {{ (scope ~ "/display/")|tojson }}, {{ (scope ~ "/library/")|tojson }}];
+var PRECACHE_CONCURRENCY = 2;
+// Paged playlists: how many media entries to keep beyond the current page
+var MAX_CACHED = 600;
+
+function isMedia(url) {
+    return url.searchParams.has('v') && MEDIA.some(function(p) { return url.pathname.indexOf(p) === 0; });
+}
+
+function isVideoRequest(request) {
+    return request.destination === 'video' || request.headers.has('range');
+}
+
+self.addEventListener('install', function(event) {
+    self.skipWaiting();
+    event.waitUntil(caches.open(CACHE).then(function(cache) {
+        return cache.addAll([PAGE, PLAYLIST + '?offset=0']);
+    }).catch(function() {}));
+});
+
+self.addEventListener('activate', function(event) {
+    event.waitUntil(self.clients.claim());
+});
+
+// Cache every image of the playlist page that is not cached yet (videos
+// are skipped). A single-page playlist also drops the entries it no longer
+// lists; for paged playlists the oldest entries beyond MAX_CACHED are
+// dropped instead. Only changed images are downloaded.
+function syncPlaylist(playlist) {
+    var complete = !playlist.offset && playlist.next_offset == null;
+    var wanted = {};
+    (playlist.images || []).forEach(function(img) {
+        if (img.type !== 'video') wanted[new URL(img.url, self.location).href] = true;
+    });
+    return caches.open(CACHE).then(function(cache) {
+        return cache.keys().then(function(requests) {
+            var have = {};
+            var others = [];
+            requests.forEach(function(req) {
+                if (!isMedia(new URL(req.url))) return;
+                if (wanted[req.url]) have[req.url] = true;
+                else others.push(req);
+            });
+            // cache.keys() lists entries oldest first
+            var drop = complete ? others : others.slice(0, Math.max(0, others.length - MAX_CACHED));
+            drop.forEach(function(req) { cache.delete(req); });
+            var missing = Object.keys(wanted).filter(function(u) { return !have[u]; });
+            function worker() {
+                var next = missing.shift();
+                if (!next) return Promise.resolve();
+                return cache.add(next).catch(function() {}).then(worker);
+            }
+            var workers = [];
+            for (var i = 0; i < PRECACHE_CONCURRENCY; i++) workers.push(worker());
+            return Promise.all(workers);
+        });
+    });
+}
+
+function networkFirst(event, onFresh) {
+    return fetch(event.request).then(function(resp) {
+        if (resp.ok) {
+            var copy = resp.clone();
+            event.waitUntil(caches.open(CACHE).then(function(cache) {
+                return cache.put(event.request.url, copy.clone()).then(function() {
+                    return onFresh ? copy.json().then(onFresh) : null;
+                });
+            }).catch(function() {}));
+        }
+        return resp;
+    }).catch(function() {
+        return caches.match(event.request.url).then(function(hit) {
+            return hit || Response.error();
+        });
+    });
+}
+
+function cacheFirst(event) {
+    return caches.open(CACHE).then(function(cache) {
+        return cache.match(event.request.url).then(function(hit) {
+            if (hit) return hit;
+            return fetch(event.request).then(function(resp) {
+                if (resp.ok) cache.put(event.request.url, resp.clone());
+                return resp;
+            });
+        });
+    });
+}
+
+self.addEventListener('fetch', function(event) {
+    if (event.request.method !== 'GET') return;
+    var url = new URL(event.request.url);
+    if (url.origin !== self.location.origin) return;
+    if (url.pathname === PLAYLIST) {
+        // Each page (?offset=) is cached under its own URL
+        event.respondWith(networkFirst(event, syncPlaylist));
+    } else if (url.pathname === PAGE) {
+        event.respondWith(networkFirst(event));
+    } else if (isMedia(url) && !isVideoRequest(event.request)) {
+        event.respondWith(cacheFirst(event));
+    }
+});
@@ -0,0 +1,87 @@
+"""Log path extraction: one precompiled buffer scan vs. the old per-line parser.
+
+Run with ``python -m pytest tests/benchmarks --benchmark-only``.
+"""
+import os
+import random
+import re
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+ROOT = "/downloads"
+LINES = 5000
+
+
+def _legacy_extract(line, downloads_root, media_exts):
+    """The per-line parser _LogPathExtractor replaced, kept as the baseline."""
+    s = line.strip()
+    if not s:
+        return None
+    s = s.replace("\\", "/")
+    dr = downloads_root.replace("\\", "/").rstrip("/")
+    dr_short = dr.lstrip("/")
+    media_pattern = r"(?:jpg|jpeg|png|gif|webp|mp4|webm|mkv)"
+    full_match = re.search(re.escape(dr) + r"/[^\r\n]*?\." + media_pattern, s, re.IGNORECASE)
+    if full_match:
+        rel = full_match.group(0)[len(dr):].lstrip("/")
+        if rel:
+            return rel
+    candidates = [tok for tok in re.split(r"\s+", s) if tok.startswith(dr)]
+    if not candidates and dr in s:
+        candidates = [s[s.find(dr):].strip(" ,;\"'()[]")]
+    for cand in candidates:
+        for prefix in (dr, dr_short):
+            if cand.startswith(prefix + "/"):
+                rel = cand[len(prefix):].lstrip("/")
+                if rel and os.path.splitext(rel)[1].lower() in media_exts:
+                    return rel
+    return None
+
+
+def _synthetic_log(n):
+    """Mixed gallery-dl / yt-dlp output: about a third of the lines name a file."""
+    rnd = random.Random(28)
+    templates = [
+        "{root}/twitter/artist_{a}/{n}_1.jpg",
+        "# {root}/twitter/artist_{a}/{n}_2.png",
+        "{root}/danbooru/tag with spaces/{n}.webp",
+        "[download] Destination: {root}/youtube/Channel {a}/clip {n} [x{n}].mp4",
+        "[download] Destination: {root}/youtube/Channel {a}/clip {n}.f137.mp4.part",
+        '[Merger] Merging formats into "{root}/youtube/Channel {a}/clip {n}.mkv"',
+        "[download]  42.0% of ~  12.34MiB at  1.23MiB/s ETA 00:{a:02d}",
+        "[twitter][info] Requesting https://api.twitter.com/2/timeline/{n}.json",
+        "[danbooru][debug] GET https://danbooru.donmai.us/posts.json?page={a} 200",
+        "[youtube] {n}: Downloading webpage",
+        "[youtube] {n}: Downloading m3u8 information",
+        "[error] HttpError: '404 Not Found' for 'https://cdn.example.com/{n}.jpg'",
+    ]
+    return [rnd.choice(templates).format(root=ROOT, a=rnd.randrange(50), n=rnd.randrange(10 ** 9))
+            for _ in range(n)]
+
+
+@pytest.fixture(scope="module")
+def log_lines():
+    return _synthetic_log(LINES)
+
+
+def test_bench_legacy_per_line(benchmark, app_module, log_lines):
+    exts = app_module.MEDIA_EXTS
+    found = benchmark(lambda: [r for r in (_legacy_extract(l, ROOT, exts) for l in log_lines) if r])
+    assert found
+
+
+def test_bench_extractor_per_line(benchmark, app_module, log_lines):
+    extract = app_module._LogPathExtractor(ROOT).extract
+    found = benchmark(lambda: [r for r in map(extract, log_lines) if r])
+    assert found
+
+
+def test_bench_extractor_buffer(benchmark, app_module, log_lines):
+    extractor = app_module._LogPathExtractor(ROOT)
+    text = "\n".join(log_lines)
+    found = benchmark(lambda: list(extractor.iter_relpaths(text)))
+    # Same answers as the per-line path, and none of the partial downloads
+    assert found == [r for r in map(extractor.extract, log_lines) if r]
+    assert not any(r.endswith(".part") for r in found)
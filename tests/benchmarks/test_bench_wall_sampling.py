@@ -0,0 +1,73 @@
+"""Wall selection over a synthetic million-file library.
+
+Run with ``python -m pytest tests/benchmarks --benchmark-only``; set
+BENCH_WALL_FILES to change the library size.
+"""
+import os
+import random
+import time
+import tracemalloc
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+FILES = int(os.environ.get("BENCH_WALL_FILES", "1000000"))
+WALL = 100
+
+
+def _synthetic_tree(app_module, n):
+    """Catalog rows for ``n`` files spread over 20 tasks and 500 folders,
+    one in ten a video, with mtimes over the last two years."""
+    now = time.time()
+    rnd = random.Random(37)
+    kind = app_module.RUN_KIND_TASK
+    for i in range(n):
+        task = f"task{i % 20}"
+        video = i % 10 == 0
+        yield (f"{task}/artist{i % 500}/{i:07d}.{'mp4' if video else 'jpg'}", kind, task,
+               now - rnd.random() * 2 * 365 * 86400, "video" if video else "image")
+
+
+def _legacy_pick(rows, k, exclude):
+    """The set + random.sample selection _weighted_sample replaced."""
+    candidates = {rel for rel, *_ in rows} - exclude
+    return random.sample(list(candidates), k=min(k, len(candidates)))
+
+
+@pytest.fixture
+def weighted(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MEDIA_WALL_RECENCY_HALF_LIFE_DAYS", 30.0)
+    monkeypatch.setattr(app_module, "MEDIA_WALL_VIDEO_WEIGHT", 0.5)
+    monkeypatch.setattr(app_module, "_WALL_TASK_WEIGHTS", {"task1": 3.0, "task2": 0.5})
+    return app_module
+
+
+def _peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_bench_legacy_set_sample(benchmark, app_module):
+    picked = benchmark.pedantic(
+        lambda: _legacy_pick(_synthetic_tree(app_module, FILES), WALL, set()), rounds=3, iterations=1)
+    assert len(picked) == WALL
+
+
+def test_bench_weighted_sample(benchmark, weighted):
+    picked = benchmark.pedantic(
+        lambda: weighted._weighted_sample(_synthetic_tree(weighted, FILES), WALL, set()), rounds=3, iterations=1)
+    assert len(picked) == len(set(picked)) == WALL
+
+
+def test_weighted_sample_memory_is_bounded_by_wall(weighted):
+    n = min(FILES, 50000)
+    streaming = _peak_bytes(lambda: weighted._weighted_sample(_synthetic_tree(weighted, n), WALL, set()))
+    legacy = _peak_bytes(lambda: _legacy_pick(_synthetic_tree(weighted, n), WALL, set()))
+    # The reservoir holds WALL entries; the old selection held every path
+    assert streaming < 1024 * 1024
+    assert streaming * 10 < legacy
@@ -0,0 +1,23 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads its directories from the environment at import time; point them
+# at a scratch tree. FLASK_DEBUG keeps the import from starting the scheduler,
+# the crawler and the other background jobs.
+_ROOT = tempfile.mkdtemp(prefix="artillery-tests-")
+for _name in ("TASKS_DIR", "CONFIG_DIR", "DOWNLOADS_DIR"):
+    os.environ.setdefault(_name, os.path.join(_ROOT, _name.lower()))
+os.environ.setdefault("FLASK_DEBUG", "1")
+os.environ.pop("WERKZEUG_RUN_MAIN", None)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as artillery  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    return artillery
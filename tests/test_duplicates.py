@@ -0,0 +1,122 @@
+import concurrent.futures
+import time
+
+import pytest
+
+
+@pytest.fixture
+def hashes():
+    """File name -> the dHash dhash_batch returns for it (None = failed)."""
+    return {}
+
+
+@pytest.fixture
+def dup(app_module, hashes, monkeypatch):
+    """Empty catalog, no index, and a dhash_batch that reads ``hashes`` in
+    a thread instead of the media pool."""
+    conn = app_module._catalog_conn()
+    with conn:
+        conn.execute("DELETE FROM downloads")
+        conn.execute("DELETE FROM media_meta")
+    pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(app_module, "_media_pool", lambda: pool)
+    monkeypatch.setattr(app_module.media_worker, "dhash_batch",
+                        lambda paths: [hashes[p.rsplit("/", 1)[-1]] for p in paths])
+    monkeypatch.setattr(app_module, "_DUPLICATE_INDEX", None)
+    monkeypatch.setattr(app_module, "_DUPLICATE_REPORT_CACHE", {"key": None, "report": None})
+    yield app_module
+    pool.shutdown()
+
+
+def _add(app_module, hashes, name, h, size=1000, width=100, height=100):
+    """Catalog a probed image whose dHash will be ``h``."""
+    rel = f"cats/{name}"
+    hashes[name] = h
+    now = time.time()
+    conn = app_module._catalog_conn()
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO downloads (relpath, kind, source, run_id, size, mtime, media_type, added_at) "
+            "VALUES (?, ?, 'cats', NULL, ?, ?, 'image', ?)",
+            (rel, app_module.RUN_KIND_TASK, size, now, now),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO media_meta (relpath, size, mtime, width, height, probed_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (rel, size, now, width, height, now),
+        )
+    return rel
+
+
+def _clusters(app_module):
+    report = app_module._duplicate_report(app_module.DUPLICATE_MAX_DISTANCE)
+    return sorted(sorted(i["rel"] for i in c["items"]) for t in report["tasks"] for c in t["clusters"])
+
+
+def _count_builds(app_module, monkeypatch):
+    calls = []
+    build = app_module._duplicate_index_build
+    monkeypatch.setattr(app_module, "_duplicate_index_build", lambda conn: (calls.append(1), build(conn)))
+    return calls
+
+
+def test_failed_hash_is_not_marked_corrupt(dup, hashes, monkeypatch):
+    rel = _add(dup, hashes, "broken.jpg", None)
+    _add(dup, hashes, "ok.jpg", 0x0F0F)
+    assert dup._dhash_job() == 2
+    row = dup._catalog_conn().execute(
+        "SELECT corrupt, dhash, dhash_failed_at FROM media_meta WHERE relpath = ?", (rel,)).fetchone()
+    assert row["corrupt"] == 0 and row["dhash"] is None and row["dhash_failed_at"]
+    # Not retried on the next run, but again once DHASH_RETRY_AFTER has passed
+    assert dup._dhash_pending(dup._catalog_conn(), 10) == []
+    hashes["broken.jpg"] = 0x0F0F
+    monkeypatch.setattr(dup, "DHASH_RETRY_AFTER", -1)
+    assert dup._dhash_job() == 1
+    assert _clusters(dup) == [["cats/broken.jpg", "cats/ok.jpg"]]
+
+
+def test_later_runs_extend_the_index(dup, hashes, monkeypatch):
+    _add(dup, hashes, "a.jpg", 0)
+    _add(dup, hashes, "far.jpg", (1 << 64) - 1)
+    dup._dhash_job()
+    assert _clusters(dup) == []
+    tree = dup._DUPLICATE_INDEX["tree"]
+
+    builds = _count_builds(dup, monkeypatch)
+    _add(dup, hashes, "a-near.jpg", 0b111)
+    _add(dup, hashes, "a-same.jpg", 0)
+    assert dup._dhash_job() == 2
+    assert builds == [] and dup._DUPLICATE_INDEX["tree"] is tree
+    assert _clusters(dup) == [["cats/a-near.jpg", "cats/a-same.jpg", "cats/a.jpg"]]
+    assert dup._DUPLICATE_INDEX["hashed"] == 4
+
+    # Nothing new: the index and the cached report stay as they are
+    report = dup._duplicate_report(dup.DUPLICATE_MAX_DISTANCE)
+    dup._dhash_job()
+    assert builds == [] and dup._duplicate_report(dup.DUPLICATE_MAX_DISTANCE) is report
+
+
+def test_rehashed_file_rebuilds_the_index(dup, hashes, monkeypatch):
+    _add(dup, hashes, "a.jpg", 0)
+    _add(dup, hashes, "b.jpg", 1)
+    dup._dhash_job()
+    assert _clusters(dup) == [["cats/a.jpg", "cats/b.jpg"]]
+
+    builds = _count_builds(dup, monkeypatch)
+    # The file changed: the probe rewrites its row, which clears the hash
+    time.sleep(0.01)
+    _add(dup, hashes, "b.jpg", (1 << 64) - 1)
+    dup._dhash_job()
+    assert builds == [1]
+    assert _clusters(dup) == []
+
+
+def test_removed_member_rebuilds_the_index(dup, hashes, monkeypatch):
+    _add(dup, hashes, "a.jpg", 0)
+    _add(dup, hashes, "b.jpg", 1)
+    dup._dhash_job()
+    builds = _count_builds(dup, monkeypatch)
+    dup._catalog_forget(["cats/b.jpg"])
+    dup._dhash_job()
+    assert builds == [1]
+    assert _clusters(dup) == []
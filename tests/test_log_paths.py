@@ -0,0 +1,94 @@
+import pytest
+
+
+@pytest.fixture
+def extractor(app_module):
+    return app_module._LogPathExtractor("/downloads")
+
+
+@pytest.mark.parametrize("line, rel", [
+    # gallery-dl: downloaded files are printed bare, skipped ones with "# "
+    ("/downloads/twitter/artist/1234_1.jpg", "twitter/artist/1234_1.jpg"),
+    ("# /downloads/twitter/artist/1234_2.png", "twitter/artist/1234_2.png"),
+    ("/downloads/danbooru/tag with spaces/5678.webp", "danbooru/tag with spaces/5678.webp"),
+    # yt-dlp
+    ("[download] Destination: /downloads/youtube/Channel/clip [abc].mp4", "youtube/Channel/clip [abc].mp4"),
+    ("[download] /downloads/youtube/clip.webm has already been downloaded", "youtube/clip.webm"),
+    ('[Merger] Merging formats into "/downloads/youtube/Channel/clip.mkv"', "youtube/Channel/clip.mkv"),
+    ("[Merger] Merging formats into '/downloads/youtube/quoted.mp4'", "youtube/quoted.mp4"),
+    # relative root, as printed when gallery-dl runs with base-directory "downloads"
+    ("downloads/reddit/sub/abc.gif", "reddit/sub/abc.gif"),
+    ("./downloads/reddit/sub/def.jpeg", "reddit/sub/def.jpeg"),
+    # Windows-style separators
+    ("C:\\downloads\\pixiv\\123_p0.png", "pixiv/123_p0.png"),
+    ("\\downloads\\pixiv\\123_p1.jpg", "pixiv/123_p1.jpg"),
+    # extension case, trailing punctuation and colour codes
+    ("/downloads/a/UPPER.JPG", "a/UPPER.JPG"),
+    ("saved (/downloads/a/b.png), next", "a/b.png"),
+    ("\x1b[32m/downloads/a/green.jpg\x1b[0m", "a/green.jpg"),
+])
+def test_extracts_media_paths(extractor, line, rel):
+    assert extractor.extract(line) == rel
+    assert list(extractor.iter_relpaths(line)) == [rel]
+
+
+@pytest.mark.parametrize("line", [
+    "",
+    "[twitter][info] No results for https://twitter.com/artist",
+    # partial downloads and non-media files
+    "[download] Destination: /downloads/youtube/clip.mp4.part",
+    "/downloads/youtube/clip.f137.mp4.ytdl",
+    "/downloads/notes/readme.txt",
+    # error lines naming a path, and URLs that merely contain /downloads/
+    "/downloads/a/b.jpg: 404 Not Found",
+    "[error] HttpError: '404 Not Found' for 'https://example.com/downloads/a.jpg'",
+    # paths outside the downloads root
+    "/tmp/downloads/a.jpg",
+    "/mnt/old-downloads/a.jpg",
+    "/srv/media/downloads.jpg",
+    "/srv/backup./downloads/a.jpg",
+    "/downloads",
+])
+def test_rejects_non_matches(extractor, line):
+    assert extractor.extract(line) is None
+    assert list(extractor.iter_relpaths(line)) == []
+
+
+def test_multiple_paths_per_line(extractor):
+    line = "/downloads/a/1.jpg /downloads/a/2.png, '/downloads/b/3.mp4'"
+    assert list(extractor.iter_relpaths(line)) == ["a/1.jpg", "a/2.png", "b/3.mp4"]
+    assert extractor.extract(line) == "a/1.jpg"
+
+
+def test_rejected_prefix_does_not_hide_a_later_path(extractor):
+    line = "moved /tmp/downloads/old /downloads/new/b.jpg"
+    assert extractor.extract(line) == "new/b.jpg"
+    assert list(extractor.iter_relpaths(line)) == ["new/b.jpg"]
+
+
+def test_buffer_scan_matches_per_line(extractor):
+    lines = [
+        "[twitter][info] Downloading",
+        "/downloads/twitter/a/1.jpg",
+        "# /downloads/twitter/a/2.jpg",
+        "[download] Destination: /downloads/yt/v.mp4.part",
+        "[download] Destination: /downloads/yt/v.mp4",
+        "/tmp/downloads/x.png",
+        "downloads/rel/y.gif",
+    ]
+    per_line = [rel for rel in map(extractor.extract, lines) if rel]
+    assert list(extractor.iter_relpaths("\n".join(lines))) == per_line
+    assert list(extractor.iter_relpaths("\r\n".join(lines))) == per_line
+
+
+def test_root_variants_are_equivalent(app_module):
+    line = "/data/downloads/x/y.jpg"
+    for root in ("/data/downloads", "/data/downloads/", "\\data\\downloads"):
+        assert app_module._LogPathExtractor(root).extract(line) == "x/y.jpg"
+
+
+def test_module_helper_uses_downloads_root(app_module):
+    root = app_module.DOWNLOADS_ROOT
+    line = root + "/task/file.webp"
+    assert app_module._extract_relpath_from_log_line(line, root) == "task/file.webp"
+    assert app_module._extract_relpath_from_log_line("/elsewhere/file.webp", root) is None
@@ -0,0 +1,43 @@
+import concurrent.futures
+
+import pytest
+
+import media_worker
+
+Image = pytest.importorskip("PIL.Image")
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "ok.png"
+    Image.new("RGB", (64, 48), (200, 10, 10)).save(path)
+    return str(path)
+
+
+def test_probe_image(image):
+    info = media_worker.probe_image(image, timeout=30)
+    assert (info["width"], info["height"], info["codec"], info["frames"]) == (64, 48, "png", 1)
+    assert info["lqip"].startswith("data:image/")
+
+
+def test_probe_rejects_corrupt_files(tmp_path):
+    bad = tmp_path / "bad.jpg"
+    bad.write_bytes(b"\xff\xd8not really a jpeg")
+    with pytest.raises(Exception) as excinfo:
+        media_worker.probe_image(str(bad), timeout=30)
+    assert not isinstance(excinfo.value, media_worker.ProbeTimeout)
+
+
+def test_probe_timeout_is_its_own_error(tmp_path):
+    big = tmp_path / "big.png"
+    Image.new("RGB", (8000, 8000), (30, 60, 90)).save(big)
+    with pytest.raises(media_worker.ProbeTimeout):
+        media_worker.probe_image(str(big), timeout=0.01)
+    # The probe worker tells a queue wait apart from a slow file by type
+    assert not issubclass(media_worker.ProbeTimeout, concurrent.futures.TimeoutError)
+
+
+def test_time_limit_is_cleared(image):
+    import signal
+    media_worker.probe_image(image, timeout=5)
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
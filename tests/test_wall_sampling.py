@@ -0,0 +1,93 @@
+import collections
+import random
+import time
+
+import pytest
+
+
+def _row(app_module, rel, source="misc", media_type="image", mtime=None):
+    return (rel, app_module.RUN_KIND_TASK, source, mtime or time.time(), media_type)
+
+
+@pytest.fixture
+def neutral(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "MEDIA_WALL_VIDEO_WEIGHT", 1.0)
+    monkeypatch.setattr(app_module, "MEDIA_WALL_RECENCY_HALF_LIFE_DAYS", 0.0)
+    monkeypatch.setattr(app_module, "_WALL_TASK_WEIGHTS", {})
+    random.seed(37)
+    return app_module
+
+
+def _frequencies(app_module, rows, k, trials=4000):
+    counts = collections.Counter()
+    for _ in range(trials):
+        counts.update(app_module._weighted_sample(iter(rows), k, set()))
+    return {rel: n / trials for rel, n in counts.items()}
+
+
+def test_k_at_least_population_returns_everything(neutral):
+    rows = [_row(neutral, f"t/{i}.jpg") for i in range(5)]
+    for k in (5, 6, 100):
+        assert sorted(neutral._weighted_sample(iter(rows), k, set())) == sorted(r[0] for r in rows)
+
+
+def test_k_zero_and_empty_population(neutral):
+    assert neutral._weighted_sample(iter([_row(neutral, "a.jpg")]), 0, set()) == []
+    assert neutral._weighted_sample(iter([]), 3, set()) == []
+
+
+def test_exclude_is_honoured(neutral):
+    rows = [_row(neutral, f"t/{i}.jpg") for i in range(20)]
+    exclude = {f"t/{i}.jpg" for i in range(0, 20, 2)}
+    for _ in range(50):
+        picked = neutral._weighted_sample(iter(rows), 8, exclude)
+        assert len(picked) == 8 and len(set(picked)) == 8
+        assert not exclude.intersection(picked)
+    assert sorted(neutral._weighted_sample(iter(rows), 20, exclude)) == sorted(
+        r[0] for r in rows if r[0] not in exclude)
+
+
+def test_uniform_by_default(neutral):
+    rows = [_row(neutral, f"t/{i}.jpg") for i in range(4)]
+    freq = _frequencies(neutral, rows, 1)
+    for rel in ("t/0.jpg", "t/1.jpg", "t/2.jpg", "t/3.jpg"):
+        assert freq[rel] == pytest.approx(0.25, abs=0.04)
+
+
+def test_task_weights_set_inclusion_frequency(neutral, monkeypatch):
+    monkeypatch.setattr(neutral, "_WALL_TASK_WEIGHTS", {"cats": 3.0, "memes": 0.0})
+    rows = [_row(neutral, "cats.jpg", "cats"), _row(neutral, "dogs.jpg", "dogs"),
+            _row(neutral, "memes.jpg", "memes")]
+    freq = _frequencies(neutral, rows, 1)
+    assert freq["cats.jpg"] == pytest.approx(0.75, abs=0.04)
+    assert freq["dogs.jpg"] == pytest.approx(0.25, abs=0.04)
+    assert "memes.jpg" not in freq  # weight 0 never shows up
+
+
+def test_video_weight(neutral, monkeypatch):
+    monkeypatch.setattr(neutral, "MEDIA_WALL_VIDEO_WEIGHT", 0.25)
+    rows = [_row(neutral, "a.jpg"), _row(neutral, "b.mp4", media_type="video")]
+    freq = _frequencies(neutral, rows, 1)
+    assert freq["a.jpg"] == pytest.approx(0.8, abs=0.04)
+    monkeypatch.setattr(neutral, "MEDIA_WALL_VIDEO_WEIGHT", 0.0)
+    assert neutral._weighted_sample(iter(rows), 2, set()) == ["a.jpg"]
+
+
+def test_recency_half_life(neutral, monkeypatch):
+    monkeypatch.setattr(neutral, "MEDIA_WALL_RECENCY_HALF_LIFE_DAYS", 1.0)
+    now = time.time()
+    rows = [_row(neutral, "new.jpg", mtime=now), _row(neutral, "old.jpg", mtime=now - 86400)]
+    freq = _frequencies(neutral, rows, 1)
+    # A file one half-life older has half the weight: 2/3 vs 1/3
+    assert freq["new.jpg"] == pytest.approx(2 / 3, abs=0.04)
+
+
+def test_second_order_inclusion_follows_weight(neutral, monkeypatch):
+    # Without replacement, k=2 of weights (4, 1, 1): the heavy row is nearly
+    # always in, and the light rows split the second slot evenly.
+    monkeypatch.setattr(neutral, "_WALL_TASK_WEIGHTS", {"heavy": 4.0})
+    rows = [_row(neutral, "h.jpg", "heavy"), _row(neutral, "x.jpg"), _row(neutral, "y.jpg")]
+    freq = _frequencies(neutral, rows, 2)
+    # P(h excluded) = P(x then y) + P(y then x) = 2 * (1/6 * 1/5)
+    assert freq["h.jpg"] == pytest.approx(1 - 2 / 30, abs=0.03)
+    assert freq["x.jpg"] == pytest.approx(freq["y.jpg"], abs=0.05)